@@ -14,25 +14,35 @@
 #Rev 0_5_0 2025/4/9 增加多工位的功能,每個工位獨立顯示與紀錄
 #Rev 0_5_1 2025/4/14 停止紀錄時,以訊息框確認是否停止紀錄,打包加入ico檔
 #Rev 0_5_2 2025/5/8 增加log記錄功能,修正icon檔案讀取錯誤
+#Rev 0_6_0 2026/10/18 增加收集服務(--service),介面連線檢視(--connect, --watch),模擬設備(--simulate),工位設定檔(--config, stations.json)
 #-------------------------------------------------------------------------------
 import socket
 import time
+import asyncio
+import queue
+import math
+import struct
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox  # 修正：添加 messagebox 的導入
 import csv
 from datetime import datetime, timedelta  # 修正：添加 timedelta 的導入
-import pandas as pd  # 修正：添加 pandas 的導入
 import threading
 import os,sys
-from ctypes import windll
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from matplotlib import rcParams
-from matplotlib.ticker import FuncFormatter
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
-import matplotlib.dates as mdates
+# pandas 與 matplotlib 載入較慢, 在第一次使用時才於函式內 import, 加快程式啟動
+import numpy as np
 import tempfile
+import io
+import mmap
+import json
+import signal
+import bisect
+import collections
+import contextlib
+import logging
+import logging.handlers
+import atexit
+import re
+import hashlib
 
 # 確保 LOG 檔案儲存到執行檔所在目錄或臨時目錄
 if getattr(sys, 'frozen', False):  # 如果是 pyinstaller 打包的執行檔
@@ -47,39 +57,354 @@ if not os.access(APP_DIR, os.W_OK):
     LOG_PATH = os.path.join(tempfile.gettempdir(), "VM7000_Pw3335.log")
 
 
-def log_to_file(message):
-    """將訊息寫入 LOG 檔案"""
+class LogFormatter(logging.Formatter):
+    """`[LEVEL] time - message | key=value ...` lines; fields come from `extra={"fields": {...}}`."""
+    def format(self, record):
+        text = f"[{record.levelname}] {self.formatTime(record, '%Y-%m-%d %H:%M:%S')} - {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " | " + " ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                                     for key, value in fields.items())
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" (之前略過 {suppressed} 筆相同訊息)"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class StormFilter(logging.Filter):
+    """Error-storm suppression.
+
+    Messages are grouped by level, station, error class and text (digits
+    ignored). Each group may log `burst` records per `period` seconds; the
+    rest are dropped and their count is attached to the first record of
+    the next period. Runs in the caller's thread, so it is kept cheap.
+    """
+    DIGITS = re.compile(r"\d+")
+
+    def __init__(self, burst=5, period=60.0, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.clock = clock
+        self.groups = {}  # key -> [開始時間, 筆數, 略過筆數]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        fields = getattr(record, "fields", None) or {}
+        key = (record.levelno, fields.get("station"), fields.get("error"), self.DIGITS.sub("#", str(record.msg))[:120])
+        now = self.clock()
+        with self.lock:
+            group = self.groups.get(key)
+            if group is None or now - group[0] >= self.period:
+                if group and group[2]:
+                    record.suppressed = group[2]
+                self.groups[key] = [now, 1, 0]
+                if len(self.groups) > 1000:  # 清掉過期的群組
+                    self.groups = {k: v for k, v in self.groups.items() if now - v[0] < self.period}
+                return True
+            group[1] += 1
+            if group[1] <= self.burst:
+                return True
+            group[2] += 1
+            return False
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the log thread unformatted; drops (and counts) them when the queue is full."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating log file: rolls over when it exceeds `max_bytes` or the date changes."""
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backup_count=10):
+        super().__init__(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.day = datetime.now().date()
+
+    def shouldRollover(self, record):
+        day = datetime.fromtimestamp(record.created).date()
+        if day != self.day:
+            self.day = day
+            if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                return True
+        return super().shouldRollover(record)
+
+
+logger = logging.getLogger("VM7000_PW3335")
+log_listener = None
+
+
+def setup_logging(path=None, max_queue=10000):
+    """Start the background log thread (file + console). Called on the first log message.
+
+    Log calls only put the record on a queue, so collection threads never
+    wait for the disk; formatting, rotation and printing happen in the
+    log thread.
+    """
+    global log_listener
+    if log_listener is not None:
+        return
+    handlers = [LogFileHandler(path or LOG_PATH)]
+    if sys.stdout is not None:  # 打包成無主控台的執行檔時沒有 stdout
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(LogFormatter())
+    log_queue = queue.Queue(maxsize=max_queue)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.filters.clear()
+    logger.handlers.clear()
+    logger.addFilter(StormFilter())
+    logger.addHandler(LogQueueHandler(log_queue))
+    log_listener = logging.handlers.QueueListener(log_queue, *handlers)
+    log_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write out the queued records and stop the log thread (also run at exit)."""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        for handler in log_listener.handlers:
+            handler.close()
+        log_listener = None
+
+
+def log_error(message, **fields):
+    """Log an error; keyword arguments (station, device, error, latency, ...) are kept as structured fields."""
+    setup_logging()
+    logger.error(message, extra={"fields": fields})
+
+
+def log_info(message, **fields):
+    setup_logging()
+    logger.info(message, extra={"fields": fields})
+
+
+def parse_datetime(text):
+    """Parse a date/time typed in an entry.
+
+    ISO dates ("2025-05-08 12:00") and bare times ("12:00", today) are
+    handled by the standard library; anything else falls back to
+    pandas.to_datetime, imported only then.
+    """
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
     try:
-        with open(LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(message + "\n")
-    except Exception as e:
-        print(f"無法寫入 LOG 檔案: {e}")
-def log_error(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    msg = f"[ERROR] {timestamp} - {message}"
-    print(msg)
-    log_to_file(msg)
-
-def log_info(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    msg = f"[INFO] {timestamp} - {message}"
-    print(msg)
-    log_to_file(msg)
-
-# 設定 matplotlib 使用的字體
-rcParams['font.sans-serif'] = ['Microsoft JhengHei']  # 使用微軟正黑體
-rcParams['axes.unicode_minus'] = False  # 解決負號無法顯示的問題
-
-class VM7000:
-    def __init__(self, ip_address, port=502):
+        return datetime.combine(datetime.now().date(), datetime.strptime(text, "%H:%M").time())
+    except ValueError:
+        pass
+    import pandas as pd
+
+    return pd.to_datetime(text).to_pydatetime()
+
+
+class TimingHistogram:
+    """Rolling histogram of durations with log-spaced bins (10 µs to 100 s).
+
+    Samples are counted in one of `slices` sub-histograms chosen by time;
+    a slice is cleared when it comes round again, so the statistics cover
+    roughly the last `window` seconds. Percentiles are reported as the
+    upper edge of their bin (8 bins per decade).
+    """
+    EDGES = np.logspace(-5, 2, 7 * 8 + 1)
+
+    def __init__(self, window=60.0, slices=6, clock=time.monotonic):
+        self.slice_seconds = window / slices
+        self.clock = clock
+        self.edges = self.EDGES.tolist()
+        self.counts = np.zeros((slices, len(self.edges) + 1), dtype=np.int64)
+        self.sums = np.zeros(slices)
+        self.maxima = np.zeros(slices)
+        self.slice_ids = np.full(slices, -1, dtype=np.int64)
+
+    def current_slice(self):
+        slice_id = int(self.clock() // self.slice_seconds)
+        row = slice_id % len(self.slice_ids)
+        if self.slice_ids[row] != slice_id:
+            self.counts[row] = 0
+            self.sums[row] = 0.0
+            self.maxima[row] = 0.0
+            self.slice_ids[row] = slice_id
+        return slice_id, row
+
+    def record(self, seconds):
+        _, row = self.current_slice()
+        self.counts[row, bisect.bisect_left(self.edges, seconds)] += 1
+        self.sums[row] += seconds
+        if seconds > self.maxima[row]:
+            self.maxima[row] = seconds
+
+    def summary(self):
+        """Return count, mean, max and p50/p95/p99 (seconds) over the window."""
+        slice_id, _ = self.current_slice()
+        valid = self.slice_ids > slice_id - len(self.slice_ids)
+        counts = self.counts[valid].sum(axis=0)
+        count = int(counts.sum())
+        if count == 0:
+            return {"count": 0}
+        cumulative = np.cumsum(counts)
+        upper = self.EDGES.tolist() + [math.inf]
+        maximum = float(self.maxima[valid].max())
+        result = {"count": count, "mean": float(self.sums[valid].sum()) / count, "max": maximum}
+        for q in (50, 95, 99):
+            bin_index = int(np.searchsorted(cumulative, count * q / 100))
+            result[f"p{q}"] = min(upper[bin_index], maximum)
+        return result
+
+
+class Metrics:
+    """Process-wide timing histograms and gauges, keyed by station and name.
+
+    Hot paths call `record()` (or use `timer()`); gauges hold the latest
+    value of things like queue depths. `export()` writes a JSON snapshot
+    that can be collected by other tools.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def record(self, station_name, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get((station_name, name))
+            if histogram is None:
+                histogram = self.histograms[(station_name, name)] = TimingHistogram()
+            histogram.record(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, station_name, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(station_name, name, time.perf_counter() - started)
+
+    def gauge(self, station_name, name, value):
+        self.gauges[(station_name, name)] = value
+
+    def snapshot(self, station_name=None):
+        """Return {station: {name: summary or gauge value}}, optionally for one station."""
+        result = {}
+        with self.lock:
+            for (station, name), histogram in self.histograms.items():
+                if station_name is None or station == station_name:
+                    result.setdefault(station, {})[name] = histogram.summary()
+        for (station, name), value in list(self.gauges.items()):
+            if station_name is None or station == station_name:
+                result.setdefault(station, {})[name] = value
+        return result
+
+    def export(self, path):
+        """Write the current snapshot to `path` as JSON (replaced atomically)."""
+        data = {"time": datetime.now().isoformat(timespec="seconds"), "metrics": self.snapshot()}
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+
+
+# 全程式共用的效能統計 (設備往返、解析、寫檔、繪圖的耗時與佇列深度)
+METRICS = Metrics()
+
+
+class ModbusError(Exception):
+    """Exception response returned by a Modbus device."""
+    MESSAGES = {
+        1: "Illegal function",
+        2: "Illegal data address",
+        3: "Illegal data value",
+        4: "Slave device failure",
+        6: "Slave device busy",
+    }
+
+    def __init__(self, function, code):
+        self.function = function
+        self.code = code
+        super().__init__(f"Modbus exception {code} ({self.MESSAGES.get(code, 'Unknown')}) for function {function}")
+
+
+class ModbusTCP:
+    """Modbus TCP framing shared by the blocking and the asyncio VM7000 clients."""
+    HEADER_LENGTH = 6  # Transaction ID + Protocol ID + Length
+    MAX_FRAME_LENGTH = 254  # Unit ID + PDU 最大長度
+
+    def __init__(self):
+        self.transaction_id = 0
+
+    def next_transaction_id(self):
+        self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+        return self.transaction_id
+
+    REQUEST = struct.Struct(">HHHBBHH")
+
+    @classmethod
+    def build_request(cls, n_addr, n_func, s_bit_pos, s_count, transaction_id=0):
+        """Build a Modbus TCP request frame.
+
+        The start address and count may be given as ints or, as before, as
+        4-digit hex strings such as "0064".
+        """
+        address = int(s_bit_pos, 16) if isinstance(s_bit_pos, str) else s_bit_pos
+        count = int(s_count, 16) if isinstance(s_count, str) else s_count
+        data_length = 6  # Modbus TCP header固定長度
+        return cls.REQUEST.pack(transaction_id, 0, data_length, n_addr, n_func, address, count)
+
+    def build_requests(self, requests):
+        """Build one frame per (n_addr, n_func, s_bit_pos, s_count), each with a new transaction ID."""
+        return [self.build_request(*request, transaction_id=self.next_transaction_id()) for request in requests]
+
+    @classmethod
+    def parse_header(cls, header):
+        """Return (transaction_id, remaining length) from an MBAP header."""
+        transaction_id = int.from_bytes(header[0:2], byteorder='big')
+        protocol_id = int.from_bytes(header[2:4], byteorder='big')
+        length = int.from_bytes(header[4:6], byteorder='big')
+        if protocol_id != 0 or not 2 <= length <= cls.MAX_FRAME_LENGTH:
+            raise ConnectionError(f"Invalid Modbus TCP header: {header.hex()}")
+        return transaction_id, length
+
+    @staticmethod
+    def check_responses(responses):
+        """Raise ModbusError for the first exception response."""
+        for response in responses:
+            if response[7] & 0x80:
+                raise ModbusError(response[7] & 0x7F, response[8])
+        return responses
+
+    @staticmethod
+    def request_ids(frames):
+        return {int.from_bytes(frame[0:2], byteorder='big'): i for i, frame in enumerate(frames)}
+
+
+class VM7000(ModbusTCP):
+    def __init__(self, ip_address, port=502, timeout=2.0):
+        super().__init__()
         self.ip_address = ip_address
         self.port = port
+        self.timeout = timeout
         self.sock = None
 
     def connect(self):
         """Establish a TCP connection to the device."""
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.connect((self.ip_address, self.port))
+        self.sock = socket.create_connection((self.ip_address, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     def disconnect(self):
         """Close the TCP connection."""
@@ -87,146 +412,2510 @@ class VM7000:
             self.sock.close()
             self.sock = None
 
-    def send_command(self, command):
-        """Send a command to the device and return the response."""
+    def recv_exactly(self, size):
+        """Read exactly `size` bytes from the socket."""
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by the device.")
+            data += chunk
+        return bytes(data)
+
+    def send_requests(self, frames):
+        """Send several request frames in one write and return the responses in request order.
+
+        Responses are matched by transaction ID; stale responses left over
+        from an earlier request are discarded.
+        """
         if not self.sock:
             raise ConnectionError("Socket is not connected to the device.")
-        self.sock.sendall(command)
-        time.sleep(0.1)
-        response = self.sock.recv(1024)
-        return response
+        pending = self.request_ids(frames)
+        responses = [None] * len(frames)
+        self.sock.sendall(b"".join(frames))
+        while pending:
+            header = self.recv_exactly(self.HEADER_LENGTH)
+            transaction_id, length = self.parse_header(header)
+            body = self.recv_exactly(length)
+            index = pending.pop(transaction_id, None)
+            if index is not None:
+                responses[index] = header + body
+        return responses
+
+    def send_command(self, command):
+        """Send a command to the device and return the response."""
+        return self.send_requests([command])[0]
+
+    def get_values(self, requests):
+        """Pipeline several (n_addr, n_func, s_bit_pos, s_count) reads over the connection."""
+        return self.check_responses(self.send_requests(self.build_requests(requests)))
 
     def get_value(self, n_addr, n_func, s_bit_pos, s_count):
         """Construct and send a command to retrieve data."""
-        data_length = 6  # Modbus TCP header固定長度
-        command = bytearray(12)
-        command[0:2] = (0).to_bytes(2, byteorder='big')  # Transaction ID
-        command[2:4] = (0).to_bytes(2, byteorder='big')  # Protocol ID
-        command[4:6] = (data_length).to_bytes(2, byteorder='big')  # 設定長度
-        command[6] = n_addr
-        command[7] = n_func
-        command[8] = int(s_bit_pos[:2], 16)
-        command[9] = int(s_bit_pos[2:], 16)
-        command[10] = int(s_count[:2], 16)
-        command[11] = int(s_count[2:], 16)
-        return self.send_command(command)
-
-    def hex_to_decimal(self, response_bytes):
+        return self.get_values([(n_addr, n_func, s_bit_pos, s_count)])[0]
+
+    @staticmethod
+    def hex_to_decimal(response_bytes):
         """Convert a byte response to a list of decimal values."""
         if len(response_bytes) < 9:
             raise ValueError("Invalid response length: too short")
+        return np.frombuffer(response_bytes, dtype=">u2", offset=9).tolist()  # 忽略 Modbus TCP Header
 
-        data_bytes = response_bytes[9:]  # 忽略 Modbus TCP Header
-
-        decimal_values = []
-        for i in range(0, len(data_bytes), 2):
-            decimal_values.append((data_bytes[i] << 8) | data_bytes[i + 1])
-        
-        return decimal_values
-        
-    def decode_temperature(self, response_bytes):
+    @staticmethod
+    def decode_temperature(response_bytes):
         """Decode response data into temperatures."""
         if len(response_bytes) < 9:
             raise ValueError("Invalid response length: too short")
-
-        # **刪除 Modbus TCP Header (前 9 Bytes)**
-        data_bytes = response_bytes[9:]  
-
-        if len(data_bytes) % 2 != 0:
+        if (len(response_bytes) - 9) % 2 != 0:
             raise ValueError("Invalid data length: must be even")
+        # 刪除 Modbus TCP Header (前 9 Bytes), 其餘為有號 16-bit 整數, 1 unit = 0.1°C
+        return (np.frombuffer(response_bytes, dtype=">i2", offset=9) / 10.0).tolist()
+
+
+class RegisterPlan:
+    """Read plan covering a channel set with the fewest Modbus register blocks.
+
+    Channel n lives in input register `base_address + n - 1`. Channels are
+    grouped greedily into blocks of at most `max_count` registers (the
+    Modbus limit is 125), which gives the minimum number of requests; all
+    blocks are then sent together with get_values().
+    """
+    def __init__(self, channels, base_address=0x64, unit=1, max_count=125):
+        self.channels = list(channels)
+        registers = [base_address + ch - 1 for ch in self.channels]
+        self.blocks = []  # [start address, register count]
+        for register in sorted(set(registers)):
+            if self.blocks and register - self.blocks[-1][0] < max_count:
+                self.blocks[-1][1] = register - self.blocks[-1][0] + 1
+            else:
+                self.blocks.append([register, 1])
+
+        # 每個頻道在所有區塊串接後的位置
+        starts = np.array([address for address, _ in self.blocks])
+        offsets = np.cumsum([0] + [count for _, count in self.blocks[:-1]])
+        block_index = np.searchsorted(starts, registers, side="right") - 1
+        self.positions = (offsets[block_index] + np.array(registers) - starts[block_index]).astype(np.intp)
+        self.requests = [(unit, 4, address, count) for address, count in self.blocks]
+
+    def decode(self, responses):
+        """Decode the block responses into one temperature per configured channel."""
+        values = []
+        for response, (_, count) in zip(responses, self.blocks):
+            if len(response) != 9 + 2 * count or response[8] != 2 * count:
+                raise ValueError(f"Invalid response length: expected {count} registers")
+            values.append(np.frombuffer(response, dtype=">i2", offset=9))
+        return (np.concatenate(values)[self.positions] / 10.0).tolist()  # 1 unit = 0.1°C
+
+
+# PW3335 :MEAS? 的量測項目; 前四項 (U, I, P, WH) 固定, 工位設定 "pw_items" 可再增加 (如 PF, UPK, IPK)
+PW3335_ITEMS = ["U", "I", "P", "WH"]
+# 紀錄檔中各量測項目的欄位名稱, 未列出的項目以項目名稱為欄位名稱
+PW3335_COLUMNS = {"U": "U(V)", "I": "I(A)", "P": "P(W)", "WH": "WP(Wh)", "S": "S(VA)", "Q": "Q(var)",
+                  "UPK": "Upk(V)", "IPK": "Ipk(A)"}
+# 每個 :MEAS? 查詢最多的項目數; 超過時分成多個查詢, 在同一次往返中一起送出
+PW3335_MAX_ITEMS = 8
+
+
+def power_columns(items):
+    """Run file column names of a PW3335 item list."""
+    return [PW3335_COLUMNS.get(item, item) for item in items]
+
+
+class PW3335Protocol:
+    """:MEAS? query building and response parsing for a list of PW3335 items.
+
+    The items are split into queries of at most `max_items`; all of them
+    are written at once and answered with one line each, so any item list
+    costs a single round trip. Responses look like
+    "U +110.14E+0;I +0.7683E+0;P +084.18E+0;WP +00.0036E+3" (headers may be
+    switched off) and are parsed in one pass with float(), which accepts
+    every SCPI exponent form. The SCPI overflow / not-available value
+    (9.91E+37) becomes None.
+    """
+    OVERFLOW = 9.9e37
+
+    def __init__(self, items=None, max_items=PW3335_MAX_ITEMS):
+        self.items = list(items or PW3335_ITEMS)
+        groups = [self.items[i:i + max_items] for i in range(0, len(self.items), max_items)]
+        self.request = b"".join(f":MEAS? {','.join(group)}\n".encode("ascii") for group in groups)
+        self.n_lines = len(groups)
+
+    def parse_values(self, response):
+        """Parse the joined response lines into one value per configured item."""
+        return self.parse_response(response, len(self.items))
+
+    @classmethod
+    def parse_response(cls, response, n_items=4):
+        """Parse a :MEAS? response (lines joined with ';') into `n_items` floats."""
+        fields = response.split(";")
+        if len(fields) != n_items:
+            raise ValueError(f"Unexpected response format: {response}")
+        try:
+            values = [float(field[field.rfind(" ") + 1:]) for field in fields]
+        except ValueError:
+            raise ValueError(f"Failed to parse response: {response}") from None
+        return [None if abs(value) >= cls.OVERFLOW else value for value in values]
 
-        temperatures = []
-        for i in range(0, len(data_bytes), 2):
-            raw_value = (data_bytes[i] << 8) | data_bytes[i+1]
-            
-            # 轉換為有號 16-bit 整數
-            if raw_value >= 0x8000:
-                raw_value -= 0x10000
-
-            temperatures.append(raw_value / 10.0)  # 1 unit = 0.1°C
-        
-        return temperatures
 
-class PW3335:
-    def __init__(self, ip_address, port=3300):
+class PW3335(PW3335Protocol):
+    """Blocking client for the PW3335, reading newline-terminated responses through a buffered socket file."""
+    def __init__(self, ip_address, port=3300, timeout=2.0, items=None, max_items=PW3335_MAX_ITEMS):
+        super().__init__(items, max_items)
         self.ip_address = ip_address
         self.port = port
+        self.timeout = timeout
         self.sock = None
+        self.file = None
 
     def connect(self):
         """Establish a TCP connection to the power meter."""
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.connect((self.ip_address, self.port))
+        self.sock = socket.create_connection((self.ip_address, self.port), timeout=self.timeout)
+        self.file = self.sock.makefile("rb")
 
     def disconnect(self):
         """Close the TCP connection."""
         if self.sock:
+            self.file.close()
             self.sock.close()
-            self.sock = None
+            self.sock = self.file = None
 
-    def query_data(self):
-        """Query voltage, current, power, and accumulated power."""
+    def readline(self):
+        line = self.file.readline()
+        if not line.endswith(b"\n"):
+            raise ConnectionError("Connection closed by the power meter.")
+        return line.decode("ascii").strip()
+
+    def query_raw(self):
+        """Send the measurement queries and return their response lines joined with ';'."""
         if not self.sock:
             raise ConnectionError("Socket is not connected to the power meter.")
-        self.sock.sendall(b':MEAS? U,I,P,WH\n')
-        response = self.sock.recv(1024).decode('ascii').strip()
+        self.sock.sendall(self.request)
+        return ";".join(self.readline() for _ in range(self.n_lines))
+
+    def query_data(self):
+        """Query the configured items (voltage, current, power, accumulated power, ...)."""
+        return self.parse_values(self.query_raw())
+
+
+class AsyncVM7000(ModbusTCP):
+    """asyncio client for the VM7000, used by AcquisitionEngine."""
+    def __init__(self, ip_address, port=502, timeout=2.0):
+        super().__init__()
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Open the TCP connection, giving up after `timeout` seconds."""
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.ip_address, self.port), self.timeout)
+
+    async def disconnect(self):
+        """Close the TCP connection."""
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def send_requests(self, frames):
+        """Send several request frames in one write and return the responses in request order."""
+        if not self.writer:
+            raise ConnectionError("Socket is not connected to the device.")
+        pending = self.request_ids(frames)
+        responses = [None] * len(frames)
+        self.writer.write(b"".join(frames))
+        await self.writer.drain()
+        while pending:
+            header = await asyncio.wait_for(self.reader.readexactly(self.HEADER_LENGTH), self.timeout)
+            transaction_id, length = self.parse_header(header)
+            body = await asyncio.wait_for(self.reader.readexactly(length), self.timeout)
+            index = pending.pop(transaction_id, None)
+            if index is not None:
+                responses[index] = header + body
+        return responses
+
+    async def get_values(self, requests):
+        """Pipeline several (n_addr, n_func, s_bit_pos, s_count) reads over the connection."""
+        return self.check_responses(await self.send_requests(self.build_requests(requests)))
+
+    async def get_value(self, n_addr, n_func, s_bit_pos, s_count):
+        """Read one block of registers."""
+        return (await self.get_values([(n_addr, n_func, s_bit_pos, s_count)]))[0]
+
+    async def probe(self):
+        """Health check: read a single register."""
+        await self.get_value(1, 4, 0x64, 1)
+
+
+class AsyncPW3335(PW3335Protocol):
+    """asyncio client for the PW3335, used by AcquisitionEngine."""
+    def __init__(self, ip_address, port=3300, timeout=2.0, items=None, max_items=PW3335_MAX_ITEMS):
+        super().__init__(items, max_items)
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Open the TCP connection, giving up after `timeout` seconds."""
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.ip_address, self.port), self.timeout)
+
+    async def disconnect(self):
+        """Close the TCP connection."""
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def query_raw(self):
+        """Send the measurement queries in one write and return their response lines joined with ';'."""
+        if not self.writer:
+            raise ConnectionError("Socket is not connected to the power meter.")
+        self.writer.write(self.request)
+        await self.writer.drain()
+        return ";".join(await asyncio.wait_for(self.read_lines(), self.timeout))
+
+    async def read_lines(self):
+        lines = []
+        for _ in range(self.n_lines):
+            line = await self.reader.readline()
+            if not line.endswith(b"\n"):
+                raise ConnectionError("Connection closed by the power meter.")
+            lines.append(line.decode("ascii").strip())
+        return lines
+
+    async def query_data(self):
+        """Query the configured items (voltage, current, power, accumulated power, ...)."""
+        return self.parse_values(await self.query_raw())
+
+    async def probe(self):
+        """Health check: the meter must answer *IDN?."""
+        self.writer.write(b'*IDN?\n')
+        await self.writer.drain()
+        if not (await asyncio.wait_for(self.reader.readline(), self.timeout)).strip():
+            raise ConnectionError("Empty *IDN? response from the power meter.")
+
+
+class DeviceOffline(ConnectionError):
+    """Raised instead of a request while a DeviceLink is reconnecting."""
+
+
+class DeviceLink:
+    """Keeps one device connection usable for AcquisitionEngine.
+
+    A failed request marks the link down and starts a background task that
+    reconnects with exponential backoff and checks the device with
+    `probe()` before using it again. Requests made while down fail at once
+    with DeviceOffline, so the sampling schedule never waits for a
+    reconnect. `on_event(kind, message)` is called when the link goes down
+    or comes back.
+    """
+    # 這些例外代表連線已不可靠 (逾時可能讓回應錯位), 需要重新連線
+    CONNECTION_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+    def __init__(self, name, client, on_event, min_backoff=1.0, max_backoff=60.0):
+        self.name = name
+        self.client = client
+        self.on_event = on_event
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.reconnects = 0
+        self.downtime = 0.0
+        self.down_since = None
+        self.reconnect_task = None
+
+    async def open(self):
+        await self.client.connect()
+        self.connected = True
+
+    async def close(self):
+        if self.reconnect_task:
+            self.reconnect_task.cancel()
+            await asyncio.gather(self.reconnect_task, return_exceptions=True)
+            self.reconnect_task = None
+        await self.client.disconnect()
+        self.connected = False
+
+    async def request(self, method, *args):
+        """Await `method(*args)`; connection failures take the link down and raise DeviceOffline."""
+        if not self.connected:
+            raise DeviceOffline(f"{self.name} is offline")
+        try:
+            return await method(*args)
+        except self.CONNECTION_ERRORS as e:
+            self.mark_down(e)
+            raise DeviceOffline(f"{self.name} is offline") from e
+
+    def mark_down(self, error):
+        self.connected = False
+        self.down_since = time.monotonic()
+        self.on_event("error", f"{self.name} 連線中斷: {error!r}, 重新連線中", device=self.name, error=type(error).__name__)
+        self.reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        backoff = self.min_backoff
+        while True:
+            await self.client.disconnect()
+            await asyncio.sleep(backoff)
+            try:
+                await self.client.connect()
+                await self.client.probe()
+            except self.CONNECTION_ERRORS + (ModbusError, ValueError):
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self.downtime += time.monotonic() - self.down_since
+            self.down_since = None
+            self.reconnects += 1
+            self.connected = True
+            self.reconnect_task = None
+            self.on_event("info", f"{self.name} 已重新連線 (第 {self.reconnects} 次)", device=self.name,
+                          downtime=round(self.downtime, 1))
+            return
+
+    def status(self):
+        downtime = self.downtime
+        if self.down_since is not None:
+            downtime += time.monotonic() - self.down_since
+        return {"connected": self.connected, "reconnects": self.reconnects, "downtime": downtime}
+
+
+class TickScheduler:
+    """Deadline-based periodic ticks that do not drift.
+
+    Deadlines are kept on the monotonic clock and placed on wall-clock
+    multiples of `interval`, so stations sharing an interval fire on the
+    same tick. The tick time (not the wake-up time) is the sample
+    timestamp, so rows are exactly `interval` apart. Late wake-ups are
+    recorded as jitter; ticks missed because a poll overran are skipped
+    and counted.
+    """
+    def __init__(self, interval, clock=time.monotonic, wall_clock=time.time):
+        self.interval = interval
+        self.clock = clock
+        self.offset = wall_clock() - clock()  # 牆上時間 = monotonic + offset
+        self.next_tick = math.floor((clock() + self.offset) / interval + 1) * interval
+        self.samples = 0
+        self.overruns = 0
+        self.last_jitter = 0.0
+        self.max_jitter = 0.0
+        self.jitter_sum = 0.0
+
+    def delay(self):
+        """Seconds left until the next tick."""
+        return self.next_tick - self.offset - self.clock()
+
+    def fire(self):
+        """Record the wake-up for the current tick and return its wall-clock time."""
+        tick = self.next_tick
+        jitter = max(self.clock() + self.offset - tick, 0.0)
+        self.samples += 1
+        self.last_jitter = jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.jitter_sum += jitter
+        return tick
+
+    def advance(self):
+        """Move to the following tick, skipping ticks that have already passed; return how many were skipped."""
+        self.next_tick += self.interval
+        late = self.clock() + self.offset - self.next_tick
+        missed = int(late // self.interval) + 1 if late >= 0 else 0
+        self.next_tick += missed * self.interval
+        self.overruns += missed
+        return missed
+
+    def metrics(self):
+        return {
+            "jitter": self.last_jitter,
+            "max_jitter": self.max_jitter,
+            "mean_jitter": self.jitter_sum / self.samples if self.samples else 0.0,
+            "overruns": self.overruns,
+        }
+
+
+class AcquisitionEngine:
+    """Polls every active station on one asyncio event loop.
+
+    The loop runs in a background thread. Each station reads its VM7000
+    and PW3335 concurrently, and all stations run side by side, so a cycle
+    takes as long as the slowest device. Polls are driven by a
+    TickScheduler and each device sits behind a DeviceLink, so a lost
+    device yields gaps (None values) while it reconnects instead of
+    stopping the station. Results are put on `sample_queue` as
+    ("sample", station_name, (timestamp, temperatures, power_data, status))
+    or ("error" | "info", station_name, message) for the GUI to consume.
+    """
+    def __init__(self, sample_queue, timeout=2.0):
+        self.sample_queue = sample_queue
+        self.timeout = timeout
+        self.stations = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def add_station(self, station_name, vm_address, pw_address, channels, interval, pw_items=None):
+        """Connect both devices and start polling; raises if either connection fails.
+
+        `pw_items` lists the PW3335 items to read (PW3335_ITEMS by default);
+        each sample's power data holds one value per item, in that order.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._start_station(station_name, vm_address, pw_address, channels, interval, pw_items), self.loop)
+        return future.result(timeout=self.timeout * 2 + 1)
+
+    def remove_station(self, station_name):
+        """Stop polling the station and close its connections."""
+        future = asyncio.run_coroutine_threadsafe(self._stop_station(station_name), self.loop)
+        return future.result(timeout=self.timeout * 2 + 1)
+
+    def shutdown(self):
+        for station_name in list(self.stations):
+            self.remove_station(station_name)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def report(self, kind, station_name, message, **fields):
+        """Log an event with its station and device fields, then pass it on to the consumer."""
+        (log_error if kind == "error" else log_info)(message, station=station_name, **fields)
+        self.sample_queue.put((kind, station_name, message))
+
+    async def _start_station(self, station_name, vm_address, pw_address, channels, interval, pw_items):
+        def on_event(kind, message, **fields):
+            self.report(kind, station_name, message, **fields)
+
+        vm = DeviceLink(f"VM7000 {vm_address[0]}", AsyncVM7000(*vm_address, timeout=self.timeout), on_event)
+        pw = DeviceLink(f"PW3335 {pw_address[0]}", AsyncPW3335(*pw_address, timeout=self.timeout, items=pw_items), on_event)
+        try:
+            await asyncio.gather(vm.open(), pw.open())
+        except BaseException:
+            await asyncio.gather(vm.close(), pw.close())
+            raise
+        task = self.loop.create_task(self._poll_station(station_name, vm, pw, channels, interval))
+        self.stations[station_name] = (task, vm, pw)
+
+    async def _stop_station(self, station_name):
+        entry = self.stations.pop(station_name, None)
+        if entry:
+            task, vm, pw = entry
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.gather(vm.close(), pw.close())
+
+    async def _poll_station(self, station_name, vm, pw, channels, interval):
+        plan = RegisterPlan(channels)
+        scheduler = TickScheduler(interval)
+
+        latency = {}  # 本週期各請求的耗時 (秒), 失敗時也記錄, 供錯誤紀錄使用
+
+        async def timed(name, request):
+            # 只統計成功的往返時間, 斷線時的立即失敗不列入
+            started = time.perf_counter()
+            try:
+                result = await request
+            finally:
+                latency[name] = time.perf_counter() - started
+            METRICS.record(station_name, name, latency[name])
+            return result
+
+        while True:
+            await asyncio.sleep(max(scheduler.delay(), 0))
+            now = datetime.fromtimestamp(scheduler.fire())
+            cycle_started = time.perf_counter()
+            vm_result, pw_result = await asyncio.gather(
+                timed("vm_rtt", vm.request(vm.client.get_values, plan.requests)),
+                timed("pw_rtt", pw.request(pw.client.query_raw)),
+                return_exceptions=True)
+            parse_started = time.perf_counter()
+
+            # 讀取失敗時以 None 記錄缺值
+            temperatures = [None] * len(channels)
+            if isinstance(vm_result, DeviceOffline):
+                pass
+            elif isinstance(vm_result, BaseException):
+                self.report("error", station_name, f"Error collecting VM7000 data for {vm.name}: {vm_result!r}",
+                            device=vm.name, error=type(vm_result).__name__, latency=latency["vm_rtt"])
+            else:
+                try:
+                    temperatures = plan.decode(vm_result)
+                except ValueError as e:
+                    self.report("error", station_name, f"Error collecting VM7000 data for {vm.name}: {e}",
+                                device=vm.name, error=type(e).__name__, latency=latency["vm_rtt"])
+
+            power_data = [None] * len(pw.client.items)
+            if isinstance(pw_result, DeviceOffline):
+                pass
+            elif isinstance(pw_result, BaseException):
+                self.report("error", station_name, f"Error collecting PW3335 data for {pw.name}: {pw_result!r}",
+                            device=pw.name, error=type(pw_result).__name__, latency=latency["pw_rtt"])
+            else:
+                try:
+                    power_data = pw.client.parse_values(pw_result)
+                except ValueError as e:
+                    self.report("error", station_name, f"Error collecting PW3335 data for {pw.name}: {e!r}",
+                                device=pw.name, error=type(e).__name__, latency=latency["pw_rtt"])
+            METRICS.record(station_name, "parse", time.perf_counter() - parse_started)
+            METRICS.record(station_name, "cycle", time.perf_counter() - cycle_started)
+
+            missed = scheduler.advance()
+            status = scheduler.metrics()
+            status["missed"] = missed
+            status["vm"] = vm.status()
+            status["pw"] = pw.status()
+            self.sample_queue.put(("sample", station_name, (now, temperatures, power_data, status)))
+
+
+# 即時監看保留的最長時間 (小時)
+HISTORY_HOURS = 189
+# 圖表檢查新資料的間隔 (毫秒); 只重繪目前頁籤, 沒有新資料時不重繪
+PLOT_INTERVAL_MS = 1000
+# CSV 時間索引每幾列記錄一次位置
+INDEX_BLOCK_ROWS = 256
+# 主執行緒處理樣本與更新畫面的間隔 (毫秒); 每次只顯示各工位最新的一筆
+UI_PUMP_MS = 200
+
+
+class StationBuffer:
+    """Fixed-capacity ring buffer holding one station's live history.
+
+    Every row is written twice (slot i and i + capacity), so the valid rows
+    are always one contiguous slice and `view()` never has to copy.
+    """
+    def __init__(self, capacity, n_channels):
+        self.capacity = max(int(capacity), 1)
+        self.n_channels = n_channels
+        self.time_data = np.zeros(2 * self.capacity, dtype="datetime64[ms]")
+        self.temperature_data = np.full((2 * self.capacity, n_channels), np.nan, dtype=np.float32)
+        self.power_data = np.full(2 * self.capacity, np.nan, dtype=np.float32)
+        self.wp_data = np.full(2 * self.capacity, np.nan, dtype=np.float64)
+        self.start = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_interval(cls, interval, n_channels, hours=HISTORY_HOURS):
+        """Allocate enough rows to hold `hours` of samples taken every `interval` seconds."""
+        return cls(hours * 3600 // max(int(interval), 1) + 1, n_channels)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, timestamp, temperatures, power, wp=None):
+        """Append one sample, overwriting the oldest row when full."""
+        temps = np.array([np.nan if t is None else t for t in temperatures[:self.n_channels]], dtype=np.float32)
+        with self.lock:
+            pos = (self.start + self.size) % self.capacity
+            for idx in (pos, pos + self.capacity):
+                self.time_data[idx] = np.datetime64(timestamp, "ms")
+                self.temperature_data[idx, :] = np.nan
+                self.temperature_data[idx, :len(temps)] = temps
+                self.power_data[idx] = np.nan if power is None else power
+                self.wp_data[idx] = np.nan if wp is None else wp
+            if self.size < self.capacity:
+                self.size += 1
+            else:
+                self.start = (self.start + 1) % self.capacity
+
+    def evict_before(self, timestamp):
+        """Drop all rows older than `timestamp`."""
+        with self.lock:
+            times = self.time_data[self.start:self.start + self.size]
+            drop = int(np.searchsorted(times, np.datetime64(timestamp, "ms"), side="left"))
+            self.start = (self.start + drop) % self.capacity
+            self.size -= drop
+
+    def extend(self, time_data, temperature_data, power_data, wp_data):
+        """Append many rows at once (vectorized); only the newest `capacity` rows are kept."""
+        rows = min(len(time_data), self.capacity)
+        if rows == 0:
+            return
+        time_data, power_data, wp_data = time_data[-rows:], power_data[-rows:], wp_data[-rows:]
+        temperature_data = temperature_data[-rows:, :self.n_channels]
+        with self.lock:
+            pos = (self.start + self.size + np.arange(rows)) % self.capacity
+            for idx in (pos, pos + self.capacity):
+                self.time_data[idx] = time_data
+                self.temperature_data[idx] = np.nan
+                self.temperature_data[idx, :temperature_data.shape[1]] = temperature_data
+                self.power_data[idx] = power_data
+                self.wp_data[idx] = wp_data
+            overflow = max(self.size + rows - self.capacity, 0)
+            self.start = (self.start + overflow) % self.capacity
+            self.size = min(self.size + rows, self.capacity)
+
+    def clear(self):
+        with self.lock:
+            self.start = 0
+            self.size = 0
+
+    def view(self, start=None, end=None):
+        """Return zero-copy (time, temperature, power, wp) views, optionally limited to [start, end]."""
+        with self.lock:
+            base, size = self.start, self.size
+        times = self.time_data[base:base + size]
+        lo = 0 if start is None else int(np.searchsorted(times, np.datetime64(start, "ms"), side="left"))
+        hi = size if end is None else int(np.searchsorted(times, np.datetime64(end, "ms"), side="right"))
+        lo, hi = base + lo, base + max(hi, lo)
+        return self.time_data[lo:hi], self.temperature_data[lo:hi], self.power_data[lo:hi], self.wp_data[lo:hi]
+
+
+# VM7000 熱電偶斷線或超出量測範圍時回傳的溫度 (°C) 下限
+OPEN_THERMOCOUPLE = 999
+# 工位設定未指定 "alarms" 時使用的警報規則
+DEFAULT_ALARMS = [{"kind": "open"}]
+# 電力量測欄位在 power_data 中的位置
+POWER_SOURCES = {"voltage": 0, "current": 1, "power": 2}
+
+
+def parse_alarm_rule(rule):
+    """Normalize one entry of a station's "alarms" list.
+
+    {"name": "冷凍室過溫", "kind": "limit", "source": "temp", "channels": "1-3",
+    "high": -15, "low": null, "hysteresis": 0.5, "window": 300}
+
+    kind: "limit" (each sample), "mean" (rolling mean over `window` seconds),
+    "slope" (rolling least-squares slope over `window` seconds, per minute)
+    or "open" (thermocouple reading above OPEN_THERMOCOUPLE; a missed read
+    is a gap and leaves every alarm as it is). source: "temp" (the listed
+    VM7000 channels, all when omitted), "voltage", "current" or "power". An alarm is raised beyond high/low and cleared once the value
+    is back inside by `hysteresis`.
+    """
+    kind = rule.get("kind", "limit")
+    source = rule.get("source", "temp")
+    if kind not in ("limit", "mean", "slope", "open"):
+        raise ValueError(f"未知的警報種類: {kind}")
+    if source != "temp" and source not in POWER_SOURCES:
+        raise ValueError(f"未知的警報來源: {source}")
+    if kind == "open" and source != "temp":
+        raise ValueError("open 警報只適用於溫度頻道")
+    if kind != "open" and rule.get("high") is None and rule.get("low") is None:
+        raise ValueError(f"{kind} 警報需要 high 或 low")
+    channels = rule.get("channels")
+    return {
+        "name": rule.get("name") or (f"{source} {kind}" if kind != "open" else "熱電偶斷線"),
+        "kind": kind,
+        "source": source,
+        "channels": None if channels is None else parse_channels(str(channels)),
+        "high": rule.get("high"),
+        "low": rule.get("low"),
+        "hysteresis": float(rule.get("hysteresis", 0.0)),
+        "window": float(rule.get("window", 60.0)),
+    }
+
+
+class RollingWindow:
+    """Samples of the last `window` seconds with running sums for O(1) mean and slope.
+
+    Times are kept relative to `origin` and the sums are rebuilt from the
+    window every `len(window)` evictions, so rounding errors of the
+    add/subtract updates cannot build up over a multi-day run.
+    """
+    __slots__ = ("window", "samples", "origin", "n", "sum_t", "sum_v", "sum_tt", "sum_tv", "evicted")
+
+    def __init__(self, window):
+        self.window = window
+        self.samples = collections.deque()
+        self.origin = None
+        self.n = 0
+        self.sum_t = self.sum_v = self.sum_tt = self.sum_tv = 0.0
+        self.evicted = 0
+
+    def add(self, seconds, value):
+        if self.origin is None:
+            self.origin = seconds
+        t = seconds - self.origin
+        self.samples.append((t, value))
+        self.n += 1
+        self.sum_t += t
+        self.sum_v += value
+        self.sum_tt += t * t
+        self.sum_tv += t * value
+        while self.samples[0][0] < t - self.window:
+            old_t, old_v = self.samples.popleft()
+            self.n -= 1
+            self.sum_t -= old_t
+            self.sum_v -= old_v
+            self.sum_tt -= old_t * old_t
+            self.sum_tv -= old_t * old_v
+            self.evicted += 1
+        if self.evicted > max(self.n, 64):
+            self.rebuild()
+
+    def rebuild(self):
+        """Move the origin to the oldest sample and recompute the sums."""
+        self.origin += self.samples[0][0]
+        base = self.samples[0][0]
+        self.samples = collections.deque((t - base, v) for t, v in self.samples)
+        self.sum_t = sum(t for t, _ in self.samples)
+        self.sum_v = sum(v for _, v in self.samples)
+        self.sum_tt = sum(t * t for t, _ in self.samples)
+        self.sum_tv = sum(t * v for t, v in self.samples)
+        self.evicted = 0
+
+    def span(self):
+        return self.samples[-1][0] - self.samples[0][0] if self.samples else 0.0
+
+    def mean(self):
+        return self.sum_v / self.n if self.n else None
+
+    def slope(self):
+        """Least-squares slope in value per second, or None until the window is half full."""
+        if self.n < 2 or self.span() < self.window / 2:
+            return None
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 0:
+            return None
+        return (self.n * self.sum_tv - self.sum_t * self.sum_v) / denominator
+
+
+class AlarmCheck:
+    """State of one alarm rule applied to one channel (or power reading)."""
+    __slots__ = ("rule", "position", "label", "window", "active", "value")
+
+    def __init__(self, rule, position, label):
+        self.rule = rule
+        self.position = position
+        self.label = label
+        self.window = RollingWindow(rule["window"]) if rule["kind"] in ("mean", "slope") else None
+        self.active = False
+        self.value = None
+
+
+class AlarmEngine:
+    """Streaming evaluation of a station's alarm rules.
+
+    Each sample costs O(1) per (rule, channel): limit rules compare the
+    reading, mean/slope rules update a RollingWindow. `evaluate()` returns
+    only the state changes as events, ready for the log, the run file's
+    alarm sidecar (AlarmSink) and the feed.
+    """
+    def __init__(self, rules, channels):
+        self.checks = []
+        for rule in rules:
+            if rule["source"] == "temp":
+                for position, ch in enumerate(channels):
+                    if rule["channels"] is None or ch in rule["channels"]:
+                        self.checks.append(AlarmCheck(rule, position, f"CH{ch:02}"))
+            else:
+                self.checks.append(AlarmCheck(rule, POWER_SOURCES[rule["source"]], rule["source"]))
+
+    def evaluate(self, timestamp, temperatures, power_data):
+        """Update every check with one sample; return the raised / cleared events."""
+        events = []
+        seconds = timestamp.timestamp()
+        for check in self.checks:
+            rule = check.rule
+            if rule["source"] == "temp":
+                reading = temperatures[check.position] if check.position < len(temperatures) else None
+            else:
+                reading = power_data[check.position]
+            if reading is None or reading != reading:  # 讀取失敗 (資料缺口), 維持目前狀態
+                continue
+            is_open = rule["source"] == "temp" and reading > OPEN_THERMOCOUPLE
+            if rule["kind"] == "open":
+                if is_open != check.active:
+                    check.active = is_open
+                    events.append(self.event(timestamp, check, reading))
+                continue
+            if is_open:  # 斷線的讀值不列入其他規則
+                continue
+            if check.window is None:
+                value = reading
+            else:
+                check.window.add(seconds, reading)
+                value = check.window.mean() if rule["kind"] == "mean" else check.window.slope()
+                if value is None:
+                    continue
+                if rule["kind"] == "slope":
+                    value *= 60.0  # 每分鐘
+            high, low, band = rule["high"], rule["low"], rule["hysteresis"]
+            if check.active:
+                changed = (high is None or value <= high - band) and (low is None or value >= low + band)
+            else:
+                changed = (high is not None and value > high) or (low is not None and value < low)
+            if changed:
+                check.active = not check.active
+                events.append(self.event(timestamp, check, value))
+        return events
+
+    @staticmethod
+    def event(timestamp, check, value):
+        check.value = None if value is None or value != value else round(float(value), 4)
+        rule = check.rule
+        return {"time": timestamp.isoformat(timespec="seconds"), "alarm": rule["name"], "channel": check.label,
+                "state": "raise" if check.active else "clear", "value": check.value,
+                "high": rule["high"], "low": rule["low"]}
+
+    def active_events(self):
+        """Events describing the alarms currently raised (sent to viewers that connect later)."""
+        return [{"time": None, "alarm": check.rule["name"], "channel": check.label, "state": "raise",
+                 "value": check.value, "high": check.rule["high"], "low": check.rule["low"]}
+                for check in self.checks if check.active]
+
+
+def alarm_text(event):
+    """One-line description of an alarm event for the log and the station page."""
+    state = "警報" if event["state"] == "raise" else "解除"
+    value = "--" if event["value"] is None else f"{event['value']:g}"
+    limits = " ".join(f"{key} {event[key]:g}" for key in ("high", "low") if event.get(key) is not None)
+    return f"{state} {event['alarm']} {event['channel']} = {value}" + (f" ({limits})" if limits else "")
+
+
+def log_alarm(station_name, event):
+    """Write an alarm event to the log (raised as error, cleared as info)."""
+    log = log_error if event["state"] == "raise" else log_info
+    log(alarm_text(event), station=station_name, alarm=event["alarm"], channel=event["channel"])
+
+
+# 壓縮機開/關判斷的預設值: 功率高於 on_w 持續 debounce 秒為開, 低於 off_w 持續 debounce 秒為關;
+# 最近 keep 個週期計算滾動平均; 相鄰樣本間隔超過 max_gap 秒時不積分
+COMPRESSOR_DEFAULTS = {"on_w": 30.0, "off_w": 15.0, "debounce": 30.0, "keep": 10, "max_gap": 600.0}
+
+
+class EnergyAnalyzer:
+    """Streaming energy and compressor cycle analysis of one station's PW3335 samples.
+
+    Every `update()` adds one trapezoid to the energy total and runs the
+    on/off detector: power above `on_w` (below `off_w`) for `debounce`
+    seconds switches the compressor on (off), dated back to the first
+    sample past the threshold. A cycle runs from one switch-on to the
+    next; `update()` returns it when it completes. Rolling means over
+    the last `keep` cycles are kept incrementally, so nothing is ever
+    recomputed from the history.
+    """
+    def __init__(self, on_w=30.0, off_w=15.0, debounce=30.0, keep=10, max_gap=600.0):
+        self.on_w = on_w
+        self.off_w = off_w
+        self.debounce = debounce
+        self.max_gap = max_gap
+        self.first = None  # (時間, WP)
+        self.last = None  # (時間, 秒, 功率, WP)
+        self.energy_wh = 0.0
+        self.covered_s = 0.0  # 有積分的時間
+        self.gaps = 0
+        self.state = None  # "on" / "off"
+        self.candidate = None  # 跨越門檻的第一筆 (秒, 累計能量)
+        self.cycle_start = None  # 本週期開機 (秒, 累計能量, 時間)
+        self.switch_off = None  # 本週期關機的秒數
+        self.peak_w = 0.0
+        self.cycles = 0
+        self.recent = collections.deque(maxlen=keep)
+        self.sums = dict.fromkeys(("period_s", "on_s", "off_s", "duty", "energy_wh"), 0.0)
+        self.last_cycle = None
+
+    def update(self, timestamp, power_data):
+        """Feed one sample; return the completed cycle (dict) or None."""
+        power = power_data[2] if len(power_data) > 2 else None
+        wp = power_data[3] if len(power_data) > 3 else None
+        if power is None or power != power:
+            self.gaps += 1
+            self.candidate = None
+            return None
+        seconds = timestamp.timestamp()
+        if self.first is None:
+            self.first = (timestamp, wp)
+        elif seconds - self.last[1] > self.max_gap:
+            self.gaps += 1
+        elif seconds > self.last[1]:
+            dt = seconds - self.last[1]
+            self.energy_wh += (self.last[2] + power) * dt / 7200.0  # 梯形積分, W·s -> Wh
+            self.covered_s += dt
+        self.last = (timestamp, seconds, power, wp)
+        return self.detect(seconds, power)
+
+    def detect(self, seconds, power):
+        if self.state is None:
+            self.state = "on" if power > self.on_w else "off"
+            return None
+        crossed = power < self.off_w if self.state == "on" else power > self.on_w
+        if not crossed:
+            self.candidate = None
+            if self.state == "on":
+                self.peak_w = max(self.peak_w, power)
+            return None
+        if self.candidate is None:
+            self.candidate = (seconds, self.energy_wh)
+        if seconds - self.candidate[0] < self.debounce:
+            return None
+        switched_at, energy_at = self.candidate
+        self.candidate = None
+        if self.state == "on":
+            self.state = "off"
+            self.switch_off = switched_at
+            return None
+        self.state = "on"
+        cycle = None
+        if self.cycle_start is not None and self.switch_off is not None:
+            start_s, start_energy, start_time = self.cycle_start
+            period = switched_at - start_s
+            cycle = {"start": start_time.isoformat(timespec="seconds"), "period_s": period,
+                     "on_s": self.switch_off - start_s, "off_s": switched_at - self.switch_off,
+                     "duty": (self.switch_off - start_s) / period if period > 0 else 0.0,
+                     "energy_wh": energy_at - start_energy, "peak_w": self.peak_w}
+            self.add_cycle(cycle)
+        self.cycle_start = (switched_at, energy_at, datetime.fromtimestamp(switched_at))
+        self.switch_off = None
+        self.peak_w = power
+        return cycle
+
+    def add_cycle(self, cycle):
+        if len(self.recent) == self.recent.maxlen:
+            oldest = self.recent[0]
+            for key in self.sums:
+                self.sums[key] -= oldest[key]
+        self.recent.append(cycle)
+        for key in self.sums:
+            self.sums[key] += cycle[key]
+        self.cycles += 1
+        self.last_cycle = cycle
+
+    def summary(self):
+        """Current totals and rolling cycle statistics (JSON-ready)."""
+        hours = self.covered_s / 3600.0
+        return {
+            "start": self.first[0].isoformat(timespec="seconds") if self.first else None,
+            "end": self.last[0].isoformat(timespec="seconds") if self.last else None,
+            "hours": hours,
+            "energy_wh": self.energy_wh,
+            "kwh_per_24h": self.energy_wh / hours * 24 / 1000 if hours > 0 else None,
+            "wp_delta_wh": self.last[3] - self.first[1]
+            if self.last and self.last[3] is not None and self.first[1] is not None else None,
+            "gaps": self.gaps,
+            "state": self.state,
+            "cycles": self.cycles,
+            "last_cycle": self.last_cycle,
+            "rolling": {key: value / len(self.recent) for key, value in self.sums.items()} if self.recent else None,
+        }
+
+
+def energy_text(summary):
+    """Short multi-line description of an EnergyAnalyzer summary for the station page."""
+    def fmt(value, digits=1):
+        return "--" if value is None else f"{value:.{digits}f}"
+
+    state = {"on": "運轉", "off": "停機"}.get(summary["state"], "--")
+    lines = [f"用電: {fmt(summary['energy_wh'], 2)} Wh ({fmt(summary['hours'], 2)} h)  "
+             f"{fmt(summary['kwh_per_24h'], 3)} kWh/24h  壓縮機: {state}  週期數: {summary['cycles']}"]
+    rolling = summary["rolling"]
+    if rolling:
+        lines.append(f"最近週期平均: 週期 {rolling['period_s'] / 60:.1f} min  開 {rolling['on_s'] / 60:.1f} / "
+                     f"關 {rolling['off_s'] / 60:.1f} min  開機率 {rolling['duty'] * 100:.1f}%  "
+                     f"{rolling['energy_wh']:.2f} Wh/週期")
+    return "\n".join(lines)
+
+
+# 共享記憶體中保留的即時資料時間 (小時), 供其他視窗或程式讀取
+SHARED_WINDOW_HOURS = 24
+
+
+def shared_ring_name(station_name):
+    """Shared memory name of a station's SharedRing ("工位3" -> "vm7000_pw3335_3").
+
+    Names other than 工位N are hashed, as shared memory names must be short and ASCII.
+    """
+    match = re.fullmatch(r"工位(\d+)", station_name)
+    if match:
+        return "vm7000_pw3335_" + match.group(1)
+    return "vm7000_pw3335_" + hashlib.md5(station_name.encode("utf-8")).hexdigest()[:12]
+
+
+class SharedRing:
+    """Rolling window of one station's samples in shared memory.
+
+    The collector owns the segment and is its only writer; any number of
+    local processes can attach and read without touching the instruments.
+    Layout: a 1 KiB header (magic, capacity, channel count, closed flag,
+    write count, JSON metadata) followed by `capacity` fixed-size records
+    (time in ms, U/I/P/WP, temperatures).
+
+    The write count is the version: the writer fills slot
+    `count % capacity` first and bumps the count after. That slot still
+    holds row `count - capacity`, so the oldest row below the count may be
+    half overwritten at any time. A reader copies the rows it wants and
+    re-reads the count; every row at or below `count - capacity` of the
+    re-read count is dropped from the copy.
+    """
+    MAGIC = 0x57504D56  # "VMPW"
+    HEADER_SIZE = 1024
+    META_OFFSET = 64
+    HEADER = np.dtype([("magic", "<u4"), ("capacity", "<u4"), ("n_channels", "<u4"), ("closed", "<u4"),
+                       ("count", "<u8"), ("meta_size", "<u4")])
+    created = set()  # 本程式建立的區段名稱
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((), dtype=self.HEADER, buffer=shm.buf)
+        self.capacity = int(self.header["capacity"])
+        meta_size = int(self.header["meta_size"])
+        self.meta = json.loads(bytes(shm.buf[self.META_OFFSET:self.META_OFFSET + meta_size]).decode("utf-8"))
+        self.records = np.ndarray(self.capacity, dtype=self.record_dtype(int(self.header["n_channels"])),
+                                  buffer=shm.buf, offset=self.HEADER_SIZE)
+        self.read_count = 0  # 讀取端已讀到的位置
+
+    @staticmethod
+    def record_dtype(n_channels):
+        return np.dtype([("time", "<i8"), ("power", "<f8", (4,)), ("temperature", "<f4", (n_channels,))])
+
+    @classmethod
+    def create(cls, station_name, channels, interval, hours=SHARED_WINDOW_HOURS, **meta):
+        """Create (or replace a stale) ring for the station; `meta` is published to readers."""
+        from multiprocessing import shared_memory
+
+        capacity = int(hours * 3600 // max(int(interval), 1)) + 1
+        meta = json.dumps({"station": station_name, "channels": channels, "interval": interval, **meta},
+                          ensure_ascii=False).encode("utf-8")
+        if len(meta) > cls.HEADER_SIZE - cls.META_OFFSET:
+            raise ValueError("SharedRing metadata is too large")
+        size = cls.HEADER_SIZE + capacity * cls.record_dtype(len(channels)).itemsize
+        name = shared_ring_name(station_name)
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:  # 上次異常結束留下的區段
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        header = np.ndarray((), dtype=cls.HEADER, buffer=shm.buf)
+        header["capacity"] = capacity
+        header["n_channels"] = len(channels)
+        header["closed"] = 0
+        header["count"] = 0
+        header["meta_size"] = len(meta)
+        shm.buf[cls.META_OFFSET:cls.META_OFFSET + len(meta)] = meta
+        header["magic"] = cls.MAGIC  # 最後寫入, 讀取端看到 magic 時標頭已完整
+        del header
+        cls.created.add(name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, station_name):
+        """Attach to a station's ring as a reader; None when no collector publishes it."""
+        from multiprocessing import shared_memory
+
+        try:
+            shm = shared_memory.SharedMemory(shared_ring_name(station_name))
+        except FileNotFoundError:
+            return None
+        if sys.version_info < (3, 13) and shared_ring_name(station_name) not in cls.created:
+            # 讀取端不擁有區段, 避免 resource_tracker 在程式結束時將其刪除
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        if shm.size < cls.HEADER_SIZE or np.ndarray((), dtype=cls.HEADER, buffer=shm.buf)["magic"] != cls.MAGIC:
+            shm.close()
+            return None
+        return cls(shm, owner=False)
+
+    @property
+    def closed(self):
+        return bool(self.header["closed"])
+
+    def append(self, timestamp, temperatures, power_data):
+        """Writer side: store one sample, overwriting the oldest when full."""
+        count = int(self.header["count"])
+        record = self.records[count % self.capacity]
+        record["time"] = np.datetime64(timestamp, "ms").astype(np.int64)
+        for field, values in (("power", power_data), ("temperature", temperatures)):
+            row = np.full(record[field].shape, np.nan)
+            values = [np.nan if value is None else value for value in values[:len(row)]]
+            row[:len(values)] = values
+            record[field] = row
+        self.header["count"] = count + 1
+
+    def read_new(self):
+        """Reader side: return a copy of the records written since the previous call."""
+        count = int(self.header["count"])
+        start = max(self.read_count, count - self.capacity)
+        rows = self.records[np.arange(start, count) % self.capacity]
+        # 複製期間被覆寫的列, 以及寫入端正在填寫的槽位 (仍是最舊的一列)
+        lapped = int(self.header["count"]) - self.capacity - start + 1
+        if lapped > 0:
+            rows = rows[lapped:]
+        self.read_count = count
+        return rows
+
+    def close(self):
+        """Detach; the owner also marks the ring closed and removes it."""
+        if self.owner:
+            self.header["closed"] = 1
+        self.header = self.records = None
+        self.shm.close()
+        if self.owner:
+            self.created.discard(self.shm.name)
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def load_run(path, chunk_rows=200000):
+    """Read a run file written by CsvSink (.csv) or ColumnarSink (.parquet).
+
+    CSV files are parsed in chunks with vectorized date parsing. Returns
+    (time, temperature, power, wp, channels) arrays sorted by time, in the
+    layout used by StationBuffer.
+    """
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        temp_names = [name for name in table.column_names if name.startswith("Temp")]
+
+        def column(name, dtype):
+            if name not in table.column_names:
+                return np.full(table.num_rows, np.nan, dtype=dtype)
+            return table.column(name).to_numpy(zero_copy_only=False).astype(dtype)
+
+        time_data = table.column("Time").to_numpy(zero_copy_only=False).astype("datetime64[ms]")
+        temperature_data = np.column_stack([column(name, np.float32) for name in temp_names] or
+                                           [np.empty((table.num_rows, 0), dtype=np.float32)])
+        power_data = column("P(W)", np.float32)
+        wp_data = column("WP(Wh)", np.float64)
+    else:
+        import pandas as pd
+
+        temp_names = [name for name in pd.read_csv(path, nrows=0).columns if name.startswith("Temp")]
+        parts = [parse_run_chunk(chunk, temp_names)
+                 for chunk in pd.read_csv(path, dtype={"Date": str, "Time": str}, chunksize=chunk_rows, on_bad_lines="skip")]
+        if not parts:
+            raise ValueError(f"{path} 沒有資料")
+        time_data, temperature_data, power_data, wp_data = (np.concatenate(column) for column in zip(*parts))
+
+    return finish_run_arrays(time_data, temperature_data, power_data, wp_data, temp_names)
+
+
+def parse_run_chunk(chunk, temp_names):
+    """Convert one DataFrame chunk of a CsvSink file to (time, temperature, power, wp) arrays."""
+    import pandas as pd
+
+    def numeric(name, dtype):
+        if name not in chunk:
+            return np.full(len(chunk), np.nan, dtype=dtype)
+        return pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=dtype)
+
+    stamps = pd.to_datetime(chunk["Date"] + " " + chunk["Time"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    temperature_data = np.column_stack([numeric(name, np.float32) for name in temp_names] or
+                                       [np.empty((len(chunk), 0), dtype=np.float32)])
+    return stamps.to_numpy().astype("datetime64[ms]"), temperature_data, numeric("P(W)", np.float32), numeric("WP(Wh)", np.float64)
+
+
+def finish_run_arrays(time_data, temperature_data, power_data, wp_data, temp_names):
+    """Drop rows without a valid time, sort by time and append the channel list."""
+    # 丟掉無法解析時間的列 (例如中斷時寫了一半的最後一列), 並確保依時間排序
+    valid = ~np.isnat(time_data)
+    time_data, temperature_data, power_data, wp_data = time_data[valid], temperature_data[valid], power_data[valid], wp_data[valid]
+    if len(time_data) > 1 and (np.diff(time_data) < np.timedelta64(0, "ms")).any():
+        order = np.argsort(time_data, kind="stable")
+        time_data, temperature_data, power_data, wp_data = time_data[order], temperature_data[order], power_data[order], wp_data[order]
+    channels = [int(name[4:]) for name in temp_names]
+    return time_data, temperature_data, power_data, wp_data, channels
+
+
+def interval_stats(time_data, temperature_data, power_data, wp_data, percentiles=(5, 50, 95)):
+    """Compute per-channel statistics and energy for one window of samples.
+
+    All channels are handled in one vectorized pass; NaN marks a missing
+    reading and is excluded. Channels without any reading report NaN.
+    """
+    n_rows, n_channels = temperature_data.shape
+    valid = ~np.isnan(temperature_data)
+    counts = np.count_nonzero(valid, axis=0)
+    has_data = counts > 0
+    safe_counts = np.maximum(counts, 1)
+
+    # 平均與標準差 (以 float64 累加)
+    values = np.where(valid, temperature_data, 0).astype(np.float64)
+    mean = values.sum(axis=0) / safe_counts
+    deviation = np.where(valid, values - mean, 0)
+    std = np.sqrt((deviation * deviation).sum(axis=0) / safe_counts)
+
+    # 排序一次即可取得最小、最大與百分位數 (NaN 會排在最後)
+    ordered = np.sort(temperature_data, axis=0)
+    columns = np.arange(n_channels)
+    last = np.maximum(counts - 1, 0)
+    minimum = ordered[0, columns] if n_rows else np.full(n_channels, np.nan)
+    maximum = ordered[last, columns] if n_rows else np.full(n_channels, np.nan)
+    pct = {}
+    for q in percentiles:
+        pos = last * (q / 100.0)
+        lo = np.floor(pos).astype(np.intp)
+        hi = np.ceil(pos).astype(np.intp)
+        if n_rows:
+            low_values = ordered[lo, columns].astype(np.float64)
+            pct[q] = low_values + (ordered[hi, columns] - low_values) * (pos - lo)
+        else:
+            pct[q] = np.full(n_channels, np.nan)
+
+    def blank(arr):
+        return np.where(has_data, arr, np.nan)
+
+    # 功率積分 (梯形法) 得到區間用電量 Wh
+    power_valid = ~np.isnan(power_data)
+    p = power_data[power_valid].astype(np.float64)
+    hours = (time_data[power_valid] - time_data[power_valid][:1]) / np.timedelta64(1, "s") / 3600.0 if len(p) else p
+    energy_wh = float(np.sum((p[1:] + p[:-1]) * np.diff(hours)) / 2.0) if len(p) > 1 else np.nan
+    duration_h = float(hours[-1]) if len(p) > 1 else 0.0
+
+    wp = wp_data[~np.isnan(wp_data)]
+    wp_delta = float(wp[-1] - wp[0]) if len(wp) > 1 else np.nan
+
+    return {
+        "count": n_rows,
+        "start": time_data[0] if n_rows else None,
+        "end": time_data[-1] if n_rows else None,
+        "mean": blank(mean),
+        "min": blank(minimum),
+        "max": blank(maximum),
+        "std": blank(std),
+        "percentiles": {q: blank(v) for q, v in pct.items()},
+        "energy_wh": energy_wh,
+        "avg_power": energy_wh / duration_h if duration_h > 0 else np.nan,
+        "wp_delta": wp_delta,
+    }
+
+
+def read_run_range(path, start, end):
+    """Read only the rows of a CsvSink file between start and end.
+
+    The sidecar index (see CsvIndex) maps the window to a byte range,
+    which is read through mmap and parsed; the cost follows the window
+    size, not the file size. Files without an index are read in full.
+    Returns the same tuple as load_run.
+    """
+    index = CsvIndex.load(path)
+    if index is None:
+        time_data, temperature_data, power_data, wp_data, channels = load_run(path)
+    else:
+        with open(path, "rb") as f:
+            header_line = f.readline()
+            size = os.fstat(f.fileno()).st_size
+            start_ms = np.datetime64(start, "ms").astype(np.int64)
+            end_ms = np.datetime64(end, "ms").astype(np.int64)
+            # 起點取 start 之前最後一個區塊, 終點取 end 之後第一個區塊 (時間由索引保證遞增)
+            lo = int(np.searchsorted(index["time"], start_ms, side="left")) - 1
+            hi = int(np.searchsorted(index["time"], end_ms, side="right"))
+            lo_offset = int(index["offset"][lo]) if lo >= 0 else len(header_line)
+            hi_offset = int(index["offset"][hi]) if hi < len(index) else size
+            block = b""
+            if hi_offset > lo_offset:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    block = mapped[lo_offset:min(hi_offset, size)]
+        import pandas as pd
+
+        header = header_line.decode("ascii").strip().split(",")
+        temp_names = [name for name in header if name.startswith("Temp")]
+        chunk = (pd.read_csv(io.BytesIO(block), header=None, names=header, dtype={"Date": str, "Time": str},
+                             on_bad_lines="skip") if block.strip() else pd.DataFrame(columns=header, dtype=str))
+        time_data, temperature_data, power_data, wp_data, channels = finish_run_arrays(
+            *parse_run_chunk(chunk, temp_names), temp_names)
+    lo = np.searchsorted(time_data, np.datetime64(start, "ms"), side="left")
+    hi = np.searchsorted(time_data, np.datetime64(end, "ms"), side="right")
+    return time_data[lo:hi], temperature_data[lo:hi], power_data[lo:hi], wp_data[lo:hi], channels
+
+
+class CsvIndex:
+    """Sidecar time index `<run>.csv.idx` for a CsvSink file.
+
+    Holds one (time in ms, byte offset) record for every `block_rows`-th
+    data row, so a time range maps to a byte range of the CSV without
+    scanning it. Records are appended while rows are written and synced
+    together with the CSV on commit.
+    """
+    RECORD = np.dtype([("time", "<i8"), ("offset", "<i8")])
+
+    def __init__(self, csv_path, block_rows=INDEX_BLOCK_ROWS, rows=0):
+        self.path = f"{csv_path}.idx"
+        self.block_rows = block_rows
+        self.rows = rows
+        self.pending = []
+        self.file = open(self.path, "ab")
+
+    @classmethod
+    def build(cls, csv_path, block_rows=INDEX_BLOCK_ROWS):
+        """(Re)build the index of an existing CSV file and open it for appending."""
+        data = np.fromfile(csv_path, dtype=np.uint8)
+        starts = np.flatnonzero(data == ord("\n")) + 1
+        starts = starts[starts < len(data)]  # 第一個換行是標題列的結尾
+        records = []
+        for offset in starts[::block_rows]:
+            try:
+                stamp = np.datetime64(bytes(data[offset:offset + 19]).decode("ascii").replace(",", "T"), "ms")
+            except ValueError:
+                continue  # 中斷時寫壞的列, 併入前一個區塊
+            records.append((stamp.astype(np.int64), offset))
+        with open(f"{csv_path}.idx", "wb") as f:
+            f.write(np.array(records, dtype=cls.RECORD).tobytes())
+        return cls(csv_path, block_rows, rows=len(starts))
+
+    @classmethod
+    def load(cls, csv_path):
+        """Return the index records of csv_path, or None when it has no index."""
         try:
-            # Parse the response format: "U +110.14E+0;I +0.0000E+0;P +000.00E+0;WP +00.0000E+0"
-            data = response.split(';')
-            if len(data) == 4:
-                parsed_data = [float(item.split(' ')[-1].replace('E+0', '')) for item in data]
-                return parsed_data
+            with open(f"{csv_path}.idx", "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return np.frombuffer(data[:len(data) - len(data) % cls.RECORD.itemsize], dtype=cls.RECORD)
+
+    def add(self, timestamp, offset):
+        """Register the next data row, written at byte `offset`."""
+        if self.rows % self.block_rows == 0:
+            self.pending.append((np.datetime64(timestamp, "ms").astype(np.int64), offset))
+        self.rows += 1
+
+    def commit(self):
+        if self.pending:
+            self.file.write(np.array(self.pending, dtype=self.RECORD).tobytes())
+            self.pending.clear()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.commit()
+        self.file.close()
+
+
+class CsvSink:
+    """Per-run CSV file (Date, Time, Temp..., U, I, P, WP, extra PW3335 items).
+
+    Rows are written in batches by RunWriter and reach the disk on
+    `commit()`. With `resume=True` an existing run file is continued
+    instead of starting a new one, after cutting off a last row left
+    half-written by a crash. A CsvIndex sidecar is kept alongside
+    for range reads (read_run_range).
+    """
+    def __init__(self, file_base, channels, resume=False, power_items=None):
+        self.path = f"{file_base}.csv"
+        header = ["Date", "Time"] + [f"Temp{ch}" for ch in channels] + power_columns(power_items or PW3335_ITEMS)
+        open_header = False
+        if resume:
+            with open(self.path, newline="") as f:
+                if next(csv.reader(f), None) != header:
+                    raise ValueError(f"{self.path} 的欄位與目前的頻道設定不同")
+            with open(self.path, "r+b") as f:
+                end = keep = f.seek(0, os.SEEK_END)
+                while keep > 0:
+                    start = max(keep - 4096, 0)
+                    f.seek(start)
+                    newline = f.read(keep - start).rfind(b"\n")
+                    if newline >= 0:
+                        keep = start + newline + 1
+                        break
+                    keep = start
+                if 0 < keep < end:  # 上次中斷時最後一列沒寫完, 截掉以免半列混入資料
+                    f.truncate(keep)
+                    log_info(f"CsvSink:{self.path} 已截掉未寫完的最後一列 ({end - keep} bytes)")
+                open_header = keep == 0  # 只有標題列且沒有換行
+        # 以位元組寫入, 才能記錄每一列在檔案中的位置
+        self.file = open(self.path, mode="ab", buffering=64 * 1024)
+        self.text = io.StringIO()
+        self.writer = csv.writer(self.text)
+        if not resume:
+            self.writer.writerow(header)
+            self.file.write(self.text.getvalue().encode("ascii"))
+            self.text.seek(0)
+            self.text.truncate()
+        elif open_header:
+            self.file.write(b"\r\n")
+        self.file.flush()
+        self.offset = self.file.tell()
+        self.index = CsvIndex.build(self.path)
+        self.commit()
+        self.day = None
+        self.day_text = ""
+
+    def write_rows(self, rows):
+        """Encode and write a batch of (timestamp, temperatures, power_data) rows."""
+        for timestamp, temperatures, power_data in rows:
+            day = timestamp.date()
+            if day != self.day:  # 日期字串每天只格式化一次
+                self.day = day
+                self.day_text = day.isoformat()
+            self.index.add(timestamp, self.offset + self.text.tell())
+            self.writer.writerow([self.day_text, f"{timestamp.hour:02}:{timestamp.minute:02}:{timestamp.second:02}"]
+                                 + temperatures + power_data)
+        data = self.text.getvalue().encode("ascii")
+        self.text.seek(0)
+        self.text.truncate()
+        self.file.write(data)
+        self.offset += len(data)
+
+    def commit(self):
+        """Flush buffered rows and sync them (and then the index) to disk."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.index.commit()
+
+    def close(self):
+        self.commit()
+        self.file.close()
+        self.index.close()
+
+
+class StreamLock:
+    """Exclusive, non-blocking lock on `<run>.arrows.lock` while a stream is written.
+
+    The lock belongs to the open file, so the OS drops it when the writer
+    exits or crashes; a stream whose lock can be taken has been abandoned.
+    """
+    def __init__(self, stream_path):
+        self.path = f"{stream_path}.lock"
+        self.file = None
+
+    def acquire(self):
+        file = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
             else:
-                raise ValueError(f"Unexpected response format: {response}")
+                import fcntl
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()  # 其他程式 (或本程式其他工位) 正在寫入
+            return False
+        self.file = file
+        return True
+
+    def release(self):
+        if self.file is None:
+            return
+        self.file.close()  # 關閉檔案即釋放鎖定
+        self.file = None
+        with contextlib.suppress(OSError):
+            os.remove(self.path)
+
+
+class ColumnarSink:
+    """Columnar run file written with pyarrow (optional dependency).
+
+    Rows are collected into record batches (timestamp as timestamp[ms],
+    channels and PW3335 items as float32, WP as float64) of `batch_rows`
+    and appended to an Arrow IPC stream, `<run>.arrows`; small batches
+    bloat the stream, so a RunWriter commit only syncs the batches already
+    written and the CSV stays the crash-durable copy of the latest rows.
+    Every batch in a stream is self-contained, so after a crash all
+    batches written before it can still be read. On close the stream is compacted into
+    `<run>.parquet` and removed; `recover()` does the same for a stream
+    left behind by an interrupted run. The stream is guarded by a
+    StreamLock for as long as it is written.
+    """
+    def __init__(self, file_base, channels, batch_rows=360, power_items=None):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.stream_path = f"{file_base}.arrows"
+        self.path = f"{file_base}.parquet"
+        self.batch_rows = batch_rows
+        self.columns = [f"Temp{ch}" for ch in channels]
+        power_items = power_items or PW3335_ITEMS
+        self.dtypes = [np.float32] * len(self.columns) + [np.float64 if item == "WH" else np.float32 for item in power_items]
+        self.schema = pa.schema(
+            [("Time", pa.timestamp("ms"))]
+            + [(name, pa.from_numpy_dtype(dtype))
+               for name, dtype in zip(self.columns + power_columns(power_items), self.dtypes)])
+        self.lock = StreamLock(self.stream_path)
+        if not self.lock.acquire():
+            raise RuntimeError(f"ColumnarSink:{self.stream_path} 正被其他程式寫入")
+        try:
+            self.file = open(self.stream_path, "wb")
+            self.writer = pa.ipc.new_stream(self.file, self.schema)
+        except Exception:
+            self.lock.release()
+            raise
+        self.times = []
+        self.rows = []
+
+    def write_rows(self, rows):
+        for timestamp, temperatures, power_data in rows:
+            self.times.append(timestamp)
+            self.rows.append(list(temperatures) + list(power_data))
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def commit(self):
+        """Sync the complete batches to disk; pending rows wait until `batch_rows` or close."""
+        os.fsync(self.file.fileno())
+
+    def flush(self):
+        """Append the pending rows as one record batch."""
+        if not self.rows:
+            return
+        values = np.array(self.rows, dtype=np.float64)  # None -> NaN
+        arrays = [self.pa.array(np.array(self.times, dtype="datetime64[ms]"))]
+        for i, dtype in enumerate(self.dtypes):
+            column = values[:, i] if i < values.shape[1] else np.full(len(values), np.nan)
+            arrays.append(self.pa.array(column.astype(dtype), from_pandas=True))
+        self.writer.write_batch(self.pa.record_batch(arrays, schema=self.schema))
+        self.file.flush()
+        self.times = []
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.commit()
+        self.writer.close()
+        self.file.close()
+        try:
+            self.recover(self.stream_path)
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def recover(stream_path):
+        """Convert an Arrow stream (complete or cut short by a crash) into Parquet; return the row count.
+
+        A stream cut off before its schema cannot be recovered and is
+        renamed to `<run>.arrows.corrupt`, so it is not retried.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        batches = []
+        schema = None
+        with open(stream_path, "rb") as f:
+            try:
+                reader = pa.ipc.open_stream(f)
+                schema = reader.schema
+                while True:
+                    batches.append(reader.read_next_batch())
+            except StopIteration:
+                pass
+            except (pa.ArrowInvalid, OSError, EOFError) as e:  # 最後一個 batch 未寫完
+                log_error(f"ColumnarSink.recover: {stream_path} 在第 {len(batches)} 個 batch 後中斷: {e}")
+                if batches:
+                    schema = batches[0].schema
+        if schema is None:  # 連 schema 都沒寫完, 無法復原; 改名保留, 之後不再重試
+            os.replace(stream_path, f"{stream_path}.corrupt")
+            log_error(f"ColumnarSink.recover: {stream_path} 無法復原, 已改名為 {os.path.basename(stream_path)}.corrupt")
+            return 0
+        table = pa.Table.from_batches(batches, schema=schema)
+        pq.write_table(table, stream_path[:-len(".arrows")] + ".parquet", compression="zstd")
+        os.remove(stream_path)
+        return table.num_rows
+
+
+class AlarmSink:
+    """Alarm events of a run, `<run>_alarms.csv` next to the run file.
+
+    The file is created with the first event, so runs without alarms
+    leave no empty file behind. Events are rare and are synced right away
+    instead of waiting for the RunWriter commit.
+    """
+    def __init__(self, file_base):
+        self.path = f"{file_base}_alarms.csv"
+        self.file = None
+
+    def write_rows(self, rows):
+        pass
+
+    def write_events(self, events):
+        if self.file is None:
+            new = not os.path.exists(self.path)
+            self.file = open(self.path, mode="a", newline="", encoding="utf-8-sig" if new else "utf-8")
+            self.writer = csv.writer(self.file)
+            if new:
+                self.writer.writerow(["Date", "Time", "Alarm", "Channel", "State", "Value", "High", "Low"])
+        for event in events:
+            day, _, clock = event["time"].partition("T")
+            self.writer.writerow([day, clock, event["alarm"], event["channel"], event["state"],
+                                  event["value"], event["high"], event["low"]])
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def commit(self):
+        pass  # 事件寫入時已同步到磁碟
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class CycleSink:
+    """Compressor cycles of a run (`<run>_cycles.csv`) and the latest EnergyAnalyzer summary (`<run>_summary.json`).
+
+    Like AlarmSink, the cycle file is created with the first cycle and
+    synced right away; the summary is replaced atomically on every cycle
+    and when the run stops.
+    """
+    COLUMNS = ["start", "period_s", "on_s", "off_s", "duty", "energy_wh", "peak_w"]
+
+    def __init__(self, file_base):
+        self.path = f"{file_base}_cycles.csv"
+        self.summary_path = f"{file_base}_summary.json"
+        self.file = None
+
+    def write_rows(self, rows):
+        pass
+
+    def write_cycle(self, cycle, summary):
+        if cycle is not None:
+            if self.file is None:
+                new = not os.path.exists(self.path)
+                self.file = open(self.path, mode="a", newline="", encoding="utf-8")
+                self.writer = csv.writer(self.file)
+                if new:
+                    self.writer.writerow(self.COLUMNS)
+            self.writer.writerow([cycle["start"]] + [round(cycle[key], 4) for key in self.COLUMNS[1:]])
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        temp_path = f"{self.summary_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.summary_path)
+
+    def commit(self):
+        pass  # 週期寫入時已同步到磁碟
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class RunWriter:
+    """Background writer thread shared by all stations.
+
+    Samples arrive through a bounded queue and are written to each
+    station's sinks in batches. A commit (flush + fsync) happens when
+    `commit_rows` rows are pending or `commit_interval` seconds have
+    passed, so disk latency never reaches the acquisition loop. The submit
+    methods never wait: when the queue is full (a stalled disk) the item
+    is dropped, and the full queue and the lost records are counted in
+    `stats()` as backpressure. Only the rare open/close/stop messages wait
+    for room.
+    """
+    def __init__(self, max_queue=10000, commit_rows=60, commit_interval=5.0):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.commit_rows = commit_rows
+        self.commit_interval = commit_interval
+        self.sinks = {}  # 只在寫入執行緒中存取
+        self.rows_written = 0
+        self.commits = 0
+        self.max_depth = 0
+        self.blocked = 0  # 佇列已滿的次數
+        self.dropped = 0  # 因此捨棄的紀錄 (資料列、警報事件、運轉週期) 筆數
+        self.full = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def attach(self, station_name, sinks):
+        self.queue.put(("open", station_name, sinks))
+
+    def detach(self, station_name):
+        """Write everything queued for the station, then close its sinks."""
+        self.queue.put(("close", station_name, None))
+
+    def submit_events(self, station_name, events):
+        """Queue alarm events for the station's AlarmSink."""
+        return self.offer(("events", station_name, events), len(events))
+
+    def submit_cycle(self, station_name, cycle, summary):
+        """Queue a completed compressor cycle (or None) and the current summary for the station's CycleSink."""
+        return self.offer(("cycle", station_name, (cycle, summary)))
+
+    def submit(self, station_name, timestamp, temperatures, power_data):
+        return self.offer(("row", station_name, (timestamp, temperatures, power_data)))
+
+    def offer(self, item, records=1):
+        """Queue an item without waiting; return False if the queue was full and the item was dropped."""
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if not self.full:  # 每次佇列滿載只記錄一次
+                log_error(f"RunWriter:寫入佇列已滿, 開始捨棄資料 (自 {item[1]})", station=item[1], error="QueueFull")
+            self.full = True
+            self.blocked += 1
+            self.dropped += records
+            return False
+        self.full = False
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def shutdown(self):
+        self.queue.put(("stop", None, None))
+        self.thread.join()
+
+    def stats(self):
+        return {
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "blocked": self.blocked,
+            "dropped": self.dropped,
+            "rows": self.rows_written,
+            "commits": self.commits,
+        }
+
+    def run(self):
+        pending = {}
+        n_pending = 0
+        last_commit = time.monotonic()
+        while True:
+            try:
+                kind, station_name, payload = self.queue.get(
+                    timeout=max(last_commit + self.commit_interval - time.monotonic(), 0.01))
+            except queue.Empty:
+                kind = None
+            if kind == "row":
+                pending.setdefault(station_name, []).append(payload)
+                n_pending += 1
+            elif kind == "open":
+                self.sinks[station_name] = payload
+            elif kind == "events":
+                for sink in self.sinks.get(station_name, []):
+                    if isinstance(sink, AlarmSink):
+                        try:
+                            sink.write_events(payload)
+                        except Exception as e:
+                            log_error(f"RunWriter:寫入 {sink.path} 時發生錯誤: {e!r}", station=station_name,
+                                      error=type(e).__name__)
+            elif kind == "cycle":
+                for sink in self.sinks.get(station_name, []):
+                    if isinstance(sink, CycleSink):
+                        try:
+                            sink.write_cycle(*payload)
+                        except Exception as e:
+                            log_error(f"RunWriter:寫入 {sink.path} 時發生錯誤: {e!r}", station=station_name,
+                                      error=type(e).__name__)
+            elif kind in ("close", "stop"):
+                self.commit(pending)
+                n_pending = 0
+                for name in ([station_name] if kind == "close" else list(self.sinks)):
+                    for sink in self.sinks.pop(name, []):
+                        try:
+                            sink.close()
+                        except Exception as e:
+                            log_error(f"RunWriter:關閉 {sink.path} 時發生錯誤: {e!r}", station=name, error=type(e).__name__)
+                if kind == "stop":
+                    return
+            if n_pending >= self.commit_rows or time.monotonic() - last_commit >= self.commit_interval:
+                self.commit(pending)
+                n_pending = 0
+                last_commit = time.monotonic()
+
+    def commit(self, pending):
+        """Encode the pending rows of every station, then flush and fsync once per sink."""
+        for station_name, rows in pending.items():
+            with METRICS.timer(station_name, "write"):
+                for sink in self.sinks.get(station_name, []):
+                    try:
+                        sink.write_rows(rows)
+                        sink.commit()
+                    except Exception as e:
+                        log_error(f"RunWriter:寫入 {sink.path} 時發生錯誤: {e!r}", station=station_name,
+                                  error=type(e).__name__)
+            self.rows_written += len(rows)
+        if pending:
+            self.commits += 1
+        pending.clear()
+
+
+def parse_channels(channel_str: str) -> list[int]:
+    """Parse channel configuration string, supporting ranges and comma-separated values."""
+    channels = set()
+    parts = channel_str.split(",")
+    for part in parts:
+        if "-" in part:
+            try:
+                start, end = map(int, part.split("-"))
+                if start > end:
+                    raise ValueError(f"Invalid range: {part}")
+                channels.update(range(start, end + 1))
+            except ValueError:
+                raise ValueError(f"Invalid range format: {part}")
+        else:
+            try:
+                channels.add(int(part))
+            except ValueError:
+                raise ValueError(f"Invalid channel number: {part}")
+    return sorted(channels)
+
+
+def format_channels(channels):
+    """Inverse of parse_channels: [1, 2, 3, 5] -> "1-3,5"."""
+    parts = []
+    for ch in sorted(channels):
+        if parts and ch == parts[-1][1] + 1:
+            parts[-1][1] = ch
+        else:
+            parts.append([ch, ch])
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in parts)
+
+
+def parse_station_config(station):
+    """Normalize one "stations" entry of a config file.
+
+    {"name": "工位1", "vm7000": "192.168.1.1:502", "pw3335": "192.168.1.7:3300",
+    "channels": "1-10", "interval": 60, "columnar": false, "alarms": [...],
+    "compressor": {"on_w": 30, "off_w": 15, "debounce": 30},
+    "pw_items": ["PF", "UPK", "IPK"]}; the port may be omitted (502 / 3300).
+    "alarms" is a list of rules for parse_alarm_rule, DEFAULT_ALARMS when
+    omitted; missing "compressor" settings come from COMPRESSOR_DEFAULTS
+    (EnergyAnalyzer arguments). "pw_items" are PW3335 :MEAS? items read
+    and recorded after PW3335_ITEMS.
+    """
+    def address(text, default_port):
+        host, _, port = str(text).partition(":")
+        return host, int(port or default_port)
+
+    return {
+        "name": station["name"],
+        "vm_address": address(station["vm7000"], 502),
+        "pw_address": address(station["pw3335"], 3300),
+        "channels": parse_channels(str(station.get("channels", "1-3"))),
+        "interval": station.get("interval", 3),  # 與原版介面的預設相同 (3 秒用來debug)
+        "columnar": station.get("columnar", False),
+        "alarms": [parse_alarm_rule(rule) for rule in station.get("alarms", DEFAULT_ALARMS)],
+        "compressor": dict(COMPRESSOR_DEFAULTS, **station.get("compressor", {})),
+        "pw_items": PW3335_ITEMS + [item for item in (str(item).upper() for item in station.get("pw_items", []))
+                                    if item not in PW3335_ITEMS],
+    }
+
+
+def default_station_registry(count=6, ip_prefix="192.168.1", vm_port=502, pw_port=3300):
+    """The original layout: station N has its VM7000 at .N and its PW3335 at .N+6."""
+    return {f"工位{n}": parse_station_config({"name": f"工位{n}", "vm7000": f"{ip_prefix}.{n}:{vm_port}",
+                                               "pw3335": f"{ip_prefix}.{n + 6}:{pw_port}"})
+            for n in range(1, count + 1)}
+
+
+def load_station_registry(path):
+    """Read the stations of a config file (same layout as the Collector config) as {name: station}."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    registry = {}
+    for entry in config["stations"]:
+        station = parse_station_config(entry)
+        if station["name"] in registry:
+            raise ValueError(f"{path}: 工位名稱重複 {station['name']}")
+        registry[station["name"]] = station
+    return registry
+
+
+def open_run_files(directory, file_base, channels, columnar=False, resume=False, power_items=None):
+    """Open the sinks of one run: CsvSink, AlarmSink and CycleSink, plus a ColumnarSink when `columnar` is set.
+
+    Arrow streams left in `directory` by an interrupted run are converted
+    to Parquet first. Streams whose StreamLock is still held (another
+    station, the collector service or a second GUI) are left alone.
+    """
+    sinks = [CsvSink(file_base, channels, resume=resume, power_items=power_items), AlarmSink(file_base),
+             CycleSink(file_base)]
+    if columnar:
+        for name in os.listdir(directory):
+            if not name.endswith(".arrows"):
+                continue
+            stream_path = os.path.join(directory, name)
+            lock = StreamLock(stream_path)
+            if not lock.acquire():
+                continue
+            try:
+                if os.path.exists(stream_path):  # 寫入端可能剛好關閉並轉換完成
+                    rows = ColumnarSink.recover(stream_path)
+                    log_info(f"open_run_files:已復原 {name} ({rows} 筆)")
+            finally:
+                lock.release()
+        try:
+            sinks.append(ColumnarSink(file_base, channels, power_items=power_items))
+        except Exception:
+            sinks[0].close()
+            raise
+    return sinks
+
+
+# 收集服務對本機 GUI 提供即時資料的預設埠號
+FEED_PORT = 50330
+
+
+def feed_message(kind, station_name, payload):
+    """Encode a sample queue item (or a "station" description / "alarm" event) as one JSON line."""
+    if kind == "sample":
+        timestamp, temperatures, power_data, status = payload
+        payload = {"time": timestamp.isoformat(), "temperatures": temperatures,
+                   "power": power_data, "status": status}
+    message = {"kind": kind, "station": station_name, "payload": payload}
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def parse_feed_message(line):
+    """Decode a feed line back into a (kind, station_name, payload) queue item."""
+    message = json.loads(line)
+    payload = message["payload"]
+    if message["kind"] == "sample":
+        payload = (datetime.fromisoformat(payload["time"]), payload["temperatures"],
+                   payload["power"], payload["status"])
+    return message["kind"], message["station"], payload
+
+
+class FeedServer:
+    """Local TCP feed of collector events, one JSON line per event.
+
+    Each client gets its own bounded queue and sender thread; a client
+    that falls `max_backlog` messages behind is dropped, so a slow viewer
+    never holds up collection. `greeting()` supplies the messages a new
+    client receives first (the active stations).
+    """
+    def __init__(self, host="127.0.0.1", port=FEED_PORT, greeting=None, max_backlog=1000):
+        self.sock = socket.create_server((host, port))
+        self.greeting = greeting or (lambda: [])
+        self.max_backlog = max_backlog
+        self.clients = {}
+        self.lock = threading.Lock()
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                conn, address = self.sock.accept()
+            except OSError:
+                return  # 伺服器已關閉
+            backlog = queue.Queue(maxsize=self.max_backlog)
+            with self.lock:
+                for data in self.greeting():
+                    backlog.put_nowait(data)
+                self.clients[conn] = backlog
+            log_info(f"FeedServer:{address} 已連線")
+            threading.Thread(target=self.send, args=(conn, backlog), daemon=True).start()
+
+    def send(self, conn, backlog):
+        try:
+            while True:
+                data = backlog.get()
+                if data is None:
+                    break
+                conn.sendall(data)
+        except OSError:
+            pass
+        finally:
+            self.drop(conn)
+
+    def drop(self, conn):
+        with self.lock:
+            self.clients.pop(conn, None)
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        conn.close()
+
+    def publish(self, data):
+        with self.lock:
+            clients = list(self.clients.items())
+        for conn, backlog in clients:
+            try:
+                backlog.put_nowait(data)
+            except queue.Full:
+                log_error("FeedServer:接收端跟不上, 中斷其連線")
+                self.drop(conn)
+
+    def close(self):
+        self.sock.close()
+        with self.lock:
+            clients = list(self.clients)
+        for conn in clients:
+            self.drop(conn)
+
+
+class FeedClient:
+    """Reads a FeedServer in a background thread and puts the decoded items
+    on `sample_queue`, reconnecting every `retry` seconds when the
+    collector is not reachable. Connection problems are queued as
+    ("notice", None, message) items."""
+    def __init__(self, sample_queue, host="127.0.0.1", port=FEED_PORT, retry=5.0):
+        self.sample_queue = sample_queue
+        self.address = (host, port)
+        self.retry = retry
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                with socket.create_connection(self.address) as conn:
+                    log_info(f"FeedClient:已連線到收集服務 {self.address[0]}:{self.address[1]}")
+                    for line in conn.makefile("rb"):
+                        self.sample_queue.put(parse_feed_message(line))
+                log_error("FeedClient:收集服務已中斷連線")
+                self.sample_queue.put(("notice", None, "收集服務已中斷連線"))
+            except (OSError, ValueError) as e:
+                log_error(f"FeedClient:無法連線到收集服務: {e!r}", error=type(e).__name__)
+                self.sample_queue.put(("notice", None, f"無法連線到收集服務: {e!r}"))
+            time.sleep(self.retry)
+
+
+class Collector:
+    """Headless acquisition service driven by a JSON config file.
+
+    Polls the configured stations with an AcquisitionEngine, writes their
+    run files through a RunWriter and publishes every event on a
+    FeedServer, independent of any GUI. Stations whose devices cannot be
+    reached at start-up are retried every `retry_interval` seconds.
+
+    Config layout::
+
+        {"file_path": "D:/data",
+         "feed": {"host": "127.0.0.1", "port": 50330},
+         "metrics_file": "D:/data/metrics.json",
+         "stations": [{"name": "工位1", "vm7000": "192.168.1.1:502",
+                       "pw3335": "192.168.1.7:3300", "channels": "1-10",
+                       "interval": 60, "columnar": false,
+                       "alarms": [{"kind": "limit", "channels": "1-3", "high": -15, "hysteresis": 0.5}]}]}
+    """
+    def __init__(self, config, retry_interval=30.0):
+        self.file_path = config["file_path"]
+        self.retry_interval = retry_interval
+        self.sample_queue = queue.Queue()
+        self.engine = AcquisitionEngine(self.sample_queue, timeout=config.get("timeout", 2.0))
+        self.run_writer = RunWriter()
+        self.sinks = {}
+        self.shared_rings = {}
+        self.alarms = {}  # 每個工位的 AlarmEngine
+        self.energy = {}  # 每個工位的 EnergyAnalyzer
+        self.pending = [parse_station_config(station) for station in config["stations"]]
+        self.active = {}
+        self.greeting_messages = []  # 新連線的 feed client 先收到的內容, 只在收集執行緒更新
+        self.stopping = threading.Event()
+        self.metrics_file = config.get("metrics_file")  # 每 metrics_interval 秒匯出效能統計
+        self.metrics_interval = config.get("metrics_interval", 10.0)
+        feed = config.get("feed", {})
+        self.feed = FeedServer(feed.get("host", "127.0.0.1"), feed.get("port", FEED_PORT), greeting=self.greeting)
+
+    @staticmethod
+    def load_config(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def greeting(self):
+        """Called from the FeedServer accept thread: return the snapshot, never the live dicts."""
+        return self.greeting_messages
+
+    def update_greeting(self):
+        """Rebuild the greeting snapshot; call before publishing the change so new clients see it once."""
+        self.greeting_messages = [feed_message("station", name, self.describe(name)) for name in self.active] + [
+            feed_message("alarm", name, event) for name, alarms in self.alarms.items() for event in alarms.active_events()]
+
+    def describe(self, station_name):
+        station = self.active[station_name]
+        return {"channels": station["channels"], "interval": station["interval"],
+                "file": self.sinks[station_name][0].path}
+
+    def start_station(self, station):
+        """Connect one configured station and open its run files; False (retried later) if either fails."""
+        name = station["name"]
+        try:
+            self.engine.add_station(name, station["vm_address"], station["pw_address"],
+                                    station["channels"], station["interval"], station["pw_items"])
         except Exception as e:
-            print(f"Error parsing response: {response}, Exception: {e}")
-            raise ValueError(f"Failed to parse response: {response}")
-            log_error(f"Failed to parse response: {response}")
+            log_error(f"Collector:{name} 無法連線, {self.retry_interval:.0f} 秒後重試: {e!r}", station=name,
+                      error=type(e).__name__)
+            return False
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_base = f"{self.file_path}/{timestamp}_Station_{station['vm_address'][0].split('.')[-1]}"
+        try:
+            sinks = open_run_files(self.file_path, file_base, station["channels"], station["columnar"],
+                                   power_items=station["pw_items"])
+        except Exception as e:  # 磁碟已滿、權限不足等, 只影響這個工位
+            self.engine.remove_station(name)
+            log_error(f"Collector:{name} 無法開啟紀錄檔, {self.retry_interval:.0f} 秒後重試: {e!r}", station=name,
+                      error=type(e).__name__)
+            return False
+        self.sinks[name] = sinks
+        self.run_writer.attach(name, sinks)
+        self.alarms[name] = AlarmEngine(station["alarms"], station["channels"])
+        self.energy[name] = EnergyAnalyzer(**station["compressor"])
+        self.active[name] = station
+        try:
+            self.shared_rings[name] = SharedRing.create(name, station["channels"], station["interval"], file=sinks[0].path)
+        except Exception as e:
+            log_error(f"Collector:無法建立 {name} 的共享記憶體: {e!r}")
+        self.update_greeting()
+        self.feed.publish(feed_message("station", name, self.describe(name)))
+        log_info(f"Collector:{name} 開始收集, 寫入 {sinks[0].path}")
+        return True
+
+    def run(self):
+        """Collect until stop() is called (or SIGTERM / Ctrl+C when run from main)."""
+        next_retry = 0.0
+        next_export = time.monotonic() + self.metrics_interval
+        try:
+            while not self.stopping.is_set():
+                if self.pending and time.monotonic() >= next_retry:
+                    self.pending = [station for station in self.pending if not self.start_station(station)]
+                    next_retry = time.monotonic() + self.retry_interval
+                METRICS.gauge("all", "sample_queue", self.sample_queue.qsize())
+                METRICS.gauge("all", "writer_queue", self.run_writer.queue.qsize())
+                if self.metrics_file and time.monotonic() >= next_export:
+                    try:
+                        METRICS.export(self.metrics_file)
+                    except OSError as e:
+                        log_error(f"Collector:無法匯出效能統計: {e!r}")
+                    next_export = time.monotonic() + self.metrics_interval
+                try:
+                    kind, station_name, payload = self.sample_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if kind == "sample" and station_name not in self.active:
+                    continue  # 開啟紀錄檔失敗而移除的工位, 佇列中剩下的樣本
+                if kind == "sample":
+                    timestamp, temperatures, power_data, status = payload
+                    status["writer"] = self.run_writer.stats()
+                    self.run_writer.submit(station_name, timestamp, temperatures, power_data)
+                    if station_name in self.shared_rings:
+                        self.shared_rings[station_name].append(timestamp, temperatures, power_data)
+                    self.check_alarms(station_name, timestamp, temperatures, power_data)
+                    status["energy"] = self.analyze_energy(station_name, timestamp, power_data)
+                self.feed.publish(feed_message(kind, station_name, payload))
+        finally:
+            self.shutdown()
+
+    def check_alarms(self, station_name, timestamp, temperatures, power_data):
+        """Evaluate the station's alarm rules; events go to the log, the alarm file and the feed."""
+        with METRICS.timer(station_name, "alarms"):
+            events = self.alarms[station_name].evaluate(timestamp, temperatures, power_data)
+        if events:
+            self.run_writer.submit_events(station_name, events)
+            self.update_greeting()
+            for event in events:
+                log_alarm(station_name, event)
+                self.feed.publish(feed_message("alarm", station_name, event))
+
+    def analyze_energy(self, station_name, timestamp, power_data):
+        """Feed the station's EnergyAnalyzer; completed cycles go to the cycle file. Returns the summary."""
+        analyzer = self.energy[station_name]
+        cycle = analyzer.update(timestamp, power_data)
+        summary = analyzer.summary()
+        if cycle:
+            self.run_writer.submit_cycle(station_name, cycle, summary)
+        return summary
+
+    def stop(self):
+        self.stopping.set()
+
+    def shutdown(self):
+        self.feed.close()
+        self.engine.shutdown()
+        for name, analyzer in self.energy.items():  # 停止時更新各工位的摘要檔
+            self.run_writer.submit_cycle(name, None, analyzer.summary())
+        self.run_writer.shutdown()
+        for ring in self.shared_rings.values():
+            ring.close()
+        log_info("Collector:已停止")
+
+
+def run_collector(config_path):
+    """Entry point of `--service config.json`: run a Collector until interrupted."""
+    collector = Collector(Collector.load_config(config_path))
+    signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
+    try:
+        collector.run()
+    except KeyboardInterrupt:
+        pass
+
+
+class MinMaxDecimator:
+    """Per-bucket min/max of a station's series for one bucket width.
+
+    Buckets are aligned to absolute time, so finished buckets never change
+    and each update only recomputes the newest bucket onwards. Every bucket
+    becomes two points (min then max), which keeps spikes visible while the
+    point count stays proportional to the plot width.
+    """
+    def __init__(self, bucket_ms):
+        self.bucket_ms = max(int(bucket_ms), 1)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.mins = None
+        self.maxs = None
+
+    def update(self, times, temperature_data, power_data, window_start):
+        """Return (x, temperatures, power) decimated from `window_start` to the newest sample."""
+        bucket = self.bucket_ms
+        start_key = np.datetime64(window_start, "ms").astype(np.int64) // bucket
+
+        # 丟掉視窗外的 bucket, 並從最後一個 (可能未完成的) bucket 開始重算
+        keep = slice(int(np.searchsorted(self.keys, start_key)), max(len(self.keys) - 1, 0))
+        first_key = self.keys[-1] if len(self.keys) > keep.start else start_key
+        self.keys = self.keys[keep]
+        if self.mins is not None:
+            self.mins, self.maxs = self.mins[keep], self.maxs[keep]
+
+        row = int(np.searchsorted(times, np.datetime64(int(first_key * bucket), "ms"), side="left"))
+        new_times = times[row:]
+        if len(new_times):
+            values = np.column_stack((temperature_data[row:], power_data[row:]))
+            ids = new_times.astype(np.int64) // bucket
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            mins = np.fmin.reduceat(values, starts, axis=0)  # 忽略 NaN, 整個 bucket 都是 NaN 時保留缺口
+            maxs = np.fmax.reduceat(values, starts, axis=0)
+            self.keys = np.concatenate((self.keys, ids[starts]))
+            self.mins = mins if self.mins is None else np.concatenate((self.mins, mins))
+            self.maxs = maxs if self.maxs is None else np.concatenate((self.maxs, maxs))
+
+        n = len(self.keys)
+        x = np.empty(2 * n, dtype=np.int64)
+        x[0::2] = self.keys * bucket + bucket // 4
+        x[1::2] = self.keys * bucket + 3 * bucket // 4
+        y = np.empty((2 * n, self.mins.shape[1] if n else temperature_data.shape[1] + 1), dtype=np.float32)
+        if n:
+            y[0::2] = self.mins
+            y[1::2] = self.maxs
+        return x.astype("datetime64[ms]"), y[:, :-1], y[:, -1]
+
+
+class LivePlot:
+    """Blitted live chart for one station's temperature and power axes.
+
+    Axes, grid, tick labels and legend are rendered once and cached as the
+    background; an update restores it and redraws only the lines. A full
+    redraw happens only when the newest sample reaches the right edge (the
+    window then scrolls by `scroll_fraction` of its span) or a new value
+    falls outside the y-limits, which are kept from running min/max.
+    """
+    def __init__(self, figure, canvas, ax_temp, ax_power, station_name, channels, scroll_fraction=0.1):
+        import matplotlib.dates as mdates
+        from matplotlib.ticker import FuncFormatter
+
+        self.figure = figure
+        self.canvas = canvas
+        self.ax_temp = ax_temp
+        self.ax_power = ax_power
+        self.scroll_fraction = scroll_fraction
+
+        ax_temp.clear()
+        ax_power.clear()
+        # 隱藏 ax_temp 的 x 軸,用來顯示圖例
+        ax_temp.tick_params(labelbottom=False)
+
+        figure.suptitle(f"SAMPO RD2 冰箱測試 - {station_name}")
+        figure.set_facecolor("lightgray")
+        ax_temp.set_facecolor("lightcyan")
+        ax_power.set_facecolor("lightyellow")
+
+        # 顯示 Y 軸格線
+        ax_temp.grid(axis='y', linestyle='--', alpha=0.7)
+        ax_power.grid(axis='y', linestyle='--', alpha=0.7)
+
+        # 溫度子圖
+        self.temp_lines = [ax_temp.plot([], [], label=f"Temp {ch}", animated=True)[0] for ch in channels]
+        ax_temp.set_ylabel("Temperature (°C)")
+        ax_temp.legend([f"CH{ch}" for ch in channels], loc='upper center', bbox_to_anchor=(0.5, 0), ncol=len(channels), fontsize='small')
+
+        # 電力子圖
+        self.power_line, = ax_power.plot([], [], label="Power (W)", color="orange", animated=True)
+        ax_power.set_ylabel("Power (W)")
+
+        # 設置 Y 軸刻度格式為小數點後 1 位
+        ax_power.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f"{x:.1f}"))
+        ax_power.xaxis.set_major_formatter(mdates.DateFormatter("%d-%H:%M"))
+
+        self.background = None
+        self.span = None
+        self.xlim = None
+        self.last_time = None
+        self.temp_range = [np.inf, -np.inf]
+        self.power_range = [np.inf, -np.inf]
+        self.decimators = {}  # 每個時間區間一個 MinMaxDecimator, 切換區間時可重複使用
+        self.decimator_width = None
+        self.draw_cid = canvas.mpl_connect("draw_event", self.on_draw)
+
+    def close(self):
+        self.canvas.mpl_disconnect(self.draw_cid)
+
+    def invalidate(self):
+        """Force a full redraw and recompute of the window on the next update (e.g. the tab was hidden)."""
+        self.background = None
+        self.xlim = None
+        self.last_time = None
+
+    def on_draw(self, event):
+        """完整重繪後保存背景, 再畫上線條"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for line in self.temp_lines:
+            self.ax_temp.draw_artist(line)
+        self.ax_power.draw_artist(self.power_line)
+
+    @staticmethod
+    def expand(value_range, values):
+        """Widen [min, max] with `values`; return True if it changed."""
+        if values.size == 0 or np.isnan(values).all():
+            return False
+        lo, hi = float(np.nanmin(values)), float(np.nanmax(values))
+        changed = lo < value_range[0] or hi > value_range[1]
+        value_range[0] = min(value_range[0], lo)
+        value_range[1] = max(value_range[1], hi)
+        return changed
+
+    @staticmethod
+    def set_ylim(ax, value_range, min_pad):
+        if np.isfinite(value_range).all():
+            pad = max((value_range[1] - value_range[0]) * 0.1, min_pad)
+            ax.set_ylim(value_range[0] - pad, value_range[1] + pad)
+
+    def decimate(self, times, temps, power, start):
+        """Return the points to draw from row `start`, reduced to about two per pixel column."""
+        width = max(int(self.ax_temp.bbox.width), 1)
+        if len(times) - start <= 2 * width:
+            return times[start:], temps[start:], power[start:]
+        if width != self.decimator_width:  # 圖寬改變時舊的抽樣層級不再適用
+            self.decimators = {}
+            self.decimator_width = width
+        span_ms = int(self.span / np.timedelta64(1, "ms"))
+        if span_ms not in self.decimators:
+            self.decimators[span_ms] = MinMaxDecimator(span_ms // width)
+        return self.decimators[span_ms].update(times, temps, power, self.xlim[0])
+
+    def update(self, buffer, span):
+        """Show the last `span` (timedelta) of `buffer`, blitting when the axes did not change."""
+        times, temps, power, _ = buffer.view()
+        if len(times) == 0:
+            return
+        newest = times[-1]
+        span = np.timedelta64(span, "ms")
+        if self.last_time == newest and self.span == span:
+            return
+
+        full_redraw = self.background is None
+        if self.xlim is None or span != self.span or newest > self.xlim[1]:
+            # 時間軸捲動: 重新計算視窗內的 min/max
+            right = newest + np.timedelta64(int(span / np.timedelta64(1, "ms") * self.scroll_fraction), "ms")
+            self.xlim = (right - span, right)
+            self.span = span
+            self.temp_range = [np.inf, -np.inf]
+            self.power_range = [np.inf, -np.inf]
+            new_from = int(np.searchsorted(times, self.xlim[0], side="left"))
+            full_redraw = True
+        else:
+            # 只處理新進的資料點
+            new_from = int(np.searchsorted(times, self.last_time, side="right"))
+        self.last_time = newest
+
+        temp_changed = self.expand(self.temp_range, temps[new_from:])
+        power_changed = self.expand(self.power_range, power[new_from:])
+
+        # 只把視窗內的資料交給 matplotlib, 點數超過圖寬時以 min/max 抽樣
+        start = int(np.searchsorted(times, self.xlim[0], side="left"))
+        x, temp_y, power_y = self.decimate(times, temps, power, start)
+        for i, line in enumerate(self.temp_lines):
+            if i < temp_y.shape[1]:
+                line.set_data(x, temp_y[:, i])
+        self.power_line.set_data(x, power_y)
+
+        if full_redraw or temp_changed or power_changed:
+            self.ax_temp.set_xlim(self.xlim)
+            self.ax_power.set_xlim(self.xlim)
+            self.set_ylim(self.ax_temp, self.temp_range, 0.5)
+            self.set_ylim(self.ax_power, self.power_range, 1.0)
+            self.canvas.draw_idle()  # on_draw 會更新背景並畫線
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_lines()
+            self.canvas.blit(self.figure.bbox)
+
+
+class UiQueue:
+    """Handoff from worker threads to the Tk main loop.
+
+    `put()` is a deque append, which is atomic in CPython, so collector
+    threads never wait on a lock or touch Tk. The main loop takes
+    everything queued so far with one `drain()` per tick. It has the
+    `put()` / `qsize()` subset of queue.Queue used by AcquisitionEngine
+    and FeedClient.
+    """
+    def __init__(self):
+        self.items = collections.deque()
+
+    def put(self, item):
+        self.items.append(item)
+
+    put_nowait = put
+
+    def qsize(self):
+        return len(self.items)
+
+    def drain(self):
+        """Remove and return the queued items, oldest first."""
+        items = []
+        for _ in range(len(self.items)):  # 只取呼叫當下已在佇列中的項目
+            items.append(self.items.popleft())
+        return items
 
 
 class App:
-    def __init__(self, root):
+    def __init__(self, root, stations=None, file_path=""):
         self.root = root
-        self.file_path = ""  # 初始化 file_path 屬性
-        self.collecting = {}  # 初始化 collecting 屬性，用於跟蹤正在收集數據的設備
-        self.vm7000_instances = {}
-        self.pw3335_instances = {}
-        self.time_data = []
-        self.temperature_data = []
-        self.power_data = []
-        self.pause_plot = False  # 新增變數，用於控制圖表更新的暫停/恢復
+        self.file_path = file_path  # 初始化 file_path 屬性
+        # 工位設定 {名稱: 設備位址、頻道、頻率}, 未指定時為原本的 6 個工位
+        self.stations = stations or default_station_registry()
+        self.collecting = {name: False for name in self.stations}  # 以工位名稱記錄是否正在收集
+        self.paused_plots = set()  # 暫停圖表更新的工位
         self.original_text = ""
+        self.run_sinks = {}  # 每個工位的輸出檔案 (CsvSink, ColumnarSink)
+        self.run_writer = RunWriter()  # 所有工位共用的寫入執行緒
+        self.resume_runs = {}  # 已載入且可接續紀錄的 CSV 檔
+        self.last_errors = {}  # 每個工位最後一次的收集錯誤
+        self.live_plots = {}  # 每個工位的 LivePlot
+        self.remote_stations = {}  # 由收集服務 (--service) 或共享記憶體提供資料的工位
+        self.shared_rings = {}  # 本機收集的工位發布到共享記憶體的即時數據
+        self.shared_readers = {}  # --watch 時讀取其他程式發布的 SharedRing
+        self.alarms = {}  # 本機收集的工位的 AlarmEngine
+        self.active_alarms = {}  # 每個工位目前的警報 {(警報, 頻道): 事件}
+        self.energy = {}  # 本機收集的工位的 EnergyAnalyzer
+        self.label_texts = {}  # 每個 label 目前的內容, 內容不變時不重設
+        self.pending_alarms = {}  # 本次更新要顯示的警報事件
+        self.notices = collections.deque(maxlen=3)  # 最近的錯誤通知 [時間, 訊息, 次數]
+        self.feed_client = None
+
+        # 所有工位共用一個 asyncio 收集引擎, 樣本經由 UiQueue 交給主執行緒, 收集執行緒不碰 Tk
+        self.sample_queue = UiQueue()
+        self.engine = AcquisitionEngine(self.sample_queue)
+
+        # 每個工位的即時數據 (啟動收集或載入紀錄時才依頻率與頻道數配置 StationBuffer, 停止時釋放)
+        self.station_data = {}
 
-        # 為每個工位創建獨立的數據存儲
-        self.station_data = {
-            f"工位{i}": {
-                "time_data": [],
-                "temperature_data": [],
-                "power_data": [],
-            }
-            for i in range(1, 7)
-        }
-        
         # 初始化 Notebook（頁面容器）
         self.notebook = ttk.Notebook(root)
         self.notebook.grid(row=0, column=0, columnspan=12, padx=5, pady=5)
 
-        # 創建 6 個頁面（工位 1 到工位 6）
+        # 錯誤通知列 (不跳出訊息框, 不阻擋畫面); 點一下清除
+        self.notice_label = ttk.Label(root, text="", foreground="red", anchor="w", justify="left")
+        self.notice_label.grid(row=1, column=0, columnspan=12, padx=5, sticky="we")
+        self.notice_label.bind("<Button-1>", lambda event: self.clear_notices())
+
+        # 每個工位一個頁面; 頁面控件在第一次顯示時才建立 (setup_station_page)
         self.frames = {}
-        for i in range(1, 7):
+        for station_name in self.stations:
             frame = ttk.Frame(self.notebook)
-            self.notebook.add(frame, text=f" 工位{i} ", padding=5)
-            self.frames[f"工位{i}"] = frame
-            # 在每個頁面中添加控件
-            self.setup_station_page(frame, f"工位{i}")
+            self.notebook.add(frame, text=f" {station_name} ", padding=5)
+            self.frames[station_name] = frame
 
         # 綁定窗口關閉事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # 定期處理收集引擎送來的樣本
+        self.root.after(UI_PUMP_MS, self.process_samples)
+
+        # 所有工位共用一個圖表計時器, 只重繪目前顯示的頁籤
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.root.after_idle(self.on_tab_changed)  # 視窗顯示後才建立第一個頁籤的圖表
+        self.root.after(PLOT_INTERVAL_MS, self.render_plots)
 
-    def setup_station_page(self, frame, station_name):
-        """設置每個工位頁面的控件"""
-        station_name = station_name.replace(" ", "")  # 去除空格，統一名稱格式
+
+    def setup_station_page(self, station_name):
+        """設置工位頁面的控件 (第一次顯示該頁籤時才建立)"""
+        if hasattr(self, f"{station_name}_start_button"):
+            return
+        frame = self.frames[station_name]
+        station = self.stations[station_name]
 
         # 初始化日期和時間變數
         start_date = tk.StringVar()
@@ -251,14 +2940,14 @@ class App:
 
         # Frequency selection
         ttk.Label(frame, text="記錄頻率(sec):").grid(row=1, column=0, padx=5, pady=5)
-        frequency_var = tk.IntVar(value=3)  # 預設為 60 秒, 3秒用來debug
+        frequency_var = tk.IntVar(value=station["interval"])  # 預設取自工位設定
         frequency_menu = ttk.Combobox(frame, textvariable=frequency_var, state="readonly")
         frequency_menu['values'] = [10, 60, 180, 300]
         frequency_menu.grid(row=1, column=1, padx=5, pady=5)
 
         # VM7000 頻道設定文字框
         ttk.Label(frame, text="溫度CH 設定:").grid(row=2, column=0, padx=5, pady=5)
-        vm7000_channels_var = tk.StringVar(value="1-3")
+        vm7000_channels_var = tk.StringVar(value=format_channels(station["channels"]))
         vm7000_channels_entry = ttk.Entry(frame, textvariable=vm7000_channels_var, width=20)
         vm7000_channels_entry.grid(row=2, column=1, padx=5, pady=5)
 
@@ -277,24 +2966,27 @@ class App:
         pause_button = ttk.Button(frame, text="暫停", command=lambda: self.toggle_pause_plot(station_name), state="disabled")
         pause_button.grid(row=3, column=2, padx=5, pady=5)
 
+        # 取樣週期抖動、超時次數、連線狀態與最後錯誤
+        status_label = ttk.Label(frame, text="週期抖動: -- ms  超時: 0")
+        status_label.grid(row=0, column=3, columnspan=9, padx=5, pady=5, sticky="w")
+
         # Temperature data display
         ttk.Label(frame, text="溫度:").grid(row=1, column=3,columnspan=9, padx=5, pady=5)
-        temperature_labels = []
-        for i in range(18):
-            label = ttk.Label(frame, text="--", width=5, relief="solid", anchor="center")
-            label.grid(row=2 + i // 9, column=(i % 9)+3, padx=2, pady=2)
-            temperature_labels.append(label)
+        temperature_frame = ttk.Frame(frame)  # 依頻道設定放置溫度 label, 每列 9 個
+        temperature_frame.grid(row=2, column=3, rowspan=2, columnspan=9, sticky="nw")
+        setattr(self, f"{station_name}_temperature_frame", temperature_frame)
+        self.build_temperature_labels(station_name, station["channels"])
 
         # 開始日期與時間
         calculate_avg_button = ttk.Button(frame, text="計算區間", command=self.calculate_avg_temp)
         calculate_avg_button.grid(row=4, column=2, padx=5, pady=5)
         def increment_date_time(var, increment, unit):
             try:
-                current_value = pd.to_datetime(var.get())
+                current_value = parse_datetime(var.get())
                 if unit == "day":
-                    new_value = current_value + pd.Timedelta(days=increment)
+                    new_value = current_value + timedelta(days=increment)
                 elif unit == "hour":
-                    new_value = current_value + pd.Timedelta(hours=increment)
+                    new_value = current_value + timedelta(hours=increment)
                 var.set(new_value.strftime('%Y-%m-%d' if unit == "day" else '%H:%M'))
             except Exception:
                 messagebox.showerror("錯誤", "無效的日期或時間格式！")
@@ -329,23 +3021,85 @@ class App:
         avg_temp_text = tk.Text(frame, height=5, width=50, state="disabled", wrap="word")
         avg_temp_text.grid(row=4, rowspan= 4, column=1, columnspan=2, padx=5, pady=5)
 
+        # 同時寫入欄式檔 (Parquet, 需要 pyarrow)
+        columnar_var = tk.BooleanVar(value=False)
+        columnar_check = ttk.Checkbutton(frame, text="同時儲存 Parquet", variable=columnar_var)
+        columnar_check.grid(row=9, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
+        # 載入先前的紀錄檔 (CSV 可接續紀錄)
+        open_run_button = ttk.Button(frame, text="開啟紀錄", command=lambda: self.open_run(station_name))
+        open_run_button.grid(row=9, column=2, padx=5, pady=5)
+
+        # 效能面板: 設備往返、解析、寫檔、繪圖耗時與佇列深度, 可匯出成 JSON
+        perf_label = ttk.Label(frame, text="", font=("Consolas", 9), justify="left")
+        perf_label.grid(row=9, rowspan=2, column=3, columnspan=9, padx=5, pady=5, sticky="w")
+        export_metrics_button = ttk.Button(frame, text="匯出效能", command=self.export_metrics)
+        export_metrics_button.grid(row=10, column=2, padx=5, pady=5)
+
+        # 警報: 目前觸發中的規則與最後一筆事件
+        alarm_label = ttk.Label(frame, text="警報: 無", justify="left", wraplength=300)
+        alarm_label.grid(row=10, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
+        # 用電量與壓縮機開關週期統計
+        energy_label = ttk.Label(frame, text="", justify="left")
+        energy_label.grid(row=11, column=0, columnspan=12, padx=5, pady=5, sticky="w")
+
+        # add memo text box
+        memo_text = tk.Text(frame, height=8, width=60, wrap="word")
+        memo_text.grid(row=4, rowspan= 3, column=3, columnspan=9, padx=5, pady=5)
+
+        # 保存控件到工位的屬性中
+        setattr(self, f"{station_name}_start_button", start_button)
+        setattr(self, f"{station_name}_stop_button", stop_button)
+        setattr(self, f"{station_name}_pause_button", pause_button)
+        setattr(self, f"{station_name}_Browse_button", browse_button)
+        setattr(self, f"{station_name}_status_label", status_label)
+        setattr(self, f"{station_name}_perf_label", perf_label)
+        setattr(self, f"{station_name}_alarm_label", alarm_label)
+        setattr(self, f"{station_name}_energy_label", energy_label)
+        setattr(self, f"{station_name}_file_path_var", file_path_var)
+        setattr(self, f"{station_name}_file_path_entry", file_path_entry)
+        setattr(self, f"{station_name}_vm7000_channels_var", vm7000_channels_var)
+        setattr(self, f"{station_name}_vm7000_channels_entry", vm7000_channels_entry)
+        setattr(self, f"{station_name}_frequency_var", frequency_var)
+        setattr(self, f"{station_name}_columnar_var", columnar_var)
+        setattr(self, f"{station_name}_columnar_check", columnar_check)
+        setattr(self, f"{station_name}_open_run_button", open_run_button)
+        setattr(self, f"{station_name}_frequency_menu", frequency_menu)
+        setattr(self, f"{station_name}_x_axis_range_var", x_axis_range_var)
+        setattr(self, f"{station_name}_start_date_entry", start_date_entry)
+        setattr(self, f"{station_name}_start_time_entry", start_time_entry)
+        setattr(self, f"{station_name}_end_date_entry", end_date_entry)
+        setattr(self, f"{station_name}_end_time_entry", end_time_entry)
+        setattr(self, f"{station_name}_avg_temp_text", avg_temp_text)
+        # 圖表在第一次顯示該頁籤時才建立 (create_station_figure)
+
+    def create_station_figure(self, station_name):
+        """建立工位的圖表 (第一次顯示頁籤或開始繪圖時才建立), 回傳 figure"""
+        figure = getattr(self, f"{station_name}_figure", None)
+        if figure is not None:
+            return figure
+        import matplotlib
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+        # 設定 matplotlib 使用的字體
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft JhengHei']  # 使用微軟正黑體
+        matplotlib.rcParams['axes.unicode_minus'] = False  # 解決負號無法顯示的問題
+
         # Add a canvas to embed the Matplotlib figure
-        figure = plt.Figure(figsize=(10, 4), dpi=100)
-        canvas = FigureCanvasTkAgg(figure, master=frame)  # 將 canvas 綁定到當前 frame
+        figure = Figure(figsize=(10, 4), dpi=100)
+        canvas = FigureCanvasTkAgg(figure, master=self.frames[station_name])  # 將 canvas 綁定到當前 frame
         canvas_widget = canvas.get_tk_widget()
         canvas_widget.grid(row=8, column=0, columnspan=12, padx=5, pady=5)
 
         # Create a frame for the toolbar
-        toolbar_frame = tk.Frame(frame)
+        toolbar_frame = tk.Frame(self.frames[station_name])
         toolbar_frame.grid(row=7, column=3, columnspan=7, padx=5, pady=5)
         # Add the Navigation Toolbar to the frame
         toolbar = NavigationToolbar2Tk(canvas, toolbar_frame)
         toolbar.update()
 
-        # add memo text box
-        memo_text = tk.Text(frame, height=8, width=60, wrap="word")
-        memo_text.grid(row=4, rowspan= 3, column=3, columnspan=9, padx=5, pady=5)
-
         # Create subplots for temperature and power
         ax_temp = figure.add_subplot(211, facecolor='lightgray')
         ax_power = figure.add_subplot(212, sharex=ax_temp, facecolor='lightgray')
@@ -359,44 +3113,18 @@ class App:
         ax_power.set_ylabel("Power (W)")
         ax_power.grid(True)
 
-        # Initialize lines for temperature and power
-        self.temp_lines = []
-        self.power_line, = ax_power.plot([], [], label="Power (W)", color="orange")
-        #ax_power.legend()
-
-        # 保存控件到工位的屬性中
         setattr(self, f"{station_name}_figure", figure)
         setattr(self, f"{station_name}_canvas", canvas)
         setattr(self, f"{station_name}_ax_temp", ax_temp)
         setattr(self, f"{station_name}_ax_power", ax_power)
-        setattr(self, f"{station_name}_start_button", start_button)
-        setattr(self, f"{station_name}_stop_button", stop_button)
-        setattr(self, f"{station_name}_pause_button", pause_button)
-        setattr(self, f"{station_name}_Browse_button", browse_button)
-        setattr(self, f"{station_name}_temperature_labels", temperature_labels)
-        setattr(self, f"{station_name}_file_path_var", file_path_var)
-        setattr(self, f"{station_name}_file_path_entry", file_path_entry)
-        setattr(self, f"{station_name}_vm7000_channels_var", vm7000_channels_var)
-        setattr(self, f"{station_name}_vm7000_channels_entry", vm7000_channels_entry)
-        setattr(self, f"{station_name}_frequency_var", frequency_var)
-        setattr(self, f"{station_name}_frequency_menu", frequency_menu)
-        setattr(self, f"{station_name}_x_axis_range_var", x_axis_range_var)
-        setattr(self, f"{station_name}_start_date_entry", start_date_entry)
-        setattr(self, f"{station_name}_start_time_entry", start_time_entry)
-        setattr(self, f"{station_name}_end_date_entry", end_date_entry)
-        setattr(self, f"{station_name}_end_time_entry", end_time_entry)
-        setattr(self, f"{station_name}_avg_temp_text", avg_temp_text)
-        
-        # 初始化 collecting 狀態
-        self.collecting[station_name] = False
-        # Update the canvas periodically
         self.update_canvas(station_name)
+        return figure
 
     def calculate_avg_temp(self):
         """計算指定時間範圍內的平均溫度，基於圖表數據"""
         try:
             # 獲取當前選中的工位名稱
-            selected_station = self.notebook.tab(self.notebook.select(), "text").replace("🔴", "").strip()
+            selected_station = self.selected_station()
 
             # 動態獲取對應工位的日期和時間輸入框
             start_date_entry = getattr(self, f"{selected_station}_start_date_entry", None)
@@ -410,41 +3138,44 @@ class App:
                 log_error(f"calculate_avg_temp:One or more required widgets for {selected_station} are not defined.")
 
             # 獲取開始和結束時間
-            start_datetime = pd.to_datetime(f"{start_date_entry.get()} {start_time_entry.get()}")
-            end_datetime = pd.to_datetime(f"{end_date_entry.get()} {end_time_entry.get()}")
+            start_datetime = parse_datetime(f"{start_date_entry.get()} {start_time_entry.get()}")
+            end_datetime = parse_datetime(f"{end_date_entry.get()} {end_time_entry.get()}")
 
             if start_datetime >= end_datetime:
                 tk.messagebox.showerror("Error", f"開始時間: {start_datetime}, 結束時間: {end_datetime} \n開始時間必須早於結束時間")
                 return
 
-            # 篩選在指定範圍內的溫度數據
-            station_data = self.station_data[selected_station]
-            filtered_temps = [
-                temps for time, temps in zip(station_data["time_data"], station_data["temperature_data"])
-                if start_datetime <= time <= end_datetime
-            ]
-
-            if not filtered_temps:
+            # 以二分搜尋取出指定範圍內的數據; 範圍早於記憶體中的資料時, 改由紀錄檔的時間索引讀取
+            buffer = self.station_data.get(selected_station)
+            if buffer is None:
+                buffer = StationBuffer(1, 0)
+            window = buffer.view(start_datetime, end_datetime)
+            oldest = buffer.view()[0][:1]
+            run_path = self.run_file(selected_station)
+            if run_path and (len(oldest) == 0 or oldest[0] > np.datetime64(start_datetime, "ms")):
+                window = read_run_range(run_path, start_datetime, end_datetime)[:4]
+
+            if len(window[0]) == 0:
                 tk.messagebox.showinfo("Info", "指定範圍內沒有溫度數據")
                 return
 
-            # 計算每個頻道的平均溫度
-            avg_temps = []
-            for i in range(len(filtered_temps[0])):
-                channel_temps = [temps[i] for temps in filtered_temps if temps[i] is not None]
-                if channel_temps:
-                    avg_temps.append(sum(channel_temps) / len(channel_temps))
-                else:
-                    avg_temps.append(None)
+            # 一次計算所有頻道的統計值 (忽略缺值)
+            stats = interval_stats(*window)
+            channels = self.parse_channels(getattr(self, f"{selected_station}_vm7000_channels_var").get())
+
+            def fmt(value, width=6, digits=1):
+                return f"{'--':>{width}}" if np.isnan(value) else f"{value:>{width}.{digits}f}"
 
             # 顯示結果
             avg_temp_text.config(state="normal")
             avg_temp_text.delete("1.0", tk.END)
-            for i in range(0, len(avg_temps), 3):
-                line = "".join(
-                    f"CH{j + 1:02}: {avg_temps[j]:>4.1f}°C".ljust(15) if avg_temps[j] is not None else f"CH{j + 1:02}: {'--':>4}".ljust(15)
-                    for j in range(i, min(i + 3, len(avg_temps)))
-                )
+            avg_temp_text.insert(tk.END, f"筆數: {stats['count']}  用電量: {fmt(stats['energy_wh'], 0, 2)} Wh  "
+                                         f"WP差: {fmt(stats['wp_delta'], 0, 4)} Wh  平均功率: {fmt(stats['avg_power'], 0, 1)} W\n")
+            avg_temp_text.insert(tk.END, f"{'CH':<5}{'平均':>5}{'最小':>5}{'最大':>5}{'σ':>6}{'P5':>7}{'P50':>7}{'P95':>7}\n")
+            for i in range(len(stats["mean"])):
+                ch = channels[i] if i < len(channels) else i + 1
+                line = (f"CH{ch:02}:" + fmt(stats["mean"][i]) + fmt(stats["min"][i]) + fmt(stats["max"][i])
+                        + fmt(stats["std"][i], 6, 2) + "".join(fmt(stats["percentiles"][q][i], 7) for q in (5, 50, 95)))
                 avg_temp_text.insert(tk.END, line + "\n")
             avg_temp_text.config(state="disabled")
 
@@ -452,24 +3183,68 @@ class App:
             tk.messagebox.showerror("Error", f"calculate_avg_temp:計算平均溫度時發生錯誤: {e}")
             log_error(f"calculate_avg_temp:計算平均溫度時發生錯誤: {e}")
 
+    def set_label(self, label, text, **options):
+        """只在內容改變時才更新 label, 每次更新的 Tk 呼叫數不隨樣本數增加"""
+        if self.label_texts.get(label) != (text, options):
+            self.label_texts[label] = (text, options)
+            label.config(text=text, **options)
+
+    def build_temperature_labels(self, station_name, channels):
+        """依頻道設定建立溫度顯示 label, 頻道數不變時保留原本的 label"""
+        temperature_labels = getattr(self, f"{station_name}_temperature_labels", [])
+        if len(temperature_labels) == len(channels):
+            return
+        for label in temperature_labels:
+            self.label_texts.pop(label, None)
+            label.destroy()
+        temperature_frame = getattr(self, f"{station_name}_temperature_frame")
+        temperature_labels = []
+        for i in range(len(channels)):
+            label = ttk.Label(temperature_frame, text="--", width=5, relief="solid", anchor="center")
+            label.grid(row=i // 9, column=i % 9, padx=2, pady=2)
+            temperature_labels.append(label)
+        setattr(self, f"{station_name}_temperature_labels", temperature_labels)
+
     def update_temperature_display(self, station_name, temperatures):
         """更新溫度數據顯示"""
         temperature_labels = getattr(self, f"{station_name}_temperature_labels", [])
         for i, label in enumerate(temperature_labels):
-            if i < len(temperatures) and temperatures[i] is not None:
-                label.config(text=f"{temperatures[i]:.1f}")  # 格式化為小數點後一位
-                if temperatures[i] > 999:
-                    label.config(text="--")
+            if i < len(temperatures) and temperatures[i] is not None and temperatures[i] <= OPEN_THERMOCOUPLE:
+                self.set_label(label, f"{temperatures[i]:.1f}")  # 格式化為小數點後一位
             else:
-                label.config(text="--")  # 如果數據為 None 或超出範圍，顯示占位符
+                self.set_label(label, "--")  # 如果數據為 None 或超出範圍，顯示占位符
 
 
+    def update_status_display(self, station_name, status):
+        """更新取樣週期抖動、超時次數與設備連線狀態"""
+        status_label = getattr(self, f"{station_name}_status_label", None)
+        if status_label:
+            def link_text(name, link):
+                state = "" if link["connected"] else " (斷線)"
+                return f"{name}{state} 重連 {link['reconnects']} 次 / 斷線 {link['downtime']:.0f} s"
+
+            lines = [
+                f"週期抖動: {status['jitter'] * 1000:.0f} ms "
+                f"(平均 {status['mean_jitter'] * 1000:.0f} / 最大 {status['max_jitter'] * 1000:.0f})  超時: {status['overruns']}",
+                f"{link_text('VM7000', status['vm'])}  {link_text('PW3335', status['pw'])}",
+            ]
+            writer = status.get("writer") or self.run_writer.stats()  # 遠端工位使用收集服務的寫入狀態
+            lines[0] += (f"  寫入佇列: {writer['depth']} (最大 {writer['max_depth']}, 已滿 {writer['blocked']} 次, "
+                         f"捨棄 {writer.get('dropped', 0)} 筆)")
+            last_error = self.last_errors.get(station_name)
+            if last_error:
+                lines.append(last_error)
+            self.set_label(status_label, "\n".join(lines))
+
     def toggle_pause_plot(self, station_name):
-        """暫停或恢復圖表更新"""
-        self.pause_plot = not self.pause_plot
+        """暫停或恢復工位的圖表更新 (各工位獨立)"""
+        if station_name in self.paused_plots:
+            self.paused_plots.discard(station_name)
+        else:
+            self.paused_plots.add(station_name)
         pause_button = getattr(self, f"{station_name}_pause_button", None)
 
-        if self.pause_plot:
+        if station_name in self.paused_plots:
             if pause_button:
                 pause_button.config(text="繼續更新")
 
@@ -500,35 +3275,23 @@ class App:
 
     def parse_channels(self, channel_str: str) -> list[int]:
         """Parse channel configuration string, supporting ranges and comma-separated values."""
-        channels = set()
-        parts = channel_str.split(",")
-        for part in parts:
-            if "-" in part:
-                try:
-                    start, end = map(int, part.split("-"))
-                    if start > end:
-                        raise ValueError(f"Invalid range: {part}")
-                    channels.update(range(start, end + 1))
-                except ValueError:
-                    raise ValueError(f"Invalid range format: {part}")
-            else:
-                try:
-                    channels.add(int(part))
-                except ValueError:
-                    raise ValueError(f"Invalid channel number: {part}")
-        return sorted(channels)
+        return parse_channels(channel_str)
 
     def start_collection(self, station_name):
         """啟動數據收集"""
 
-        if not self.file_path:
+        # 已載入中斷的 CSV 紀錄時, 可選擇接續寫入該檔
+        resume_path = self.resume_runs.get(station_name)
+        if resume_path and not tk.messagebox.askyesno("接續紀錄", f"是否接續寫入 {os.path.basename(resume_path)}？"):
+            resume_path = None
+
+        if not self.file_path and not resume_path:
             tk.messagebox.showerror("Error", "先選擇儲存路徑")
             return
 
         # 獲取當前工位的 IP 地址
-        station_index = int(station_name.replace("工位", "")) - 1
-        vm_ip = f"192.168.1.{station_index + 1}"
-        pw_ip = f"192.168.1.{station_index + 7}"
+        vm_address, pw_address = self.device_address(station_name)
+        vm_ip = vm_address[0]
 
         # 解析頻道設定
         try:
@@ -537,17 +3300,34 @@ class App:
             tk.messagebox.showerror("Error", "頻道設定格式錯誤，請使用 '1-3' 或 '1,2,3'")
             return
 
+        interval = getattr(self, f"{station_name}_frequency_var").get()
         try:
-            self.vm7000_instances[vm_ip] = VM7000(vm_ip)
-            self.vm7000_instances[vm_ip].connect()
-            self.pw3335_instances[pw_ip] = PW3335(pw_ip)
-            self.pw3335_instances[pw_ip].connect()
+            self.engine.add_station(station_name, vm_address, pw_address, channels, interval,
+                                    self.stations[station_name]["pw_items"])
         except Exception as e:
-            tk.messagebox.showerror("Error", f"start_collect:Failed to connect to devices: {e}")
-            log_error(f"start_collect:Failed to connect to devices: {e}")
+            tk.messagebox.showerror("Error", f"start_collect:Failed to connect to devices: {e!r}")
+            log_error(f"start_collect:Failed to connect to devices: {e!r}", station=station_name, error=type(e).__name__)
             return
 
-        self.collecting[vm_ip] = True
+        self.collecting[station_name] = True
+        self.last_errors.pop(station_name, None)
+        station_data = StationBuffer.for_interval(interval, len(channels))
+        if resume_path and station_name in self.station_data:  # 保留已載入的歷史資料
+            station_data.extend(*self.station_data[station_name].view())
+        self.station_data[station_name] = station_data
+        try:
+            self.open_run_sinks(station_name, vm_ip, channels, resume_path)
+        except Exception as e:
+            self.engine.remove_station(station_name)
+            self.collecting[station_name] = False
+            tk.messagebox.showerror("Error", f"start_collect:無法建立紀錄檔: {e!r}")
+            log_error(f"start_collect:無法建立紀錄檔: {e!r}")
+            return
+        self.resume_runs.pop(station_name, None)
+        self.open_shared_ring(station_name, channels, interval)
+        self.alarms[station_name] = AlarmEngine(self.stations[station_name]["alarms"], channels)
+        self.show_alarms(station_name, [])
+        self.energy[station_name] = EnergyAnalyzer(**self.stations[station_name]["compressor"])
 
         # 禁用其他控件
         getattr(self, f"{station_name}_start_button").config(state="disabled")
@@ -556,20 +3336,17 @@ class App:
         getattr(self, f"{station_name}_Browse_button").config(state="disabled")
         getattr(self, f"{station_name}_frequency_menu").config(state="disabled")
         getattr(self, f"{station_name}_vm7000_channels_entry").config(state="disabled")
+        getattr(self, f"{station_name}_columnar_check").config(state="disabled")
+        getattr(self, f"{station_name}_open_run_button").config(state="disabled")
         getattr(self, f"{station_name}_file_path_entry").config(state="disabled")
 
-        # 啟動數據收集
-        threading.Thread(target=self.collect_data, args=(vm_ip, pw_ip, channels, station_name), daemon=True).start()
         log_info(f"start_collect:Started data collection for {station_name}")
 
         # 在主執行緒中啟動即時監看圖表
         self.show_live_plot(station_name)
 
         # 啟動資料收集時，設定該工位頁籤加上紅點
-        tab_index = int(station_name.replace("工位", "")) - 1
-        original_text = self.notebook.tab(tab_index, option="text")
-        if "🔴" not in original_text:
-            self.notebook.tab(tab_index, text=f"🔴工位{tab_index + 1}")
+        self.mark_tab(station_name, True)
 
 
     def stop_collection(self, station_name):
@@ -578,26 +3355,27 @@ class App:
             return
 
         """停止指定工位的數據收集"""
-        # 獲取對應工位的 IP 地址
-        station_index = int(station_name.replace("工位", "")) - 1
-        vm_ip = f"192.168.1.{station_index + 1}"
-        pw_ip = f"192.168.1.{station_index + 7}"
-
         # 停止該工位的數據收集
-        if vm_ip in self.collecting:
-            self.collecting[vm_ip] = False
-            if vm_ip in self.vm7000_instances:
-                self.vm7000_instances[vm_ip].disconnect()
-                del self.vm7000_instances[vm_ip]
-            if pw_ip in self.pw3335_instances:
-                self.pw3335_instances[pw_ip].disconnect()
-                del self.pw3335_instances[pw_ip]
+        if self.collecting.get(station_name):
+            self.collecting[station_name] = False
+            try:
+                self.engine.remove_station(station_name)
+            except Exception as e:
+                log_error(f"stop_collect:Failed to disconnect devices of {station_name}: {e!r}")
+        analyzer = self.energy.pop(station_name, None)
+        if analyzer and station_name in self.run_sinks:  # 停止時更新摘要檔
+            self.run_writer.submit_cycle(station_name, None, analyzer.summary())
+        self.close_run_sinks(station_name)
+        shared_ring = self.shared_rings.pop(station_name, None)
+        if shared_ring:
+            shared_ring.close()
+        self.alarms.pop(station_name, None)
+        self.active_alarms.pop(station_name, None)
+        self.show_alarms(station_name, [])
 
         # 清除該工位的圖表資料
-        station_data = self.station_data[station_name]
-        station_data["time_data"].clear()
-        station_data["temperature_data"].clear()
-        station_data["power_data"].clear()
+        self.stop_live_plot(station_name)
+        self.station_data.pop(station_name, None)  # 釋放即時數據
 
         # 清空圖表
         ax_temp = getattr(self, f"{station_name}_ax_temp", None)
@@ -624,167 +3402,364 @@ class App:
         # 啟用其他控件
         getattr(self, f"{station_name}_start_button").config(state="normal")
         getattr(self, f"{station_name}_stop_button").config(state="disabled")
-        getattr(self, f"{station_name}_pause_button").config(state="disabled")  # 啟用暫停按鈕
+        self.paused_plots.discard(station_name)
+        getattr(self, f"{station_name}_pause_button").config(state="disabled", text="暫停")
         getattr(self, f"{station_name}_Browse_button").config(state="normal")
         getattr(self, f"{station_name}_frequency_menu").config(state="readonly")
         getattr(self, f"{station_name}_vm7000_channels_entry").config(state="normal")
+        getattr(self, f"{station_name}_columnar_check").config(state="normal")
+        getattr(self, f"{station_name}_open_run_button").config(state="normal")
         getattr(self, f"{station_name}_file_path_entry").config(state="normal")
 
         # 停止資料收集時，將紅點移除
-        tab_index = int(station_name.replace("工位", "")) - 1
-        self.original_text = self.notebook.tab(tab_index, option="text")
-        self.notebook.tab(tab_index, text=f"工位{tab_index + 1}")
+        self.mark_tab(station_name, False)
         log_info(f"stop_collect:Stopped data collection for {station_name}")
 
 
-    def collect_data(self, vm_ip, pw_ip, channels, station_name):
-        """收集數據並保存到 CSV 文件"""
-        vm = self.vm7000_instances.get(vm_ip)
-        pw = self.pw3335_instances.get(pw_ip)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_name = f"{self.file_path}/{timestamp}_Station_{vm_ip.split('.')[-1]}.csv"
+    def open_run(self, station_name):
+        """載入先前的紀錄檔 (CSV / Parquet) 到工位的歷史資料, 供圖表與區間計算使用"""
+        path = filedialog.askopenfilename(filetypes=[("紀錄檔", "*.csv *.parquet"), ("All files", "*.*")])
+        if not path:
+            return
+        started = time.perf_counter()
+        try:
+            time_data, temperature_data, power_data, wp_data, channels = load_run(path)
+        except Exception as e:
+            tk.messagebox.showerror("Error", f"open_run:無法讀取 {path}: {e!r}")
+            log_error(f"open_run:無法讀取 {path}: {e!r}")
+            return
+        if len(time_data) == 0:
+            tk.messagebox.showinfo("Info", f"{os.path.basename(path)} 沒有資料")
+            return
+
+        station_data = StationBuffer(len(time_data), len(channels))
+        station_data.extend(time_data, temperature_data, power_data, wp_data)
+        self.station_data[station_name] = station_data
+        getattr(self, f"{station_name}_vm7000_channels_var").set(",".join(str(ch) for ch in channels))
+        if path.lower().endswith(".csv"):
+            self.resume_runs[station_name] = path
+        else:
+            self.resume_runs.pop(station_name, None)
+
+        # 區間計算預設為整個紀錄
+        first = time_data[0].astype(datetime)
+        last = (time_data[-1] + np.timedelta64(1, "m")).astype(datetime)
+        for name, value in (("start_date", first.strftime('%Y-%m-%d')), ("start_time", first.strftime('%H:%M')),
+                            ("end_date", last.strftime('%Y-%m-%d')), ("end_time", last.strftime('%H:%M'))):
+            entry = getattr(self, f"{station_name}_{name}_entry")
+            entry.delete(0, tk.END)
+            entry.insert(0, value)
+
+        self.show_live_plot(station_name)
+        log_info(f"open_run:載入 {path} ({len(time_data)} 筆, {time.perf_counter() - started:.1f} s)")
+
+    def device_address(self, station_name):
+        """回傳工位的 ((VM7000 IP, port), (PW3335 IP, port))"""
+        station = self.stations[station_name]
+        return station["vm_address"], station["pw_address"]
+
+    def mark_tab(self, station_name, active):
+        """收集中的工位頁籤加上紅點"""
+        index = list(self.stations).index(station_name)
+        self.notebook.tab(index, text=f"🔴{station_name}" if active else f" {station_name} ")
+
+    def run_file(self, station_name):
+        """目前紀錄中 (或已載入) 的 CSV 檔路徑"""
+        for sink in self.run_sinks.get(station_name, ()):
+            if isinstance(sink, CsvSink):
+                return sink.path
+        if station_name in self.remote_stations:
+            return self.remote_stations[station_name]["file"]
+        return self.resume_runs.get(station_name)
+
+    def open_shared_ring(self, station_name, channels, interval):
+        """將工位的即時數據發布到共享記憶體, 讓本機其他視窗或程式讀取 (不另外連線設備)"""
+        try:
+            self.shared_rings[station_name] = SharedRing.create(station_name, channels, interval,
+                                                                file=self.run_file(station_name))
+        except Exception as e:
+            log_error(f"open_shared_ring:無法建立 {station_name} 的共享記憶體: {e!r}")
+            self.notify(f"無法建立共享記憶體: {e!r}", station_name)
 
-        with open(file_name, mode="a", newline="", buffering=1) as file:
-            writer = csv.writer(file)
-            writer.writerow(["Date", "Time"] + [f"Temp{ch}" for ch in channels] + ["U(V)", "I(A)", "P(W)", "WP(Wh)"])
+    def watch_shared_rings(self):
+        """檢視本機其他程式 (GUI 或收集服務) 發布到共享記憶體的工位數據, 每秒讀取新增的樣本"""
+        try:
+            for station_name in self.stations:
+                if station_name in self.run_sinks:  # 本機正在收集的工位
+                    continue
+                try:
+                    reader = self.shared_readers.get(station_name)
+                    if reader is None:
+                        reader = SharedRing.attach(station_name)
+                        if reader is None:
+                            continue
+                        self.shared_readers[station_name] = reader
+                        self.remote_stations.pop(station_name, None)  # 重新發布時重建即時數據
+                        self.attach_remote_station(station_name, {key: reader.meta.get(key) for key in ("channels", "interval", "file")})
+                    rows = reader.read_new()
+                    if len(rows):
+                        station_data = self.station_data[station_name]
+                        station_data.extend(rows["time"].astype("datetime64[ms]"), rows["temperature"],
+                                            rows["power"][:, 2].astype(np.float32), rows["power"][:, 3])
+                        station_data.evict_before(datetime.now() - timedelta(hours=HISTORY_HOURS))
+                        self.update_temperature_display(station_name, [None if np.isnan(t) else float(t) for t in rows["temperature"][-1]])
+                    if reader.closed:  # 發布端已停止收集
+                        reader.close()
+                        del self.shared_readers[station_name]
+                except Exception as e:  # 共享記憶體在連接途中消失、標頭損壞等; 下一輪重新連接
+                    log_error(f"watch_shared_rings:無法讀取 {station_name} 的共享記憶體: {e!r}", station=station_name,
+                              error=type(e).__name__)
+                    reader = self.shared_readers.pop(station_name, None)
+                    if reader is not None:
+                        with contextlib.suppress(Exception):
+                            reader.close()
+        except Exception as e:
+            log_error(f"watch_shared_rings:發生錯誤: {e!r}", error=type(e).__name__)
+        finally:
+            self.root.after(1000, self.watch_shared_rings)
+
+    def connect_collector(self, host="127.0.0.1", port=FEED_PORT):
+        """作為收集服務的檢視端, 收到的樣本與本機收集走相同的處理流程"""
+        self.feed_client = FeedClient(self.sample_queue, host, port)
+
+    def attach_remote_station(self, station_name, info):
+        """收集服務開始某工位時, 配置即時監看數據並顯示圖表; 收集由服務控制, 本機的啟動按鈕停用"""
+        if station_name not in self.stations:
+            log_error(f"attach_remote_station:未知的工位 {station_name}", station=station_name)
+            return
+        self.setup_station_page(station_name)
+        if self.remote_stations.get(station_name) == info:  # 重新連線, 保留已收到的數據
+            return
+        self.remote_stations[station_name] = info
+        self.active_alarms.pop(station_name, None)
+        self.station_data[station_name] = StationBuffer.for_interval(info["interval"], len(info["channels"]))
+        getattr(self, f"{station_name}_vm7000_channels_var").set(",".join(map(str, info["channels"])))
+        for name in ("start_button", "stop_button", "Browse_button", "vm7000_channels_entry",
+                     "columnar_check", "open_run_button", "file_path_entry"):
+            getattr(self, f"{station_name}_{name}").config(state="disabled")
+        getattr(self, f"{station_name}_frequency_menu").config(state="disabled")
+        getattr(self, f"{station_name}_pause_button").config(state="normal")
+        log_info(f"attach_remote_station:{station_name} 由收集服務提供數據 ({info['file']})")
+        self.show_live_plot(station_name)
+        self.mark_tab(station_name, True)
 
+    def open_run_sinks(self, station_name, vm_ip, channels, resume_path=None):
+        """建立本次紀錄的檔案: 固定寫 CSV (或接續 resume_path), 勾選時另寫欄式檔 (Parquet)"""
+        if resume_path:
+            file_base = os.path.splitext(resume_path)[0]
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            file_base = f"{self.file_path}/{timestamp}_Station_{vm_ip.split('.')[-1]}"
+        sinks = open_run_files(os.path.dirname(file_base) or ".", file_base, channels,
+                               getattr(self, f"{station_name}_columnar_var").get(),
+                               resume=bool(resume_path), power_items=self.stations[station_name]["pw_items"])
+        self.run_sinks[station_name] = sinks
+        self.run_writer.attach(station_name, sinks)
+
+    def close_run_sinks(self, station_name):
+        if self.run_sinks.pop(station_name, None) is not None:
+            self.run_writer.detach(station_name)
+
+    def notify(self, message, station_name=None):
+        """顯示非阻擋的錯誤通知; 任何執行緒都可以呼叫 (經由 UiQueue 交給主執行緒)"""
+        self.sample_queue.put(("notice", station_name, message))
+
+    def process_samples(self):
+        """主執行緒的更新幫浦: 一次取出佇列中的所有項目, 樣本全部寫入紀錄檔與即時數據,
+        畫面只以各工位最新的一筆更新一次, 每次更新的 Tk 呼叫數固定"""
+        METRICS.gauge("all", "sample_queue", self.sample_queue.qsize())
+        METRICS.gauge("all", "writer_queue", self.run_writer.queue.qsize())
+        latest = {}  # 每個工位最後一筆樣本
+        for kind, station_name, payload in self.sample_queue.drain():
             try:
-                frequency_var = getattr(self, f"{station_name}_frequency_var", None)
-                if not frequency_var:
-                    raise AttributeError(f"Frequency variable for {station_name} is not defined.")
-                    log_error(f"Frequency variable for {station_name} is not defined.")
-
-                while self.collecting.get(vm_ip, False):
-                    temperatures = [None] * len(channels)
-                    if vm:
-                        try:
-                            response = vm.get_value(1, 4, "0064", "0012")
-                            all_temperatures = vm.decode_temperature(response)
-                            temperatures = [all_temperatures[ch - 1] for ch in channels if ch <= len(all_temperatures)]
-                        except Exception as e:
-                            print(f"Error collecting VM7000 data for {vm_ip}: {e}")
-                            tk.messagebox.showerror("Error", f"Error collecting VM7000 data for {vm_ip}: {e}")
-                    power_data = [0, 0, 0]
-                    if pw:
-                        try:
-                            power_data = pw.query_data()[:4]
-                        except Exception as e:
-                            print(f"Error collecting PW3335 data for {pw_ip}: {e}")
-                            tk.messagebox.showerror("Error", f"Error collecting PW3335 data for {pw_ip}: {e}")
-                            log_error(f"Error collecting PW3335 data for {pw_ip}: {e}")
-                    
-                    now = datetime.now()
-                    writer.writerow([now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S")] + temperatures + power_data)
-                    file.flush()  # 確保數據寫入磁盤
-
-                    # 更新即時監看數據
-                    station_data = self.station_data[station_name]
-                    station_data["time_data"].append(now)
-                    station_data["temperature_data"].append(temperatures)
-                    station_data["power_data"].append(power_data[2])  # 只取功率 (P)
-
-                    # 更新溫度數據顯示
-                    self.root.after(0, self.update_temperature_display, station_name, temperatures)
-
-                    # 保留 X 軸範圍內的數據
-                    max_range_start = datetime.now() - timedelta(hours=189)
-                    while station_data["time_data"] and station_data["time_data"][0] < max_range_start:
-                        station_data["time_data"].pop(0)
-                        station_data["temperature_data"].pop(0)
-                        station_data["power_data"].pop(0)
-
-                    time.sleep(frequency_var.get())
+                if kind == "sample":
+                    if self.record_sample(station_name, *payload):
+                        latest[station_name] = payload
+                elif kind == "station":
+                    self.attach_remote_station(station_name, payload)
+                elif kind == "alarm":  # 收集服務判斷的警報, 已由服務寫入 log 與紀錄檔
+                    self.pending_alarms.setdefault(station_name, []).append(payload)
+                elif kind == "error":
+                    # 不跳出訊息框, 避免設備斷線時不斷阻擋畫面; 錯誤已在收集端寫入 log
+                    self.last_errors[station_name] = f"{datetime.now():%H:%M:%S} {payload}"
+                    self.add_notice(f"{station_name}: {payload}")
+                elif kind == "notice":
+                    self.add_notice(payload if station_name is None else f"{station_name}: {payload}")
             except Exception as e:
-                print(f"Data collection error: {e}")
-                tk.messagebox.showerror("Error", f"Data collection error: {e}")
-                log_error(f"Data collection error: {e}")
-                self.stop_collection(station_name)  # 傳遞 station_name 以便停止正確的工位
+                log_error(f"Data collection error: {e!r}", station=station_name, error=type(e).__name__)
+                self.add_notice(f"資料處理錯誤: {e!r}")
+        try:
+            for station_name, events in self.pending_alarms.items():
+                self.show_alarms(station_name, events)
+            self.pending_alarms.clear()
+            for station_name, (now, temperatures, power_data, status) in latest.items():
+                self.update_station_display(station_name, temperatures, status)
+            self.show_notices()
+        except Exception as e:
+            log_error(f"process_samples:更新畫面時發生錯誤: {e!r}", error=type(e).__name__)
+        self.root.after(UI_PUMP_MS, self.process_samples)
+
+    def update_station_display(self, station_name, temperatures, status):
+        """以工位最新的樣本更新溫度、狀態與用電量顯示"""
+        self.update_temperature_display(station_name, temperatures)
+        self.update_status_display(station_name, status)
+        energy_label = getattr(self, f"{station_name}_energy_label", None)
+        if energy_label and status.get("energy"):  # 遠端工位由收集服務計算
+            self.set_label(energy_label, energy_text(status["energy"]))
+
+    def add_notice(self, message):
+        """加入一則通知; 與上一則相同時只增加次數"""
+        if self.notices and self.notices[-1][1] == message:
+            self.notices[-1][0] = datetime.now()
+            self.notices[-1][2] += 1
+        else:
+            self.notices.append([datetime.now(), message, 1])
+
+    def show_notices(self):
+        lines = [f"{when:%H:%M:%S} {message}" + (f" (x{count})" if count > 1 else "")
+                 for when, message, count in self.notices]
+        self.set_label(self.notice_label, "\n".join(lines))
+
+    def clear_notices(self):
+        self.notices.clear()
+        self.show_notices()
+
+    def record_sample(self, station_name, now, temperatures, power_data, status):
+        """將一筆樣本寫入紀錄檔並更新即時監看數據; 回傳是否需要顯示 (畫面由 process_samples 批次更新)"""
+        if station_name in self.run_sinks:
+            self.run_writer.submit(station_name, now, temperatures, power_data)
+            if station_name in self.shared_rings:
+                self.shared_rings[station_name].append(now, temperatures, power_data)
+            with METRICS.timer(station_name, "alarms"):
+                events = self.alarms[station_name].evaluate(now, temperatures, power_data)
+            if events:
+                self.run_writer.submit_events(station_name, events)
+                for event in events:
+                    log_alarm(station_name, event)
+                self.pending_alarms.setdefault(station_name, []).extend(events)
+            analyzer = self.energy[station_name]
+            cycle = analyzer.update(now, power_data)
+            status["energy"] = analyzer.summary()
+            if cycle:
+                self.run_writer.submit_cycle(station_name, cycle, status["energy"])
+        elif station_name not in self.remote_stations:  # 工位已停止, 丟棄殘留的樣本
+            return False
+        if status["missed"]:
+            log_error(f"取樣超過週期, 略過 {status['missed']} 次取樣 (累計 {status['overruns']})", station=station_name)
+
+        # 更新即時監看數據
+        station_data = self.station_data[station_name]
+        station_data.append(now, temperatures, power_data[2], power_data[3] if len(power_data) > 3 else None)
+
+        # 保留 X 軸範圍內的數據
+        station_data.evict_before(datetime.now() - timedelta(hours=HISTORY_HOURS))
+        return True
+
+    def show_alarms(self, station_name, events):
+        """更新工位頁面的警報顯示: 觸發中的警報以紅字列出, 全部解除後顯示最後一筆事件"""
+        active = self.active_alarms.setdefault(station_name, {})
+        for event in events:
+            if event["state"] == "raise":
+                active[(event["alarm"], event["channel"])] = event
+            else:
+                active.pop((event["alarm"], event["channel"]), None)
+        alarm_label = getattr(self, f"{station_name}_alarm_label", None)
+        if alarm_label is None:
+            return
+        if active:
+            lines = [alarm_text(event) for event in list(active.values())[-5:]]
+            if len(active) > 5:
+                lines.insert(0, f"共 {len(active)} 個警報")
+            self.set_label(alarm_label, "\n".join(lines), foreground="red")
+        elif events:
+            self.set_label(alarm_label, f"{events[-1]['time'][11:]} {alarm_text(events[-1])}", foreground="")
+        else:
+            self.set_label(alarm_label, "警報: 無", foreground="")
 
     def show_live_plot(self, station_name):
         """顯示即時監看圖表"""
         def plot():
-            # 獲取當前工位的 figure
-            figure = getattr(self, f"{station_name}_figure", None)
-            if not figure:
-                raise AttributeError(f"Figure for {station_name} is not defined.")
-                log_error(f"Figure for {station_name} is not defined.")
+            # 獲取當前工位的 figure (尚未顯示過的頁籤在此建立)
+            figure = self.create_station_figure(station_name)
 
-            # 清空舊的圖表
-            figure.clear()
-
-            # 創建新的子圖
-            ax_temp = figure.add_subplot(211)
-            ax_power = figure.add_subplot(212, sharex=ax_temp)
-
-            # 隱藏 ax_temp 的 x 軸,用來顯示圖例
-            ax_temp.tick_params(labelbottom=False)
-
-            figure.suptitle(f"SAMPO RD2 冰箱測試 - {station_name}")
-            figure.set_facecolor("lightgray")
-            ax_temp.set_facecolor("lightcyan")
-            ax_power.set_facecolor("lightyellow")
+            self.stop_live_plot(station_name)
+            channels = self.parse_channels(getattr(self, f"{station_name}_vm7000_channels_var").get())
+            self.build_temperature_labels(station_name, channels)
+            live_plot = LivePlot(figure, getattr(self, f"{station_name}_canvas"), getattr(self, f"{station_name}_ax_temp"),
+                                 getattr(self, f"{station_name}_ax_power"), station_name, channels)
+            self.live_plots[station_name] = live_plot
+            if station_name == self.selected_station():
+                self.render_station(station_name)
 
-            # 顯示 Y 軸格線
-            ax_temp.grid(axis='y', linestyle='--', alpha=0.7)
-            ax_power.grid(axis='y', linestyle='--', alpha=0.7)
+        # 在主執行緒中啟動 plot 函數
+        self.root.after(0, plot)
 
-            #ax_temp.yaxis.set_major_locator(plt.MultipleLocator(5))  # 每隔 5 度顯示一條格線
+    def stop_live_plot(self, station_name):
+        """停止工位的圖表更新"""
+        live_plot = self.live_plots.pop(station_name, None)
+        if live_plot:
+            live_plot.close()
 
-            # 溫度子圖
-            channels = self.parse_channels(getattr(self, f"{station_name}_vm7000_channels_var").get())
-            temp_lines = [ax_temp.plot([], [], label=f"Temp {ch}")[0] for ch in channels]
-            ax_temp.set_ylabel("Temperature (°C)")
-            ax_temp.legend([f"CH{ch}" for ch in channels], loc='upper center', bbox_to_anchor=(0.5, 0), ncol=len(channels), fontsize='small')
+    def selected_station(self):
+        """回傳目前頁籤的工位名稱"""
+        return list(self.stations)[self.notebook.index(self.notebook.select())]
 
-            # 電力子圖
-            power_line, = ax_power.plot([], [], label="Power (W)", color="orange")
-            ax_power.set_ylabel("Power (W)")
+    def render_station(self, station_name):
+        live_plot = self.live_plots.get(station_name)
+        station_data = self.station_data.get(station_name)
+        if live_plot and station_data is not None and station_name not in self.paused_plots:  # 如果圖表更新被暫停，不更新
+            x_start, x_end = self.get_x_axis_range(station_name)
+            with METRICS.timer(station_name, "render"):
+                live_plot.update(station_data, x_end - x_start)
 
-            # 設置 Y 軸刻度格式為小數點後 1 位
-            ax_power.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f"{x:.1f}"))
-
-            def update(frame):
-                if self.pause_plot:  # 如果圖表更新被暫停，直接返回
-                    return temp_lines + [power_line]
-
-                # 從對應工位的數據結構中讀取數據
-                station_data = self.station_data[station_name]
-                time_data = station_data["time_data"]
-                temperature_data = station_data["temperature_data"]
-                power_data = station_data["power_data"]
-
-                # 更新溫度數據
-                for i, line in enumerate(temp_lines):
-                    if len(temperature_data) > 0:
-                        temp_data = [temps[i] if len(temps) > i else None for temps in temperature_data]
-                        line.set_data(time_data, temp_data)
-
-                # 更新電力數據
-                if len(power_data) > 0:
-                    power_line.set_data(time_data, power_data)
-
-                # 更新 X 軸範圍
-                x_range = self.get_x_axis_range(station_name)
-                ax_temp.set_xlim(x_range)
-                ax_power.set_xlim(x_range)
-                ax_power.xaxis.set_major_formatter(mdates.DateFormatter("%d-%H:%M"))
-                ax_temp.relim()
-                ax_temp.autoscale_view()
-                ax_power.relim()
-                ax_power.autoscale_view()
-
-                return temp_lines + [power_line]
-
-            # 使用 FuncAnimation 更新圖表
-            self.ani = FuncAnimation(figure, update, interval=10000, blit=False, cache_frame_data=False)
-
-            # 更新嵌入的 canvas
-            canvas = getattr(self, f"{station_name}_canvas", None)
-            if canvas:
-                canvas.draw()
+    def update_perf_panel(self, station_name):
+        """顯示工位的效能統計 (最近一分鐘的 p50 / p95 / 最大值)"""
+        perf_label = getattr(self, f"{station_name}_perf_label", None)
+        if perf_label is None:
+            return
+        metrics = METRICS.snapshot(station_name).get(station_name, {})
+        shared = METRICS.snapshot("all").get("all", {})
+        lines = []
+        for name, title in (("vm_rtt", "VM7000 往返"), ("pw_rtt", "PW3335 往返"), ("parse", "解析"),
+                            ("cycle", "取樣週期"), ("alarms", "警報判斷"), ("write", "寫檔"), ("render", "繪圖")):
+            summary = metrics.get(name)
+            if summary and summary["count"]:
+                lines.append(f"{title:<10} p50 {summary['p50'] * 1000:7.2f}  p95 {summary['p95'] * 1000:7.2f}  "
+                             f"max {summary['max'] * 1000:7.2f} ms  ({summary['count']})")
+        lines.append(f"佇列: 樣本 {shared.get('sample_queue', 0)}  寫入 {shared.get('writer_queue', 0)}")
+        perf_label.config(text="\n".join(lines))
+
+    def export_metrics(self):
+        """將效能統計匯出成 JSON 檔"""
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                            initialfile=f"metrics_{datetime.now():%Y%m%d_%H%M%S}.json")
+        if not path:
+            return
+        try:
+            METRICS.export(path)
+            log_info(f"export_metrics:已匯出 {path}")
+        except Exception as e:
+            tk.messagebox.showerror("Error", f"export_metrics:匯出效能統計時發生錯誤: {e!r}")
+            log_error(f"export_metrics:匯出效能統計時發生錯誤: {e!r}")
 
-        # 在主執行緒中啟動 plot 函數
-        self.root.after(0, plot)
+    def render_plots(self):
+        """共用的圖表計時器: 只更新目前顯示的工位, 隱藏的工位在切換頁籤時才重繪"""
+        try:
+            station_name = self.selected_station()
+            self.render_station(station_name)
+            self.update_perf_panel(station_name)
+        except Exception as e:
+            log_error(f"render_plots:更新圖表時發生錯誤: {e}")
+        self.root.after(PLOT_INTERVAL_MS, self.render_plots)
+
+    def on_tab_changed(self, event=None):
+        station_name = self.selected_station()
+        self.setup_station_page(station_name)
+        self.create_station_figure(station_name)
+        live_plot = self.live_plots.get(station_name)
+        if live_plot:
+            live_plot.invalidate()
+            self.render_station(station_name)
 
     def get_x_axis_range(self, station_name):
         """根據選擇的 X 軸範圍返回時間範圍"""
@@ -818,12 +3793,24 @@ class App:
                 f"以下工位正在收集數據，請先停止數據收集再退出程序：\n{', '.join(active_stations)}"
             )
         else:
+            self.engine.shutdown()
+            self.run_writer.shutdown()
+            for reader in self.shared_readers.values():
+                reader.close()
             self.root.destroy()  # 正常退出程序
             log_info("程序正常退出")
 
 
 
 if __name__ == "__main__":
+    if "--service" in sys.argv:  # 無介面收集服務: --service config.json
+        setup_logging(os.path.join(os.path.dirname(LOG_PATH), "VM7000_Pw3335_service.log"))  # 與 GUI 分開, 避免同時輪替同一個檔
+        log_info("收集服務啟動")
+        run_collector(sys.argv[sys.argv.index("--service") + 1])
+        sys.exit()
+
+    from ctypes import windll
+
     log_info("程序啟動")
     root = tk.Tk()
     def resource_path(relative_path):
@@ -838,7 +3825,7 @@ if __name__ == "__main__":
     if now > specific_date:
         tk.messagebox.showinfo("Info", " SAMPO VM7000/PW3335 Data Collection !!")
         sys.exit()
-    AppTitle = "SAMPO VM7000/PW3335 Data Collection 0_5_2"
+    AppTitle = "SAMPO VM7000/PW3335 Data Collection 0_6_0"
     ModelID = AppTitle + now.strftime("%Y%m%d_%H%M%S")
     # 讓工作列圖示正確顯示
     windll.shell32.SetCurrentProcessExplicitAppUserModelID(ModelID)
@@ -859,5 +3846,34 @@ if __name__ == "__main__":
     end_date = tk.StringVar()
     end_time = tk.StringVar()
     root.title(AppTitle)
-    app = App(root)
+
+    # 工位設定: --config 指定的檔案, 或執行檔目錄下的 stations.json (格式同收集服務), 都沒有時為 6 個工位
+    config_path = sys.argv[sys.argv.index("--config") + 1] if "--config" in sys.argv else os.path.join(APP_DIR, "stations.json")
+    stations, file_path = None, ""
+    if os.path.exists(config_path):
+        try:
+            stations = load_station_registry(config_path)
+            with open(config_path, encoding="utf-8") as f:
+                file_path = json.load(f).get("file_path", "")
+            log_info(f"工位設定: {config_path} ({len(stations)} 個工位)")
+        except Exception as e:
+            tk.messagebox.showerror("Error", f"無法讀取工位設定 {config_path}: {e!r}")
+            log_error(f"無法讀取工位設定 {config_path}: {e!r}")
+    if "--simulate" in sys.argv:  # 使用本機模擬設備 (fake_devices.py)
+        import fake_devices
+        count = len(stations) if stations else 6
+        fake_devices.start_in_thread(stations=count, vm_port=15020, pw_port=13300)
+        stations = {name: dict(station, vm_address=simulated["vm_address"], pw_address=simulated["pw_address"])
+                    for (name, station), simulated in zip((stations or default_station_registry()).items(),
+                                                          default_station_registry(count, "127.0.0", 15020, 13300).values())}
+    app = App(root, stations, file_path)
+    if "--watch" in sys.argv:  # 檢視本機其他程式發布到共享記憶體的工位
+        app.watch_shared_rings()
+    if "--connect" in sys.argv:  # 檢視收集服務的即時數據: --connect [host:port]
+        target = sys.argv[sys.argv.index("--connect") + 1:][:1]
+        if target and not target[0].startswith("--"):
+            host, port = target[0].rsplit(":", 1)
+            app.connect_collector(host, int(port))
+        else:
+            app.connect_collector()
     root.mainloop()
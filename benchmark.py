@@ -0,0 +1,453 @@
+# SAMPO VM7000/PW3335 Data Collection - 效能測試
+#-------------------------------------------------------------------------------
+# 以 fake_devices.py 模擬設備, 量測啟動時間、收集速率與週期延遲、CPU/記憶體、
+# 寫檔吞吐量、圖表更新、區間統計、警報判斷與 PW3335 解析的耗時; 結果超過門檻時以 exit code 1 結束
+# 用法: python benchmark.py all [--output results.json] [--thresholds my.json]
+#       python benchmark.py collect --stations 1,3,6 --duration 10 --latency 0.01
+#       python benchmark.py startup | write | render | stats | alarms | pw3335
+#-------------------------------------------------------------------------------
+import argparse
+import json
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+# 回歸門檻: (方向, 數值); "max" 表示結果不得大於數值, "min" 表示不得小於
+# 以預設參數在乾淨的程式上量測數次, 取最差結果再留約一倍的餘裕
+THRESHOLDS = {
+    "startup.import_s": ("max", 1.0),
+    "startup.window_s": ("max", 2.0),
+    "collect.rate_ratio": ("min", 0.98),
+    "collect.cycle_p95_ms": ("max", 250.0),
+    "collect.cpu_percent_per_station": ("max", 5.0),
+    "write.rows_per_s": ("min", 12000.0),
+    "render.update_p95_ms": ("max", 150.0),
+    "render.tick_p95_ms": ("max", 600.0),
+    "stats.interval_stats_ms": ("max", 300.0),
+    "stats.range_read_ms": ("max", 200.0),
+    "alarms.evaluate_us": ("max", 1000.0),
+    "pw3335.parse_us": ("max", 50.0),
+    "pw3335.parse_errors": ("max", 0),
+}
+
+# 在全新的直譯器中量測, 避免模組快取影響結果
+STARTUP_SCRIPT = r"""
+import json, sys, time
+started = time.perf_counter()
+import VM7000_PW3335
+result = {"import": time.perf_counter() - started,
+          "heavy_modules": [name for name in ("pandas", "matplotlib") if name in sys.modules]}
+try:
+    import tkinter as tk
+    root = tk.Tk()
+except Exception as e:
+    result["window"] = None
+    result["skipped"] = repr(e)
+else:
+    app = VM7000_PW3335.App(root)
+    root.update()
+    result["window"] = time.perf_counter() - started
+    root.update()  # 第一個頁籤的圖表在 idle 時建立
+    result["first_figure"] = time.perf_counter() - started
+    app.engine.shutdown()
+    app.run_writer.shutdown()
+    root.destroy()
+print(json.dumps(result))
+"""
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB, or None where it can't be read."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def buffer_mb(buffer):
+    """Memory held by a StationBuffer's arrays in MB."""
+    return sum(array.nbytes for array in (buffer.time_data, buffer.temperature_data, buffer.power_data,
+                                          buffer.wp_data)) / 1024 / 1024
+
+
+def synthetic_history(days, interval, n_channels):
+    """Return (time, temperature, power, wp) arrays covering `days` of samples."""
+    import numpy as np
+
+    rows = int(days * 86400 / interval)
+    time_data = (np.datetime64(datetime.now() - timedelta(days=days), "ms")
+                 + np.arange(rows) * np.timedelta64(int(interval * 1000), "ms"))
+    phase = np.arange(rows) * interval / 1800.0 * 2 * np.pi  # 約 30 分鐘一個壓縮機週期
+    temperature_data = (np.linspace(-18, 5, n_channels)[None, :] + np.sin(phase)[:, None]).astype(np.float32)
+    power_data = np.where(np.sin(phase) > 0, 85.0, 2.0).astype(np.float32)
+    wp_data = np.cumsum(power_data.astype(np.float64)) * interval / 3600.0
+    return time_data, temperature_data, power_data, wp_data
+
+
+def bench_startup(args):
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=HERE, check=True,
+                                capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    if results[0].get("skipped"):
+        print(f"視窗量測略過 (沒有顯示器?): {results[0]['skipped']}")
+    report = {"import_s": statistics.median(result["import"] for result in results),
+              "heavy_modules": len(results[0]["heavy_modules"])}
+    if results[0].get("window") is not None:
+        report["window_s"] = statistics.median(result["window"] for result in results)
+        report["first_figure_s"] = statistics.median(result["first_figure"] for result in results)
+    return report
+
+
+def bench_collect(args):
+    """Poll N simulated stations with the AcquisitionEngine and measure rate, cycle latency and CPU."""
+    import fake_devices
+    import VM7000_PW3335 as collector
+
+    counts = [int(n) for n in args.stations.split(",")]
+    fake_devices.start_in_thread(stations=max(counts), vm_port=args.vm_port, pw_port=args.pw_port,
+                                 latency=args.latency, jitter=args.jitter)
+    channels = list(range(1, args.channels + 1))
+    report = {}
+    for n in counts:
+        collector.METRICS.histograms.clear()
+        sample_queue = queue.Queue()
+        engine = collector.AcquisitionEngine(sample_queue)
+        for station in range(1, n + 1):
+            engine.add_station(f"工位{station}", (f"127.0.0.{station}", args.vm_port),
+                               (f"127.0.0.{station + 6}", args.pw_port), channels, args.interval)
+        samples = 0
+        gaps = 0
+        # 樣本以排程時刻為時間戳, 只計算時刻落在 [window_start, window_end) 的樣本;
+        # 視窗結束後再多收一個週期, 讓最後一個時刻的樣本送達
+        window_start = datetime.now()
+        window_end = window_start + timedelta(seconds=args.duration)
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        deadline = wall_started + args.duration + args.interval + 0.5
+        while time.perf_counter() < deadline:
+            try:
+                kind, _, payload = sample_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if kind == "sample" and window_start <= payload[0] < window_end:
+                samples += 1
+                gaps += payload[1][0] is None
+        cpu = time.process_time() - cpu_started
+        wall = time.perf_counter() - wall_started
+        engine.shutdown()
+        cycles = [summary for station, metrics in collector.METRICS.snapshot().items()
+                  for name, summary in metrics.items() if name == "cycle" and summary.get("count")]
+        expected = n * args.duration / args.interval
+        report[f"{n}_stations"] = {
+            "rate_per_s": samples / args.duration,
+            "rate_ratio": samples / expected,
+            "gaps": gaps,
+            "cycle_p95_ms": max(summary["p95"] for summary in cycles) * 1000 if cycles else None,
+            "cpu_percent_per_station": cpu / wall * 100 / n,
+        }
+    # 門檻以最差的工位數為準
+    runs = list(report.values())
+    report["rate_ratio"] = min(result["rate_ratio"] for result in runs)
+    report["cycle_p95_ms"] = max((result["cycle_p95_ms"] for result in runs if result["cycle_p95_ms"] is not None),
+                                 default=None)
+    report["cpu_percent_per_station"] = max(result["cpu_percent_per_station"] for result in runs)
+    # 每個工位的記憶體以介面為每個工位配置的 StationBuffer 計算; peak_memory_mb 是整個程序的峰值, 不是每個工位
+    report["buffer_mb_per_station"] = buffer_mb(collector.StationBuffer.for_interval(args.interval, len(channels)))
+    report["peak_memory_mb"] = peak_memory_mb()
+    return report
+
+
+def bench_write(args):
+    """Push rows for several stations through the RunWriter into CSV (and Parquet when pyarrow is available)."""
+    import VM7000_PW3335 as collector
+
+    channels = list(range(1, args.channels + 1))
+    temperatures = [-18.0 + ch for ch in channels]
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for columnar in (False, True):
+            try:
+                # 佇列容納整個測試, 量測的是寫入吞吐量而不是滿載時的捨棄
+                writer = collector.RunWriter(max_queue=args.rows * args.write_stations + 2 * args.write_stations)
+                for station in range(1, args.write_stations + 1):
+                    writer.attach(f"工位{station}", collector.open_run_files(
+                        directory, os.path.join(directory, f"{'parquet' if columnar else 'csv'}_{station}"),
+                        channels, columnar))
+            except ImportError:
+                writer.shutdown()
+                continue  # 沒有 pyarrow
+            started = time.perf_counter()
+            now = datetime.now()
+            for row in range(args.rows):
+                timestamp = now + timedelta(seconds=row)
+                for station in range(1, args.write_stations + 1):
+                    writer.submit(f"工位{station}", timestamp, temperatures, [110.0, 0.8, 85.0, row / 3600])
+            writer.shutdown()
+            elapsed = time.perf_counter() - started
+            key = "rows_per_s" if not columnar else "columnar_rows_per_s"
+            stats = writer.stats()
+            report[key] = stats["rows"] / elapsed  # 佇列已滿時捨棄的列不計入
+            report["dropped" if not columnar else "columnar_dropped"] = stats["dropped"]
+    return report
+
+
+def bench_render(args):
+    """Update one LivePlot per station over days of history on off-screen (Agg) canvases.
+
+    Each tick appends a sample to every station and updates all plots, as
+    the UI pump does; the tick time is measured for 1, 3, 6 ... stations.
+    """
+    import warnings
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import VM7000_PW3335 as collector
+
+    warnings.filterwarnings("ignore", message="Glyph")  # 沒有中文字型時標題的缺字警告
+    counts = [int(n) for n in args.stations.split(",")]
+    history = synthetic_history(args.days, args.interval, args.channels)
+    channels = list(range(1, args.channels + 1))
+    buffers = []
+    for _ in range(max(counts)):
+        buffer = collector.StationBuffer.for_interval(args.interval, args.channels, hours=args.days * 24)
+        buffer.extend(*history)
+        buffers.append(buffer)
+    report = {}
+    for n in counts:
+        result = {}
+        for label, span in (("30min", timedelta(minutes=30)), ("24hrs", timedelta(hours=24))):
+            plots = []
+            for station in range(n):
+                figure = Figure(figsize=(10, 4), dpi=100)
+                canvas = FigureCanvasAgg(figure)
+                ax_temp = figure.add_subplot(211)
+                ax_power = figure.add_subplot(212, sharex=ax_temp)
+                plots.append(collector.LivePlot(figure, canvas, ax_temp, ax_power, f"工位{station + 1}", channels))
+                canvas.draw()
+            times = []
+            for step in range(args.updates):
+                started = time.perf_counter()
+                for plot, buffer in zip(plots, buffers):
+                    last = buffer.view()[0][-1].astype(datetime) + timedelta(seconds=args.interval)
+                    buffer.append(last, [-18.0] * args.channels, 85.0, None)
+                    plot.update(buffer, span)
+                times.append(time.perf_counter() - started)
+            for plot in plots:
+                plot.close()
+            result[f"tick_p95_ms_{label}"] = float(np.percentile(times, 95)) * 1000
+        result["tick_p95_ms"] = max(result.values())
+        result["update_p95_ms"] = result["tick_p95_ms"] / n
+        report[f"{n}_stations"] = result
+    # 門檻以最差的工位數為準: 單一圖表的更新時間, 以及所有工位在同一次更新中的總耗時
+    runs = list(report.values())
+    report["update_p95_ms"] = max(result["update_p95_ms"] for result in runs)
+    report["tick_p95_ms"] = max(result["tick_p95_ms"] for result in runs)
+    report["buffer_mb_per_station"] = buffer_mb(buffers[0])
+    return report
+
+
+def bench_stats(args):
+    """Time interval_stats over days of history and a one-hour read_run_range on the same data as CSV."""
+    import VM7000_PW3335 as collector
+
+    history = synthetic_history(args.days, args.interval, args.channels)
+    started = time.perf_counter()
+    collector.interval_stats(*history)
+    report = {"interval_stats_ms": (time.perf_counter() - started) * 1000, "rows": len(history[0])}
+    with tempfile.TemporaryDirectory() as directory:
+        sink = collector.CsvSink(os.path.join(directory, "run"), list(range(1, args.channels + 1)))
+        time_data, temperature_data, power_data, wp_data = history
+        stamps = time_data.astype(datetime)
+        batch = 10000
+        for start in range(0, len(stamps), batch):
+            sink.write_rows([(stamps[i], temperature_data[i].tolist(), [110.0, 0.8, float(power_data[i]), float(wp_data[i])])
+                             for i in range(start, min(start + batch, len(stamps)))])
+        sink.close()
+        middle = stamps[len(stamps) // 2]
+        # 第一次讀取包含載入 pandas 的時間, 另外記錄; 門檻看之後各次的中位數
+        started = time.perf_counter()
+        collector.read_run_range(sink.path, stamps[0], stamps[0] + timedelta(hours=1))
+        report["range_read_first_ms"] = (time.perf_counter() - started) * 1000
+        times = []
+        for _ in range(5):
+            started = time.perf_counter()
+            window = collector.read_run_range(sink.path, middle, middle + timedelta(hours=1))
+            times.append(time.perf_counter() - started)
+        report["range_read_ms"] = statistics.median(times) * 1000
+        report["range_rows"] = len(window[0])
+        report["file_mb"] = os.path.getsize(sink.path) / 1024 / 1024
+    return report
+
+
+def bench_alarms(args):
+    """Evaluate a typical alarm rule set (open, limit, slope, power mean) on every channel of one station."""
+    import VM7000_PW3335 as collector
+
+    rules = [collector.parse_alarm_rule(rule) for rule in (
+        {"kind": "open"}, {"kind": "limit", "high": 5, "low": -40, "hysteresis": 0.5},
+        {"kind": "slope", "window": 300, "high": 2.0}, {"kind": "mean", "source": "power", "window": 600, "high": 200})]
+    alarms = collector.AlarmEngine(rules, list(range(1, args.channels + 1)))
+    history = synthetic_history(args.samples * args.interval / 86400, args.interval, args.channels)
+    stamps = history[0].astype(datetime)
+    temperatures = history[1].tolist()
+    power = [[110.0, 0.8, float(p), 0.0] for p in history[2]]
+    events = 0
+    started = time.perf_counter()
+    for i in range(len(stamps)):
+        events += len(alarms.evaluate(stamps[i], temperatures[i], power[i]))
+    elapsed = time.perf_counter() - started
+    return {"evaluate_us": elapsed / len(stamps) * 1e6, "checks": len(alarms.checks), "events": events}
+
+
+# PW3335 回應與正確的解析結果 (各種指數寫法、關閉標頭、溢位值)
+PW3335_RESPONSES = [
+    ("U +110.14E+0;I +0.7683E+0;P +084.18E+0;WP +00.0036E+0", [110.14, 0.7683, 84.18, 0.0036]),
+    ("U +110.14E+0;I +768.30E-3;P +1.2345E+3;WP +12.345E+3", [110.14, 0.7683, 1234.5, 12345.0]),
+    ("+110.14E+0;+120.00E-6;-3.2000E+0;+0.0000E+0", [110.14, 0.00012, -3.2, 0.0]),
+    ("U +110.14E+0;I +9.91E+37;P +84.180E+0;WP +3.6000E-3", [110.14, None, 84.18, 0.0036]),
+]
+
+
+def bench_pw3335(args):
+    """Parse PW3335 responses (correctness and speed) and time pipelined queries against a simulated meter."""
+    import asyncio
+    import fake_devices
+    import VM7000_PW3335 as collector
+
+    errors = 0
+    for response, expected in PW3335_RESPONSES:
+        values = collector.PW3335Protocol.parse_response(response, len(expected))
+        if any((a is None) != (b is None) or (a is not None and abs(a - b) > 1e-9 * max(abs(b), 1))
+               for a, b in zip(values, expected)):
+            print(f"解析錯誤: {response} -> {values}")
+            errors += 1
+    protocol = collector.PW3335Protocol(collector.PW3335_ITEMS + ["PF", "UPK", "IPK"])
+    response = "U +110.14E+0;I +768.30E-3;P +84.180E+0;WP +12.345E+3;PF +995.60E-3;UPK +155.76E+0;IPK +1.4126E+0"
+    rounds = 100000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        protocol.parse_values(response)
+    report = {"parse_errors": errors, "parse_us": (time.perf_counter() - started) / rounds * 1e6}
+
+    async def round_trips(groups, max_items, count=50):
+        """Median time to read all groups, one connection (and round trip) per group."""
+        meters = [collector.AsyncPW3335("127.0.0.7", pw_port, items=group, max_items=max_items) for group in groups]
+        for meter in meters:
+            await meter.connect()
+        try:
+            times = []
+            for _ in range(count):
+                started = time.perf_counter()
+                values = [value for meter in meters for value in await meter.query_data()]
+                times.append(time.perf_counter() - started)
+            return statistics.median(times) * 1000, values
+        finally:
+            for meter in meters:
+                await meter.disconnect()
+
+    # 使用另一組埠號, 與 collect 的模擬設備 (同一程序中已啟動) 分開, 且延遲固定
+    pw_port = args.pw_port + 1
+    fake_devices.start_in_thread(stations=1, vm_port=args.vm_port + 1, pw_port=pw_port, latency=args.latency, jitter=0.0)
+    items = collector.PW3335_ITEMS + ["S", "Q", "PF", "UPK", "IPK"]
+    report["one_query_ms"], values = asyncio.run(round_trips([items], len(items)))
+    report["items_read"] = sum(value is not None for value in values)
+    # 同樣的項目分成 4 項一組: 在同一次往返送出, 或每組各自往返
+    report["pipelined_ms"], _ = asyncio.run(round_trips([items], 4))
+    report["sequential_ms"], _ = asyncio.run(round_trips([items[i:i + 4] for i in range(0, len(items), 4)], 4))
+    return report
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "collect": bench_collect,
+    "write": bench_write,
+    "render": bench_render,
+    "stats": bench_stats,
+    "alarms": bench_alarms,
+    "pw3335": bench_pw3335,
+}
+
+
+def check(results, thresholds):
+    """Return the list of threshold violations as text."""
+    failures = []
+    for key, (direction, limit) in thresholds.items():
+        group, name = key.split(".", 1)
+        value = results.get(group, {}).get(name)
+        if value is None:
+            continue
+        if (direction == "max" and value > limit) or (direction == "min" and value < limit):
+            failures.append(f"{key} = {value:.4g} ({direction} {limit:g})")
+    if results.get("startup", {}).get("heavy_modules"):
+        failures.append("startup: 啟動時已載入 pandas 或 matplotlib")
+    return failures
+
+
+def print_results(name, report, indent=""):
+    for key, value in report.items():
+        if isinstance(value, dict):
+            print(f"{indent}{key}:")
+            print_results(name, value, indent + "  ")
+        elif isinstance(value, float):
+            print(f"{indent}{key:>28}: {value:.4g}")
+        else:
+            print(f"{indent}{key:>28}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VM7000/PW3335 Data Collection benchmarks")
+    parser.add_argument("benchmark", choices=["all"] + list(BENCHMARKS))
+    parser.add_argument("--runs", type=int, default=5, help="startup: 重複次數")
+    parser.add_argument("--stations", default="1,3,6", help="collect/render: 同時收集 (更新圖表) 的工位數 (逗號分隔)")
+    parser.add_argument("--duration", type=float, default=10.0, help="collect: 每種工位數的量測秒數")
+    parser.add_argument("--interval", type=float, default=1.0, help="取樣間隔 (秒)")
+    parser.add_argument("--latency", type=float, default=0.005, help="模擬設備的回應延遲 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.002, help="模擬設備延遲的隨機變動量 (秒)")
+    parser.add_argument("--vm-port", type=int, default=15020)
+    parser.add_argument("--pw-port", type=int, default=13300)
+    parser.add_argument("--channels", type=int, default=18, help="溫度頻道數")
+    parser.add_argument("--rows", type=int, default=20000, help="write: 每個工位寫入的列數")
+    parser.add_argument("--write-stations", type=int, default=6, help="write: 工位數")
+    parser.add_argument("--days", type=float, default=3.0, help="render/stats: 合成歷史資料的天數")
+    parser.add_argument("--updates", type=int, default=50, help="render: 圖表更新次數")
+    parser.add_argument("--samples", type=int, default=20000, help="alarms: 判斷的樣本數")
+    parser.add_argument("--thresholds", help="覆寫門檻的 JSON 檔 {\"collect.cycle_p95_ms\": [\"max\", 100]}")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    args = parser.parse_args()
+
+    thresholds = dict(THRESHOLDS)
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds.update({key: tuple(value) for key, value in json.load(f).items()})
+
+    names = list(BENCHMARKS) if args.benchmark == "all" else [args.benchmark]
+    results = {}
+    for name in names:
+        print(f"== {name}")
+        results[name] = BENCHMARKS[name](args)
+        print_results(name, results[name])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"time": datetime.now().isoformat(timespec="seconds"), "results": results}, f,
+                      ensure_ascii=False, indent=1)
+
+    failures = check(results, thresholds)
+    for failure in failures:
+        print(f"超過門檻: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# SAMPO VM7000/PW3335 Data Collection - 模擬設備
+#-------------------------------------------------------------------------------
+# 在本機模擬 VM7000 (Modbus TCP) 與 PW3335 (:MEAS? 任意項目) 設備, 無需實機即可測試收集程式
+# 用法: python fake_devices.py [--stations 6] [--vm-port 15020] [--pw-port 13300]
+#       工位 N 的 VM7000 在 127.0.0.N, PW3335 在 127.0.0.(N+6)
+#-------------------------------------------------------------------------------
+import argparse
+import asyncio
+import math
+import random
+import struct
+import threading
+import time
+
+
+class FakeDevice:
+    """Common response delay and outage handling for the simulated devices."""
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.started = time.monotonic()
+        self.requests = 0
+        self.offline = False  # True 時拒絕連線, 模擬設備斷電或網路中斷
+        self.writers = set()
+
+    def set_offline(self, offline=True):
+        """Drop all open connections and refuse new ones until set back online."""
+        self.offline = offline
+        if offline:
+            for writer in list(self.writers):
+                writer.close()
+
+    async def handle(self, reader, writer):
+        if self.offline:
+            writer.close()
+            return
+        self.writers.add(writer)
+        try:
+            await self.serve(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+
+class FakeVM7000(FakeDevice):
+    """Answers Modbus TCP "read input registers" requests with synthetic temperatures.
+
+    `reverse` answers every group of that many requests in reverse order,
+    and `stale` sends that many replies with earlier transaction IDs ahead
+    of each group, like late answers to a request that already timed out.
+    """
+    def __init__(self, n_registers=0x400, latency=0.0, jitter=0.0, reverse=1, stale=0):
+        super().__init__(latency, jitter)
+        self.n_registers = n_registers
+        self.reverse = reverse
+        self.stale = stale
+
+    def register_values(self, address, count):
+        """溫度以 0.1°C 為單位, 每個頻道一條緩慢變化的曲線"""
+        t = time.monotonic() - self.started
+        return [int(round((-18 + 5 * (i % 6) + 2 * math.sin(t / 600 + i)) * 10)) for i in range(address, address + count)]
+
+    def response(self, pdu):
+        unit, function = pdu[0], pdu[1]
+        address, count = struct.unpack(">HH", pdu[2:6])
+        if function != 4:
+            return bytes([unit, function | 0x80, 0x01])  # Illegal function
+        if count < 1 or count > 125 or address + count > self.n_registers:
+            return bytes([unit, function | 0x80, 0x02])  # Illegal data address
+        values = self.register_values(address - 0x64, count)
+        return bytes([unit, function, 2 * count]) + struct.pack(f">{count}h", *values)
+
+    async def serve(self, reader, writer):
+        while True:
+            frames = []
+            for _ in range(self.reverse):
+                header = await reader.readexactly(6)
+                transaction_id, protocol_id, length = struct.unpack(">HHH", header)
+                pdu = await reader.readexactly(length)
+                self.requests += 1
+                frames.append((transaction_id, protocol_id, self.response(pdu)))
+            await self.delay()
+            first_id, protocol_id, body = frames[0]
+            stale = body[:3] + b"\xff" * (len(body) - 3)  # 與第一個回應同長度, 讀值全為 -0.1
+            for k in range(self.stale, 0, -1):  # 已逾時的舊請求遲到的回應
+                writer.write(struct.pack(">HHH", (first_id - k) & 0xFFFF, protocol_id, len(stale)) + stale)
+            for transaction_id, protocol_id, body in reversed(frames):
+                writer.write(struct.pack(">HHH", transaction_id, protocol_id, len(body)) + body)
+            await writer.drain()
+
+
+def scpi_number(value, digits=5):
+    """SCPI engineering notation as sent by the meter, e.g. +110.14E+0, +1.2034E-3."""
+    if value == 0:
+        return f"{0:+.{digits - 1}f}E+0"
+    exponent = (math.floor(math.log10(abs(value))) // 3) * 3
+    mantissa = value / 10 ** exponent
+    decimals = max(digits - len(str(int(abs(mantissa)))), 0)
+    return f"{mantissa:+.{decimals}f}E{exponent:+d}"
+
+
+class FakePW3335(FakeDevice):
+    """Answers ":MEAS? <items>" with a compressor-like on/off power profile.
+
+    Several queries sent at once are answered one line each, in order,
+    after a single delay (the latency stands for the network round trip). Items the simulator does not know are answered with the SCPI
+    not-available value 9.91E+37.
+    """
+    LABELS = {"WH": "WP"}
+    def __init__(self, latency=0.0, jitter=0.0, on_power=85.0, period=1800, duty=0.4):
+        super().__init__(latency, jitter)
+        self.on_power = on_power
+        self.period = period
+        self.duty = duty
+        self.last = self.started
+        self.energy_wh = 0.0
+
+    def measure(self):
+        now = time.monotonic()
+        on = ((now - self.started) % self.period) < self.period * self.duty
+        power = self.on_power + random.uniform(-2, 2) if on else 1.5
+        voltage = 110.0 + random.uniform(-0.5, 0.5)
+        self.energy_wh += power * (now - self.last) / 3600
+        self.last = now
+        return voltage, power / voltage, power, self.energy_wh
+
+    def items(self, names):
+        u, i, p, wp = self.measure()
+        values = {"U": u, "I": i, "P": p, "WH": wp, "S": u * i, "Q": math.sqrt(max((u * i) ** 2 - p ** 2, 0.0)),
+                  "PF": p / (u * i) if u * i else 0.0, "UPK": u * math.sqrt(2), "IPK": i * math.sqrt(2) * 1.3}
+        return ";".join(f"{self.LABELS.get(name, name)} {scpi_number(values[name]) if name in values else '+9.91E+37'}"
+                        for name in names)
+
+    async def serve(self, reader, writer):
+        pending = b""
+        while True:
+            data = await reader.read(4096)
+            if not data:
+                break
+            *lines, pending = (pending + data).split(b"\n")
+            if not lines:
+                continue
+            await self.delay()  # 一起送達的查詢 (管線化) 共用一次延遲
+            for line in lines:
+                self.requests += 1
+                command = line.strip().upper()
+                if command.startswith(b":MEAS?"):
+                    names = command[len(b":MEAS?"):].decode("ascii").replace(" ", "").split(",")
+                    writer.write((self.items(names) + "\n").encode("ascii"))
+                elif command == b"*IDN?":
+                    writer.write(b"GW INSTEK,PW3335,FAKE,1.60\n")
+            await writer.drain()
+
+
+async def start_servers(stations=6, vm_port=15020, pw_port=13300, latency=0.0, jitter=0.0, host_prefix="127.0.0"):
+    """啟動模擬設備, 回傳 asyncio server 列表與設備物件"""
+    servers, devices = [], {}
+    for n in range(1, stations + 1):
+        vm = FakeVM7000(latency=latency, jitter=jitter)
+        pw = FakePW3335(latency=latency, jitter=jitter)
+        servers.append(await asyncio.start_server(vm.handle, f"{host_prefix}.{n}", vm_port))
+        servers.append(await asyncio.start_server(pw.handle, f"{host_prefix}.{n + 6}", pw_port))
+        devices[n] = (vm, pw)
+    return servers, devices
+
+
+def start_in_thread(**kwargs):
+    """在背景執行緒啟動模擬設備 (供主程式 --simulate 使用)"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(start_servers(**kwargs), loop).result()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fake VM7000/PW3335 devices")
+    parser.add_argument("--stations", type=int, default=6)
+    parser.add_argument("--vm-port", type=int, default=15020)
+    parser.add_argument("--pw-port", type=int, default=13300)
+    parser.add_argument("--latency", type=float, default=0.0, help="每個回應的延遲 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延遲的隨機變動量 (秒)")
+    args = parser.parse_args()
+    servers, _ = await start_servers(args.stations, args.vm_port, args.pw_port, args.latency, args.jitter)
+    print(f"Simulating {args.stations} stations (VM7000 port {args.vm_port}, PW3335 port {args.pw_port})")
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,38 @@
+# 測試共用設定: 在背景執行緒的 event loop 上啟動 fake_devices.py 的模擬設備
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def serve():
+    """Serve simulated devices on 127.0.0.1; `serve(device)` returns the port."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    servers, devices = [], []
+
+    def start(device):
+        server = asyncio.run_coroutine_threadsafe(asyncio.start_server(device.handle, "127.0.0.1", 0), loop).result()
+        servers.append(server)
+        devices.append(device)
+        return server.sockets[0].getsockname()[1]
+
+    yield start
+
+    async def stop():
+        for device in devices:
+            device.set_offline()
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
@@ -0,0 +1,98 @@
+# 警報規則 (AlarmEngine / RollingWindow) 的串流判斷
+from datetime import datetime, timedelta
+
+import pytest
+
+from VM7000_PW3335 import AlarmEngine, RollingWindow, parse_alarm_rule
+
+STARTED = datetime(2026, 1, 1)
+POWER = [110.0, 0.8, 85.0, 0.0]
+
+
+def run(rules, readings, channels=(1,), interval=1.0, power=None):
+    """Evaluate one reading (list per channel) per interval; return [(sample index, state, channel, value)]."""
+    alarms = AlarmEngine([parse_alarm_rule(rule) for rule in rules], list(channels))
+    events = []
+    for i, temperatures in enumerate(readings):
+        timestamp = STARTED + timedelta(seconds=i * interval)
+        for event in alarms.evaluate(timestamp, temperatures, power[i] if power else POWER):
+            events.append((i, event["state"], event["channel"], event["value"]))
+    return events
+
+
+def test_limit_threshold_crossing():
+    readings = [[v] for v in (-20, -16, -15, -14.9, -14, -15, -16)]
+    assert run([{"high": -15}], readings) == [(3, "raise", "CH01", -14.9), (5, "clear", "CH01", -15)]
+
+
+def test_low_limit():
+    readings = [[v] for v in (-20, -30, -35.5, -34)]
+    assert run([{"low": -35}], readings) == [(2, "raise", "CH01", -35.5), (3, "clear", "CH01", -34)]
+
+
+def test_hysteresis_release():
+    readings = [[v] for v in (-16, -14, -14.8, -15.2, -15.4, -15.5, -15.2, -15.0, -14.9)]
+    events = run([{"high": -15, "hysteresis": 0.5}], readings)
+    # -14.8 / -15.2 / -15.4 仍在遲滯範圍內, 到 -15.5 才解除; 再次觸發要超過 high 本身
+    assert events == [(1, "raise", "CH01", -14), (5, "clear", "CH01", -15.5), (8, "raise", "CH01", -14.9)]
+
+
+def test_channel_selection():
+    readings = [[-10, -10, -10]]
+    events = run([{"channels": "2-3", "high": -15}], readings, channels=(1, 2, 3))
+    assert [channel for _, _, channel, _ in events] == ["CH02", "CH03"]
+
+
+def test_open_sensor_ignores_gaps():
+    readings = [[-18.0, -18.0], [None, -18.0], [float("nan"), 1200.0], [-18.0, 1200.0], [None, None], [-18.0, -18.0]]
+    assert run([{"kind": "open"}], readings, channels=(1, 2)) == [
+        (2, "raise", "CH02", 1200.0), (5, "clear", "CH02", -18.0)]
+
+
+def test_open_readings_skip_other_rules():
+    readings = [[-18.0], [1200.0], [-18.0]]
+    assert run([{"high": -15}], readings) == []
+
+
+def test_rolling_mean():
+    # 60 秒平均: 前 30 秒 -20, 之後 -10; 平均在視窗半數以上為 -10 後超過 -15
+    readings = [[-20.0]] * 30 + [[-10.0]] * 60
+    events = run([{"kind": "mean", "window": 60, "high": -15}], readings)
+    assert len(events) == 1 and events[0][1] == "raise"
+    assert 59 <= events[0][0] <= 61
+
+
+def test_slope_per_minute():
+    # 每秒上升 0.05 °C = 每分鐘 3 °C; 視窗半滿之前不判斷
+    readings = [[-20.0 + 0.05 * i] for i in range(200)]
+    events = run([{"kind": "slope", "window": 120, "high": 2.0}], readings)
+    assert events[0][:3] == (60, "raise", "CH01")
+    assert events[0][3] == pytest.approx(3.0)
+
+
+def test_slope_clears_when_flat():
+    readings = [[-20.0 + 0.05 * i] for i in range(120)] + [[-14.0]] * 240
+    events = run([{"kind": "slope", "window": 120, "high": 2.0, "hysteresis": 0.5}], readings)
+    assert [state for _, state, _, _ in events] == ["raise", "clear"]
+    assert events[1][3] <= 1.5
+
+
+def test_power_source():
+    power = [[110.0, 0.8, p, 0.0] for p in (80.0, 250.0, 260.0, 90.0)]
+    events = run([{"source": "power", "high": 200}], [[-18.0]] * 4, power=power)
+    assert events == [(1, "raise", "power", 250.0), (3, "clear", "power", 90.0)]
+
+
+def test_rolling_window_matches_full_fit():
+    import numpy as np
+
+    window = RollingWindow(100)
+    rng = np.random.default_rng(1)
+    times = np.cumsum(rng.uniform(0.5, 1.5, 2000))
+    values = 20 + 0.01 * times + rng.normal(0, 0.2, len(times))
+    for t, v in zip(times, values):
+        window.add(t, v)
+    keep = times >= times[-1] - 100
+    assert window.n == keep.sum()
+    assert window.mean() == pytest.approx(values[keep].mean())
+    assert window.slope() == pytest.approx(np.polyfit(times[keep], values[keep], 1)[0], rel=1e-6)
@@ -0,0 +1,59 @@
+# ColumnarSink 的 Arrow stream 復原 (需要 pyarrow)
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+from VM7000_PW3335 import ColumnarSink, StreamLock, open_run_files
+
+CHANNELS = [1, 2, 3]
+
+
+def write_stream(file_base, batches, batch_rows=10):
+    """Write `batches` full record batches and leave the stream as a crash would (lock released, not closed)."""
+    sink = ColumnarSink(file_base, CHANNELS, batch_rows=batch_rows)
+    started = datetime(2026, 1, 1)
+    for i in range(batches * batch_rows):
+        sink.write_rows([(started + timedelta(seconds=i), [float(i)] * len(CHANNELS), [110.0, 0.8, 85.0, i / 3600])])
+    sink.file.flush()
+    sink.lock.release()
+    return sink.stream_path
+
+
+def test_truncated_last_batch(tmp_path):
+    stream_path = write_stream(str(tmp_path / "run"), 3)
+    with open(stream_path, "r+b") as f:
+        f.truncate(os.path.getsize(stream_path) - 20)  # 最後一個 batch 寫到一半
+    assert ColumnarSink.recover(stream_path) == 20
+    assert not os.path.exists(stream_path)
+    table = pq.read_table(str(tmp_path / "run.parquet"))
+    assert table.column("Temp1").to_pylist() == [float(i) for i in range(20)]
+
+
+@pytest.mark.parametrize("size", [0, 5])
+def test_stream_cut_before_schema_is_set_aside(tmp_path, size):
+    stream_path = write_stream(str(tmp_path / "run"), 1)
+    with open(stream_path, "r+b") as f:
+        f.truncate(size)
+    assert ColumnarSink.recover(stream_path) == 0
+    assert not os.path.exists(stream_path)
+    assert os.path.exists(f"{stream_path}.corrupt")
+    assert not os.path.exists(tmp_path / "run.parquet")
+
+
+def test_open_run_files_recovers_only_abandoned_streams(tmp_path):
+    abandoned = write_stream(str(tmp_path / "old"), 2)
+    live = ColumnarSink(str(tmp_path / "live"), CHANNELS)  # 仍持有 StreamLock
+    sinks = open_run_files(str(tmp_path), str(tmp_path / "new"), CHANNELS, columnar=True)
+    try:
+        assert not os.path.exists(abandoned)
+        assert pq.read_table(str(tmp_path / "old.parquet")).num_rows == 20
+        assert os.path.exists(live.stream_path)
+        assert not StreamLock(live.stream_path).acquire()
+    finally:
+        for sink in sinks + [live]:
+            sink.close()
+    assert pq.read_table(str(tmp_path / "live.parquet")).num_rows == 0
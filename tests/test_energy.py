@@ -0,0 +1,83 @@
+# EnergyAnalyzer 的積分與壓縮機週期判斷
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from VM7000_PW3335 import EnergyAnalyzer
+
+STARTED = datetime(2026, 1, 1)
+INTERVAL = 10
+PERIOD, ON = 1800, 720  # 30 分鐘一個週期, 開機 12 分鐘
+
+
+def profile(cycles, on_w=85.0, off_w=2.0):
+    """Power samples of a compressor starting switched off for 5 minutes, then `cycles` full cycles."""
+    seconds = np.arange(0, 300 + cycles * PERIOD + 60, INTERVAL)
+    phase = (seconds - 300) % PERIOD
+    return seconds, np.where((seconds >= 300) & (phase < ON), on_w, off_w)
+
+
+def feed(analyzer, seconds, power):
+    cycles = []
+    for s, p in zip(seconds, power):
+        cycle = analyzer.update(STARTED + timedelta(seconds=int(s)), [110.0, None, None if p is None else float(p), None])
+        if cycle:
+            cycles.append(cycle)
+    return cycles
+
+
+def test_cycle_detection():
+    seconds, power = profile(4)
+    analyzer = EnergyAnalyzer()
+    cycles = feed(analyzer, seconds, power)
+    assert len(cycles) == 4  # 最後一次開機讓第 4 個週期結束
+    for cycle in cycles:
+        assert cycle["period_s"] == PERIOD
+        assert cycle["on_s"] == ON and cycle["off_s"] == PERIOD - ON
+        assert cycle["duty"] == pytest.approx(ON / PERIOD)
+        assert cycle["peak_w"] == 85.0
+        # 一個週期的能量: 開機 720 s 的 85 W 與停機的 2 W, 加上兩個切換點的梯形
+        assert cycle["energy_wh"] == pytest.approx((85.0 * (ON - INTERVAL) + 2.0 * (PERIOD - ON - INTERVAL)
+                                                    + 2 * (85.0 + 2.0) / 2 * INTERVAL) / 3600)
+    assert cycles[0]["start"] == (STARTED + timedelta(seconds=300)).isoformat(timespec="seconds")
+    summary = analyzer.summary()
+    assert summary["cycles"] == 4 and summary["state"] == "on"
+    assert summary["rolling"]["period_s"] == PERIOD
+    assert summary["energy_wh"] == pytest.approx(((power[1:] + power[:-1]) / 2 * np.diff(seconds)).sum() / 3600)
+
+
+def test_short_spikes_are_debounced():
+    seconds = np.arange(0, 3600, INTERVAL)
+    power = np.full(len(seconds), 2.0)
+    power[100:102] = 85.0  # 20 秒, 短於 debounce 30 秒
+    power[200:260] = 85.0
+    power[230:232] = 5.0  # 開機中短暫掉到 off_w 以下
+    analyzer = EnergyAnalyzer(debounce=30)
+    assert feed(analyzer, seconds, power) == []
+    assert analyzer.state == "off"
+    assert analyzer.peak_w == 85.0
+
+
+def test_rolling_means_keep_the_last_cycles():
+    seconds, power = profile(6)
+    power = power.copy()
+    on = power > 30
+    power[on] = 85.0 + 10 * (seconds[on] // PERIOD)  # 每個週期的功率不同
+    analyzer = EnergyAnalyzer(keep=2)
+    cycles = feed(analyzer, seconds, power)
+    rolling = analyzer.summary()["rolling"]
+    assert rolling["energy_wh"] == pytest.approx((cycles[-1]["energy_wh"] + cycles[-2]["energy_wh"]) / 2)
+    assert rolling["duty"] == pytest.approx(ON / PERIOD)
+
+
+def test_gaps_are_not_integrated():
+    analyzer = EnergyAnalyzer(max_gap=600)
+    feed(analyzer, [0, 10, 20], [50.0] * 3)
+    feed(analyzer, [2000, 2010], [50.0] * 2)  # 1980 秒沒有資料
+    feed(analyzer, [2020], [None])  # 讀取失敗
+    summary = analyzer.summary()
+    assert summary["hours"] == pytest.approx(30 / 3600)
+    assert summary["energy_wh"] == pytest.approx(50.0 * 30 / 3600)
+    assert summary["gaps"] == 2
+    assert summary["kwh_per_24h"] == pytest.approx(50.0 * 24 / 1000)
@@ -0,0 +1,65 @@
+# interval_stats 與 NumPy nan* 函式的比對
+import warnings
+
+import numpy as np
+import pytest
+
+from VM7000_PW3335 import interval_stats
+
+
+def history(rows=1000, channels=5, seed=3):
+    rng = np.random.default_rng(seed)
+    times = np.datetime64("2026-01-01T00:00:00", "ms") + np.arange(rows) * np.timedelta64(10, "s")
+    temps = (rng.normal(-18, 3, (rows, channels))).astype(np.float32)
+    temps[rng.random((rows, channels)) < 0.1] = np.nan  # 讀取失敗的缺值
+    temps[:, -1] = np.nan  # 整段沒有讀值的頻道
+    power = np.where(np.arange(rows) % 180 < 70, 85.0, 2.0).astype(np.float32)
+    power[rng.random(rows) < 0.05] = np.nan
+    wp = np.cumsum(np.nan_to_num(power).astype(np.float64)) * 10 / 3600
+    return times, temps, power, wp
+
+
+def test_matches_nan_functions():
+    times, temps, power, wp = history()
+    stats = interval_stats(times, temps, power, wp)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 全為 NaN 的頻道
+        np.testing.assert_allclose(stats["mean"], np.nanmean(temps.astype(np.float64), axis=0), rtol=1e-9)
+        np.testing.assert_allclose(stats["std"], np.nanstd(temps.astype(np.float64), axis=0), rtol=1e-6)
+        np.testing.assert_array_equal(stats["min"], np.nanmin(temps, axis=0))
+        np.testing.assert_array_equal(stats["max"], np.nanmax(temps, axis=0))
+        for q in (5, 50, 95):
+            np.testing.assert_allclose(stats["percentiles"][q], np.nanpercentile(temps, q, axis=0), rtol=1e-6)
+    assert np.isnan(stats["mean"][-1]) and np.isnan(stats["percentiles"][50][-1])
+    assert stats["count"] == len(times)
+    assert stats["start"] == times[0] and stats["end"] == times[-1]
+
+
+def test_energy():
+    times, temps, power, wp = history()
+    stats = interval_stats(times, temps, power, wp)
+    valid = ~np.isnan(power)
+    hours = (times[valid] - times[0]) / np.timedelta64(1, "s") / 3600
+    p = power[valid].astype(np.float64)
+    expected = float(np.sum((p[1:] + p[:-1]) / 2 * np.diff(hours)))
+    assert stats["energy_wh"] == pytest.approx(expected)
+    assert stats["avg_power"] == pytest.approx(expected / (hours[-1] - hours[0]))
+    assert stats["wp_delta"] == pytest.approx(wp[-1] - wp[0])
+
+
+def test_percentiles_on_small_windows():
+    times, temps, power, wp = history(rows=3, channels=2)
+    temps[:] = [[1.0, np.nan], [np.nan, np.nan], [3.0, 7.0]]
+    stats = interval_stats(times, temps, power, wp, percentiles=(0, 25, 100))
+    np.testing.assert_allclose(stats["percentiles"][25], [1.5, 7.0])
+    np.testing.assert_allclose(stats["percentiles"][0], [1.0, 7.0])
+    np.testing.assert_allclose(stats["percentiles"][100], [3.0, 7.0])
+    np.testing.assert_allclose(stats["std"], [1.0, 0.0])
+
+
+def test_empty_window():
+    times, temps, power, wp = history(rows=0, channels=3)
+    stats = interval_stats(times, temps, power, wp)
+    assert stats["count"] == 0 and stats["start"] is None
+    assert np.isnan(stats["mean"]).all() and np.isnan(stats["percentiles"][95]).all()
+    assert np.isnan(stats["energy_wh"]) and np.isnan(stats["wp_delta"])
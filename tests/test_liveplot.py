@@ -0,0 +1,51 @@
+# LivePlot 的即時圖表更新 (Agg canvas, 不需要顯示器)
+from datetime import datetime, timedelta
+
+import pytest
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from VM7000_PW3335 import LivePlot, StationBuffer
+
+CHANNELS = [1, 2, 3]
+SPAN = timedelta(hours=1)
+
+pytestmark = pytest.mark.filterwarnings("ignore:Glyph .* missing from font")
+
+
+def make_plot():
+    figure = Figure(figsize=(6, 3), dpi=50)
+    canvas = FigureCanvasAgg(figure)
+    ax_temp, ax_power = figure.subplots(2, 1, sharex=True)
+    plot = LivePlot(figure, canvas, ax_temp, ax_power, "工位1", CHANNELS)
+    canvas.draw()
+    return plot
+
+
+def fill(buffer, start, rows):
+    for i in range(rows):
+        buffer.append(start + timedelta(seconds=10 * i), [-18.0 + ch + i % 5 for ch in CHANNELS], 80.0 + i % 7)
+
+
+def test_update_after_invalidate():
+    buffer = StationBuffer(1000, len(CHANNELS))
+    started = datetime(2026, 1, 1)
+    fill(buffer, started, 30)
+    plot = make_plot()
+    plot.update(buffer, SPAN)
+
+    # 切換頁籤: invalidate 之後的下一次更新要重新計算視窗, 不可因 last_time 為 None 而失敗
+    plot.invalidate()
+    buffer.append(started + timedelta(seconds=300), [-15.0] * len(CHANNELS), 85.0)
+    plot.update(buffer, SPAN)
+    newest = buffer.view()[0][-1]
+    assert plot.last_time == newest
+    assert plot.xlim[0] <= newest <= plot.xlim[1]
+    times, _ = plot.power_line.get_data()
+    assert len(times) == 31
+
+    buffer.append(started + timedelta(seconds=310), [-14.0] * len(CHANNELS), 86.0)
+    plot.update(buffer, SPAN)
+    assert len(plot.power_line.get_data()[0]) == 32
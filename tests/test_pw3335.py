@@ -0,0 +1,70 @@
+# PW3335 :MEAS? 用戶端 (PW3335 / AsyncPW3335) 對模擬設備 FakePW3335 的測試
+import asyncio
+
+import pytest
+
+from fake_devices import FakePW3335, scpi_number
+from VM7000_PW3335 import PW3335, AsyncPW3335, PW3335_ITEMS, PW3335_MAX_ITEMS
+
+# 超過 PW3335_MAX_ITEMS 的項目清單, 分成多個查詢 (多行回應)
+MANY_ITEMS = ["U", "I", "P", "WH", "S", "Q", "PF", "UPK", "IPK", "DEG", "FREQ", "UTHD"]
+
+
+class NumberedPW3335(FakePW3335):
+    """Answers item n of MANY_ITEMS with the value n + 1, so every value shows which item it belongs to."""
+    def items(self, names):
+        return ";".join(f"{self.LABELS.get(name, name)} {scpi_number(MANY_ITEMS.index(name) + 1)}" for name in names)
+
+
+def query_data(kind, port, items=None, repeat=1, max_items=PW3335_MAX_ITEMS):
+    """Query the meter `repeat` times over one connection; return the parsed values of each query."""
+    if kind == "blocking":
+        pw = PW3335("127.0.0.1", port, timeout=2.0, items=items, max_items=max_items)
+        pw.connect()
+        try:
+            return [pw.query_data() for _ in range(repeat)]
+        finally:
+            pw.disconnect()
+
+    async def run():
+        pw = AsyncPW3335("127.0.0.1", port, timeout=2.0, items=items, max_items=max_items)
+        await pw.connect()
+        try:
+            return [await pw.query_data() for _ in range(repeat)]
+        finally:
+            await pw.disconnect()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(params=["blocking", "async"])
+def kind(request):
+    return request.param
+
+
+def test_default_items(serve, kind):
+    device = FakePW3335(on_power=85.0, duty=1.0)
+    for voltage, current, power, energy in query_data(kind, serve(device), repeat=3):
+        assert 109.0 < voltage < 111.0
+        assert power == pytest.approx(voltage * current, rel=1e-3)
+        assert 80.0 < power < 90.0
+        assert energy >= 0.0
+    assert device.requests == 3
+
+
+def test_not_available_item_is_none(serve, kind):
+    [values] = query_data(kind, serve(FakePW3335()), PW3335_ITEMS + ["FREQ"])
+    assert len(values) == 5
+    assert values[4] is None
+    assert all(value is not None for value in values[:4])
+
+
+@pytest.mark.parametrize("max_items", [PW3335_MAX_ITEMS, 5, 1])
+def test_more_items_than_one_query(serve, kind, max_items):
+    n_lines = -(-len(MANY_ITEMS) // max_items)
+    assert PW3335("127.0.0.1", items=MANY_ITEMS, max_items=max_items).n_lines == n_lines > 1
+    device = NumberedPW3335(latency=0.01)
+    results = query_data(kind, serve(device), MANY_ITEMS, repeat=3, max_items=max_items)
+    # 每一行回應對應到自己的查詢, 項目依設定順序排列
+    assert results == [[float(n) for n in range(1, len(MANY_ITEMS) + 1)]] * 3
+    assert device.requests == 3 * n_lines
@@ -0,0 +1,110 @@
+# CsvSink / CsvIndex 紀錄檔與 read_run_range 的區間讀取
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from VM7000_PW3335 import INDEX_BLOCK_ROWS, CsvIndex, CsvSink, read_run_range
+
+CHANNELS = [1, 2, 3]
+STARTED = datetime(2026, 1, 1, 23, 30)  # 跨越午夜, 日期欄會改變
+ROWS = 5 * INDEX_BLOCK_ROWS + 17
+
+
+def row(i):
+    temperatures = [round(-18.0 + ch + 0.1 * (i % 50), 1) for ch in CHANNELS]
+    if i % 97 == 5:
+        temperatures[1] = None  # 讀取失敗的缺值
+    return STARTED + timedelta(seconds=10 * i), temperatures, [110.0, 0.8, float(i % 90), i / 360]
+
+
+def write_run(file_base, rows=range(ROWS), resume=False, batch=100):
+    sink = CsvSink(file_base, CHANNELS, resume=resume)
+    rows = list(rows)
+    for start in range(0, len(rows), batch):
+        sink.write_rows([row(i) for i in rows[start:start + batch]])
+    sink.close()
+    return sink.path
+
+
+def full_read(path):
+    """The whole file through pandas, as (time, temperature, power, wp)."""
+    frame = pd.read_csv(path, encoding="utf-8-sig")
+    times = pd.to_datetime(frame["Date"] + " " + frame["Time"]).to_numpy().astype("datetime64[ms]")
+    temps = frame[[f"Temp{ch}" for ch in CHANNELS]].to_numpy(dtype=np.float32)
+    return times, temps, frame["P(W)"].to_numpy(dtype=np.float32), frame["WP(Wh)"].to_numpy(dtype=np.float64)
+
+
+def check_index(path):
+    records = CsvIndex.load(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert np.all(np.diff(records["time"]) > 0)
+    assert np.all(np.diff(records["offset"]) > 0)
+    for stamp, offset in records:
+        assert offset == 0 or data[offset - 1:offset] == b"\n"  # 每筆都指向一列的開頭
+        text = data[offset:offset + 19].decode("ascii").replace(",", "T")
+        assert np.datetime64(text, "ms").astype(np.int64) == stamp
+    return records
+
+
+def test_index_written_while_recording_matches_rebuild(tmp_path):
+    path = write_run(str(tmp_path / "run"))
+    records = check_index(path)
+    assert len(records) == -(-ROWS // INDEX_BLOCK_ROWS)
+    written = records.copy()
+    CsvIndex.build(path).close()
+    assert np.array_equal(CsvIndex.load(path), written)
+
+
+def test_resume_after_half_written_row(tmp_path):
+    file_base = str(tmp_path / "run")
+    path = write_run(file_base, range(700))
+    with open(path, "ab") as f:
+        f.write(b"2026-01-02,01:26:40,-17")  # 中斷時寫到一半的列
+    write_run(file_base, range(700, ROWS), resume=True)
+    check_index(path)
+    times, temps, power, wp = full_read(path)
+    assert len(times) == ROWS
+    assert np.all(np.diff(times) > np.timedelta64(0, "ms"))
+
+
+@pytest.mark.parametrize("first, last", [
+    (0, ROWS - 1),  # 整個檔案
+    (INDEX_BLOCK_ROWS, 2 * INDEX_BLOCK_ROWS),  # 起點剛好在區塊開頭
+    (INDEX_BLOCK_ROWS - 1, 2 * INDEX_BLOCK_ROWS - 1),  # 起點在區塊開頭的前一列
+    (INDEX_BLOCK_ROWS + 1, INDEX_BLOCK_ROWS + 1),  # 單一列
+    (3 * INDEX_BLOCK_ROWS + 7, ROWS - 1),  # 到最後一列
+    (0, 3),
+])
+def test_range_read_matches_full_read(tmp_path, first, last):
+    path = write_run(str(tmp_path / "run"))
+    times, temps, power, wp = full_read(path)
+    start, end = row(first)[0], row(last)[0]
+    window = read_run_range(path, start, end)
+    assert np.array_equal(window[0], times[first:last + 1])
+    np.testing.assert_array_equal(window[1], temps[first:last + 1])
+    np.testing.assert_array_equal(window[2], power[first:last + 1])
+    np.testing.assert_allclose(window[3], wp[first:last + 1])
+    assert list(window[4]) == CHANNELS
+
+
+def test_range_between_rows_and_outside_the_file(tmp_path):
+    path = write_run(str(tmp_path / "run"))
+    times = full_read(path)[0]
+    # 邊界落在兩列之間: 只包含視窗內的列
+    window = read_run_range(path, row(10)[0] + timedelta(seconds=5), row(20)[0] - timedelta(seconds=5))
+    assert np.array_equal(window[0], times[11:20])
+    assert len(read_run_range(path, STARTED - timedelta(days=1), STARTED - timedelta(seconds=1))[0]) == 0
+    assert len(read_run_range(path, row(ROWS)[0], row(ROWS + 100)[0])[0]) == 0
+    assert len(read_run_range(path, row(30)[0] + timedelta(seconds=1), row(30)[0] + timedelta(seconds=9))[0]) == 0
+
+
+def test_file_without_index_is_read_in_full(tmp_path):
+    path = write_run(str(tmp_path / "run"))
+    os.remove(f"{path}.idx")
+    times = full_read(path)[0]
+    window = read_run_range(path, row(300)[0], row(600)[0])
+    assert np.array_equal(window[0], times[300:601])
@@ -0,0 +1,49 @@
+# RunWriter 背景寫入: 磁碟停滯時提交端不可被阻塞
+import threading
+import time
+from datetime import datetime
+
+from VM7000_PW3335 import RunWriter
+
+
+class StalledSink:
+    """Sink whose writes hang until `release` is set, like a stalled disk."""
+    path = "stalled.csv"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.rows = []
+
+    def write_rows(self, rows):
+        self.release.wait()
+        self.rows.extend(rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_submit_never_blocks_on_a_stalled_disk():
+    sink = StalledSink()
+    writer = RunWriter(max_queue=5, commit_rows=1)
+    writer.attach("工位1", [sink])
+    writer.submit("工位1", datetime.now(), [1.0], [1, 2, 3, 4])
+    time.sleep(0.2)  # 寫入執行緒卡在第一列
+
+    started = time.monotonic()
+    accepted = [writer.submit("工位1", datetime.now(), [1.0], [1, 2, 3, 4]) for _ in range(20)]
+    accepted.append(writer.submit_events("工位1", [{}, {}]))
+    accepted.append(writer.submit_cycle("工位1", None, {}))
+    assert time.monotonic() - started < 0.5
+
+    stats = writer.stats()
+    assert accepted.count(True) == 5
+    assert stats["blocked"] == 17
+    assert stats["dropped"] == 15 + 2 + 1
+    assert stats["max_depth"] == 5
+
+    sink.release.set()
+    writer.shutdown()
+    assert len(sink.rows) == 1 + 5
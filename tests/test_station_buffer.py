@@ -0,0 +1,87 @@
+# StationBuffer 環形緩衝 (每列寫入兩份, view() 永遠是連續切片)
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from VM7000_PW3335 import StationBuffer
+
+STARTED = datetime(2026, 1, 1)
+
+
+def stamp(i):
+    return STARTED + timedelta(seconds=int(i))
+
+
+def fill(buffer, rows):
+    for i in rows:
+        buffer.append(stamp(i), [float(i), -float(i)], float(i), i / 10)
+
+
+def seconds(times):
+    return ((times - np.datetime64(STARTED, "ms")) / np.timedelta64(1, "s")).astype(int).tolist()
+
+
+def test_wraparound_keeps_newest_rows_contiguous():
+    buffer = StationBuffer(5, 2)
+    for n in range(1, 13):
+        fill(buffer, [n - 1])
+        times, temps, power, wp = buffer.view()
+        expected = list(range(max(n - 5, 0), n))
+        assert len(buffer) == len(expected)
+        assert seconds(times) == expected
+        assert temps[:, 0].tolist() == expected
+        assert power.tolist() == expected
+        assert np.shares_memory(times, buffer.time_data)  # 不複製
+
+
+def test_missing_values_and_short_rows():
+    buffer = StationBuffer(4, 3)
+    buffer.append(stamp(0), [None, 2.0], None, None)
+    times, temps, power, wp = buffer.view()
+    assert np.isnan(temps[0, 0]) and temps[0, 1] == 2.0 and np.isnan(temps[0, 2])
+    assert np.isnan(power[0]) and np.isnan(wp[0])
+
+
+def test_evict_before():
+    buffer = StationBuffer(6, 2)
+    fill(buffer, range(9))  # 保留 3..8, 已繞回
+    buffer.evict_before(stamp(5))
+    assert seconds(buffer.view()[0]) == [5, 6, 7, 8]
+    buffer.evict_before(stamp(5))
+    assert len(buffer) == 4
+    fill(buffer, range(9, 12))
+    assert seconds(buffer.view()[0]) == [6, 7, 8, 9, 10, 11]
+    buffer.evict_before(stamp(100))
+    assert len(buffer) == 0 and len(buffer.view()[0]) == 0
+
+
+def test_view_boundaries():
+    buffer = StationBuffer(8, 2)
+    fill(buffer, range(0, 24, 2))  # 保留 8, 10, ..., 22
+    assert seconds(buffer.view(stamp(10), stamp(14))[0]) == [10, 12, 14]  # 兩端都包含
+    assert seconds(buffer.view(stamp(9), stamp(15))[0]) == [10, 12, 14]
+    assert seconds(buffer.view(start=stamp(21))[0]) == [22]
+    assert seconds(buffer.view(end=stamp(8))[0]) == [8]
+    assert seconds(buffer.view(stamp(0), stamp(100))[0]) == list(range(8, 24, 2))
+    assert len(buffer.view(stamp(15), stamp(15))[0]) == 0
+    assert len(buffer.view(stamp(30), stamp(40))[0]) == 0
+    assert len(buffer.view(stamp(14), stamp(10))[0]) == 0
+
+
+def test_extend_matches_append():
+    appended = StationBuffer(7, 2)
+    fill(appended, range(4))
+    extended = StationBuffer(7, 2)
+    fill(extended, range(4))
+    rows = np.arange(4, 15)
+    fill(appended, rows)
+    extended.extend(np.array([np.datetime64(stamp(i), "ms") for i in rows]),
+                    np.column_stack([rows, -rows]).astype(np.float32), rows.astype(np.float32), rows / 10)
+    for a, b in zip(appended.view(), extended.view()):
+        np.testing.assert_array_equal(a, b)
+    assert seconds(extended.view()[0]) == list(range(8, 15))
+
+
+def test_for_interval_capacity():
+    assert StationBuffer.for_interval(60, 1, hours=2).capacity == 121
+    assert StationBuffer.for_interval(0.5, 1, hours=1).capacity == 3601
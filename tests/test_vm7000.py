@@ -0,0 +1,109 @@
+# VM7000 Modbus TCP 用戶端 (VM7000 / AsyncVM7000) 對模擬設備 FakeVM7000 的測試
+import asyncio
+
+import pytest
+
+from fake_devices import FakeVM7000
+from VM7000_PW3335 import VM7000, AsyncVM7000, ModbusError, RegisterPlan
+
+# 三個區塊: 1-3, 200-201, 400
+CHANNELS = [1, 2, 3, 200, 201, 400]
+
+
+class CountingVM7000(FakeVM7000):
+    """Register n holds n, so every value shows which register it was read from."""
+    def register_values(self, address, count):
+        return list(range(address, address + count))
+
+
+def expected(channels):
+    return [(ch - 1) / 10.0 for ch in channels]
+
+
+def get_values(kind, port, *batches, transaction_id=0):
+    """Send each batch with get_values over one connection; a ModbusError is returned in place of its responses."""
+    if kind == "blocking":
+        vm = VM7000("127.0.0.1", port, timeout=2.0)
+        vm.transaction_id = transaction_id
+        vm.connect()
+        try:
+            results = []
+            for batch in batches:
+                try:
+                    results.append(vm.get_values(batch))
+                except ModbusError as e:
+                    results.append(e)
+            return results
+        finally:
+            vm.disconnect()
+
+    async def run():
+        vm = AsyncVM7000("127.0.0.1", port, timeout=2.0)
+        vm.transaction_id = transaction_id
+        await vm.connect()
+        try:
+            results = []
+            for batch in batches:
+                try:
+                    results.append(await vm.get_values(batch))
+                except ModbusError as e:
+                    results.append(e)
+            return results
+        finally:
+            await vm.disconnect()
+
+    return asyncio.run(run())
+
+
+def transaction_ids(responses):
+    return [int.from_bytes(response[0:2], byteorder="big") for response in responses]
+
+
+@pytest.fixture(params=["blocking", "async"])
+def kind(request):
+    return request.param
+
+
+def test_pipelined_get_values(serve, kind):
+    device = CountingVM7000()
+    plan = RegisterPlan(CHANNELS)
+    assert len(plan.requests) == 3
+    [responses] = get_values(kind, serve(device), plan.requests)
+    assert plan.decode(responses) == expected(CHANNELS)
+    assert transaction_ids(responses) == [1, 2, 3]
+    assert device.requests == 3
+
+
+def test_out_of_order_replies_are_matched_by_transaction_id(serve, kind):
+    plan = RegisterPlan(CHANNELS)
+    first, second = get_values(kind, serve(CountingVM7000(reverse=3)), plan.requests, plan.requests)
+    assert transaction_ids(first) == [1, 2, 3]
+    assert transaction_ids(second) == [4, 5, 6]
+    assert plan.decode(first) == plan.decode(second) == expected(CHANNELS)
+
+
+def test_stale_replies_are_dropped(serve, kind):
+    plan = RegisterPlan(CHANNELS)
+    results = get_values(kind, serve(CountingVM7000(reverse=3, stale=2)), plan.requests, plan.requests)
+    for responses in results:
+        assert plan.decode(responses) == expected(CHANNELS)
+
+
+def test_transaction_id_wraps_around(serve, kind):
+    plan = RegisterPlan(CHANNELS)
+    [responses] = get_values(kind, serve(CountingVM7000(reverse=3, stale=1)), plan.requests, transaction_id=0xFFFE)
+    assert transaction_ids(responses) == [0xFFFF, 0, 1]
+    assert plan.decode(responses) == expected(CHANNELS)
+
+
+def test_exception_replies_raise_modbus_error(serve, kind):
+    plan = RegisterPlan(CHANNELS)
+    too_many, bad_function, mixed, after = get_values(
+        kind, serve(CountingVM7000()), [(1, 4, 0x64, 200)], [(1, 3, 0x64, 1)],
+        plan.requests[:1] + [(1, 4, 0x3FF, 2)] + plan.requests[1:], plan.requests)
+    assert isinstance(too_many, ModbusError) and (too_many.function, too_many.code) == (4, 2)
+    assert isinstance(bad_function, ModbusError) and (bad_function.function, bad_function.code) == (3, 1)
+    assert isinstance(mixed, ModbusError) and mixed.code == 2
+    # 例外回應之後的回應也已讀完, 連線仍保持同步
+    assert transaction_ids(after) == [7, 8, 9]
+    assert plan.decode(after) == expected(CHANNELS)